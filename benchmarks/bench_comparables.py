@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import get_processed_data
+from comparables import (
+    DEFAULT_K, OVERFETCH, build_comparables_index, save_comparables_index, load_comparables_index,
+    find_comparables, scenario_columns, encode_comparables
+)
+from synthetic import RAW_PATH, CACHE_DIR, resample_rows, bench_latency
+
+DEFAULT_SIZES = [16_000, 1_000_000]
+DEFAULT_BATCH_SIZES = [1, 200]
+
+def jittered_rows(df, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = resample_rows(df, n_rows, seed)
+    # jitter scores so the resampled rows are not exact duplicates of each other
+    sample['Critic_Score'] = np.clip(sample['Critic_Score'] + rng.normal(0, 2, n_rows), 0, 100).astype(np.float32)
+    # ...and treat every resampled release as its own title, as new data would mostly be
+    sample['Title_ID'] = np.arange(n_rows)
+    return sample
+
+def make_scenarios(df, n, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.integers(0, len(df), size=n)]
+    return [{
+        'Genre': row.Genre, 'Platform': row.Platform, 'Company_Type': row.Company_Type, 'Rating': row.Rating,
+        'Critic_Score': float(rng.uniform(40, 95)), 'Year_of_Release': float(row.Year_of_Release)
+    } for row in rows.itertuples()]
+
+def brute_force(X, norms, scenarios, encoders, k):
+    # the per-query scan the index replaces: distances to every release, then a partial sort
+    columns, n_scenarios = scenario_columns(scenarios)
+    queries = encode_comparables(columns, n_scenarios, encoders)
+    distances = norms[None, :] - 2 * queries @ X.T
+    return np.argpartition(distances, k, axis=1)[:, :k]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark comparables index build and query latency')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    args = parser.parse_args()
+
+    base_df = get_processed_data(RAW_PATH, CACHE_DIR, processed_path=None)
+
+    for n_rows in args.sizes:
+        df = jittered_rows(base_df, n_rows)
+
+        start = time.perf_counter()
+        index = build_comparables_index(df)
+        build_seconds = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            start = time.perf_counter()
+            save_comparables_index(index, index_dir)
+            save_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load_comparables_index(index_dir)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            X = np.asarray(index['tree'].get_arrays()[0])
+            norms = (X ** 2).sum(axis=1)
+            print(f"\n{n_rows:,} rows: build {build_seconds:.2f}s, save {save_seconds:.2f}s, mmap load {load_ms:.1f}ms")
+            print(f"{'scenarios':>10} {'p50 ms':>9} {'p99 ms':>9} {'ms/scenario':>12} {'brute ms':>10}")
+            for batch_size in args.batch_sizes:
+                scenarios = make_scenarios(df, batch_size)
+                p50, p99 = bench_latency(lambda: find_comparables(loaded, scenarios, args.k), args.calls)
+                brute, _ = bench_latency(lambda: brute_force(X, norms, scenarios, index['encoders'], args.k * OVERFETCH),
+                                         max(args.calls // 10, 3))
+                print(f"{batch_size:>10,} {p50:>9.2f} {p99:>9.2f} {p50 / batch_size:>12.3f} {brute:>10.2f}")
+            del loaded
+
+if __name__ == "__main__":
+    main()
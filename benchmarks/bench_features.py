@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import load_raw_data, clean_data, create_features
+from synthetic import RAW_PATH, resample_rows
+
+DEFAULT_SIZES = [16_000, 1_000_000, 10_000_000]
+
+def bench_create_features(base_df, n_rows, repeats=3):
+    df = resample_rows(base_df, n_rows)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        create_features(df, copy=True)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return best, n_rows / best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_features throughput')
+    parser.add_argument('--raw-path', default=RAW_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    base_df = clean_data(load_raw_data(args.raw_path))
+
+    print(f"\n{'rows':>12} {'seconds':>10} {'rows/sec':>14}")
+    for n_rows in args.sizes:
+        seconds, rate = bench_create_features(base_df, n_rows, args.repeats)
+        print(f"{n_rows:>12,} {seconds:>10.3f} {rate:>14,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import load_raw_data, clean_data, create_features, resolve_titles
+from aggregation import build_aggregation_cube
+from analysis import (
+    calculate_correlations, perform_statistical_tests, analyze_genre_performance,
+    analyze_publisher_performance, analyze_platform_performance
+)
+from visualization import (
+    enable_batch_mode, setup_visuals, plot_genre_analysis, plot_critic_analysis, plot_publisher_analysis,
+    plot_platform_analysis, plot_regional_analysis, plot_temporal_analysis
+)
+from synthetic import SYNTHETIC_DIR, write_synthetic_csv
+
+DEFAULT_SIZES = [16_000, 1_000_000, 10_000_000]
+DEFAULT_OUTPUT = 'benchmarks/results/pipeline.json'
+# a stage regresses when it is this much slower (or hungrier) than the baseline...
+DEFAULT_TOLERANCE = 0.20
+# ...and the absolute change is above the noise floor
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 5.0
+
+PLOT_STAGES = {
+    'plot_genre_analysis': plot_genre_analysis,
+    'plot_critic_analysis': plot_critic_analysis,
+    'plot_publisher_analysis': plot_publisher_analysis,
+    'plot_platform_analysis': plot_platform_analysis,
+    'plot_regional_analysis': plot_regional_analysis,
+    'plot_temporal_analysis': plot_temporal_analysis
+}
+
+def _rows(value):
+    return len(value) if hasattr(value, '__len__') and hasattr(value, 'columns') else None
+
+def run_stage(name, func, rows_in, trace_memory=True, verbose=False):
+    if trace_memory:
+        tracemalloc.start()
+    output = io.StringIO()
+
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        result = func()
+    seconds = time.perf_counter() - start
+    cpu_seconds = time.process_time() - start_cpu
+
+    peak_mb = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 1024 ** 2
+
+    record = {
+        'stage': name,
+        'rows': rows_in,
+        'seconds': seconds,
+        'cpu_seconds': cpu_seconds,
+        'peak_mb': peak_mb,
+        'rows_out': _rows(result)
+    }
+    memory = f"{peak_mb:>10.1f}" if peak_mb is not None else f"{'-':>10}"
+    print(f"{name:<32} {rows_in:>12,} {seconds:>10.3f} {memory}")
+    return result, record
+
+def bench_size(n_rows, data_dir, figures_dir, seed=0, trace_memory=True, include_plots=True, verbose=False):
+    raw_path = write_synthetic_csv(n_rows, data_dir, seed)
+    records = []
+
+    def stage(name, func):
+        result, record = run_stage(name, func, n_rows, trace_memory, verbose)
+        records.append(record)
+        return result
+
+    raw = stage('load_raw_data', lambda: load_raw_data(raw_path))
+    cleaned = stage('clean_data', lambda: clean_data(raw))
+    featured = stage('create_features', lambda: create_features(cleaned))
+    df = stage('resolve_titles', lambda: resolve_titles(featured))
+    del raw, cleaned, featured
+
+    cube = stage('build_aggregation_cube', lambda: build_aggregation_cube(df))
+    stage('calculate_correlations', lambda: calculate_correlations(df, cube=cube))
+    stage('perform_statistical_tests', lambda: perform_statistical_tests(df))
+    stage('analyze_genre_performance', lambda: analyze_genre_performance(df, cube=cube))
+    stage('analyze_publisher_performance', lambda: analyze_publisher_performance(df, cube=cube))
+    stage('analyze_platform_performance', lambda: analyze_platform_performance(df, cube=cube))
+
+    if include_plots:
+        for name, plot_func in PLOT_STAGES.items():
+            save_dir = os.path.join(figures_dir, name)
+            stage(name, lambda: plot_func(df, save_dir, cube=cube))
+
+    return records
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    previous = {(record['stage'], record['rows']): record for record in baseline['results']}
+
+    regressions = []
+    for record in current['results']:
+        base = previous.get((record['stage'], record['rows']))
+        if base is None:
+            continue
+
+        for metric, floor in (('seconds', MIN_SECONDS_DELTA), ('peak_mb', MIN_MEMORY_DELTA_MB)):
+            new, old = record.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append({
+                    'stage': record['stage'],
+                    'rows': record['rows'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change': new / old - 1 if old else float('inf')
+                })
+
+    return regressions
+
+def save_results(results, output_path):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, output_path)
+    print(f"\nResults written to {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and memory-profile every pipeline stage on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=SYNTHETIC_DIR, help='where generated CSVs are cached')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', default=None, help='baseline results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip tracemalloc; timings are then free of tracing overhead')
+    parser.add_argument('--no-plots', action='store_true')
+    parser.add_argument('--verbose', action='store_true', help="show the stages' own output")
+    args = parser.parse_args()
+
+    enable_batch_mode()
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_visuals()
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'memory_traced': not args.no_memory,
+        'results': []
+    }
+
+    print(f"{'stage':<32} {'rows':>12} {'seconds':>10} {'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as figures_dir:
+        for n_rows in args.sizes:
+            results['results'].extend(bench_size(
+                n_rows, args.data_dir, figures_dir, args.seed,
+                trace_memory=not args.no_memory, include_plots=not args.no_plots, verbose=args.verbose
+            ))
+
+    save_results(results, args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+
+        if not regressions:
+            print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+            return 0
+
+        print(f"\n{len(regressions)} regressions against {args.compare}:")
+        for r in regressions:
+            print(f"  {r['stage']} @ {r['rows']:,} rows: {r['metric']} "
+                  f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['change']:+.0%})")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import get_processed_data
+from prediction import train_success_model, predict_batch, load_model
+from synthetic import RAW_PATH, CACHE_DIR, resample_rows, bench_latency
+
+DEFAULT_SIZES = [16_000, 1_000_000, 5_000_000]
+DEFAULT_BATCH_SIZES = [1, 100, 10_000]
+
+def bench_throughput(base_df, model, n_rows, repeats=3):
+    df = resample_rows(base_df, n_rows)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_batch(df, model)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return best, n_rows / best
+
+def batch_latency(base_df, model, batch_size, calls=200):
+    # batches are drawn up front so only predict_batch is timed
+    batches = iter([resample_rows(base_df, batch_size, seed=i) for i in range(calls)])
+    return bench_latency(lambda: predict_batch(next(batches), model), calls)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark predict_batch throughput and latency')
+    parser.add_argument('--model-path', default=None, help='score with a saved model instead of training one')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    base_df = get_processed_data(RAW_PATH, CACHE_DIR, processed_path=None)
+    model = load_model(args.model_path) if args.model_path else train_success_model(base_df)
+
+    print(f"\n{'rows':>12} {'seconds':>10} {'rows/sec':>14} {'rows/min':>16}")
+    for n_rows in args.sizes:
+        seconds, rate = bench_throughput(base_df, model, n_rows, args.repeats)
+        print(f"{n_rows:>12,} {seconds:>10.3f} {rate:>14,.0f} {rate * 60:>16,.0f}")
+
+    print(f"\n{'batch':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for batch_size in args.batch_sizes:
+        p50, p99 = batch_latency(base_df, model, batch_size, args.calls)
+        print(f"{batch_size:>12,} {p50:>10.2f} {p99:>10.2f}")
+
+if __name__ == "__main__":
+    main()
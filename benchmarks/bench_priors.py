@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import get_processed_data
+from feature_store import PRIOR_KEYS, compute_priors, build_feature_store, add_release_years
+from synthetic import RAW_PATH, CACHE_DIR, resample_rows
+
+DEFAULT_SIZES = [16_000, 1_000_000, 5_000_000]
+
+def lookback_seconds(df, sample_rows, seed=1):
+    # the per-row filter the cumulative aggregates replace, timed on a sample and scaled to every row
+    rng = np.random.default_rng(seed)
+    years = df['Year_of_Release'].to_numpy()
+    hits = df['Is_Successful'].to_numpy()
+    sales = df['Global_Sales'].to_numpy()
+    keys = {key: df[key].to_numpy() for key in PRIOR_KEYS}
+
+    rows = rng.integers(0, len(df), size=sample_rows)
+    start = time.perf_counter()
+    for row in rows:
+        earlier = years < years[row]
+        for key, values in keys.items():
+            mask = earlier & (values == values[row])
+            hits[mask].sum(), sales[mask].sum(), mask.sum()
+    return (time.perf_counter() - start) / sample_rows * len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark historical prior features against per-row lookback')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--lookback-rows', type=int, default=100, help='rows to time the per-row baseline on')
+    args = parser.parse_args()
+
+    base_df = get_processed_data(RAW_PATH, CACHE_DIR, processed_path=None)
+    last_year = base_df['Year_of_Release'].max()
+
+    print(f"{'rows':>12} {'priors s':>9} {'lookback s':>11} {'speedup':>9} {'store s':>8} {'add year s':>11}")
+    for n_rows in args.sizes:
+        df = resample_rows(base_df, n_rows)
+
+        start = time.perf_counter()
+        compute_priors(df)
+        priors_seconds = time.perf_counter() - start
+        lookback = lookback_seconds(df, args.lookback_rows)
+
+        history, latest = df[df['Year_of_Release'] < last_year], df[df['Year_of_Release'] == last_year]
+        with tempfile.TemporaryDirectory() as store_dir:
+            start = time.perf_counter()
+            build_feature_store(history, store_dir)
+            store_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            add_release_years(latest, store_dir)
+            add_seconds = time.perf_counter() - start
+
+        print(f"{n_rows:>12,} {priors_seconds:>9.2f} {lookback:>11.1f} {lookback / priors_seconds:>9.0f} "
+              f"{store_seconds:>8.2f} {add_seconds:>11.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import get_processed_data
+from query import build_query_index, query
+from synthetic import RAW_PATH, CACHE_DIR, resample_rows, bench_latency
+
+DEFAULT_SIZES = [16_000, 1_000_000, 5_000_000]
+
+# (label, filters, measure, agg)
+QUERIES = [
+    ('avg EU sales, AAA RPGs on PS2 2003-2007',
+     {'Genre': 'Role-Playing', 'Platform': 'PS2', 'Year_of_Release': (2003, 2007), 'Company_Type': 'AAA'},
+     'EU_Sales', 'mean'),
+    ('total sales, Nintendo on Wii or DS',
+     {'Publisher': 'Nintendo', 'Platform': ['Wii', 'DS']}, 'Global_Sales', 'sum'),
+    ('median JP sales, 2000s E-rated',
+     {'Release_Era': '2000s', 'Rating': 'E'}, 'JP_Sales', 'median'),
+    ('count, Action since 2010',
+     {'Genre': 'Action', 'Year_of_Release': (2010, None)}, 'Global_Sales', 'count')
+]
+
+def pandas_query(df, filters, measure, agg):
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in filters.items():
+        if isinstance(value, tuple):
+            low, high = value
+            mask &= df[column].between(-np.inf if low is None else low, np.inf if high is None else high).to_numpy()
+        elif isinstance(value, list):
+            mask &= df[column].isin(value).to_numpy()
+        else:
+            mask &= (df[column] == value).to_numpy()
+    return df.loc[mask, measure].agg(agg)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark indexed filtered aggregates against pandas masks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    base_df = get_processed_data(RAW_PATH, CACHE_DIR, processed_path=None)
+
+    for n_rows in args.sizes:
+        df = resample_rows(base_df, n_rows)
+        start = time.perf_counter()
+        index = build_query_index(df)
+        print(f"\n{n_rows:,} rows, index built in {time.perf_counter() - start:.2f}s")
+
+        print(f"{'query':<42} {'rows':>9} {'p50 ms':>9} {'p99 ms':>9} {'pandas ms':>10}")
+        for label, filters, measure, agg in QUERIES:
+            p50, p99 = bench_latency(lambda: query(index, filters, measure, agg), args.calls)
+            pandas_p50, _ = bench_latency(lambda: pandas_query(df, filters, measure, agg), max(args.calls // 20, 3))
+            matched = query(index, filters, measure, 'count')
+            print(f"{label:<42} {matched:>9,} {p50:>9.3f} {p99:>9.3f} {pandas_p50:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import load_raw_data
+from model_search import SEARCH_GRID, candidate_grid, run_model_search, time_folds, fold_matrices, _fold_score, BASE_PARAMS
+from prediction import _categorical_mask
+from synthetic import RAW_PATH
+
+DEFAULT_WORKERS = [1, os.cpu_count() or 1]
+
+def naive_search(raw_df, target, grid, n_folds):
+    # what tuning looked like before: every candidate re-cleans and re-encodes every fold,
+    # and every candidate is fitted on every fold
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    scores = []
+    for params in candidate_grid(grid):
+        fold_scores = []
+        for train, val, _ in time_folds(raw_df['Year_of_Release'].to_numpy(dtype=np.float64), n_folds):
+            (X_train, y_train, X_val, y_val), encoding = fold_matrices(raw_df.iloc[train], raw_df.iloc[val], target)
+            model = HistGradientBoostingClassifier(categorical_features=_categorical_mask(encoding), random_state=0,
+                                                   **BASE_PARAMS, **params)
+            model.fit(X_train, y_train)
+            proba = np.zeros((len(y_val), int(max(y_train.max(), y_val.max())) + 1))
+            proba[:, model.classes_] = model.predict_proba(X_val)
+            fold_scores.append(_fold_score(y_val, proba))
+        scores.append(np.mean(fold_scores))
+    return max(scores)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the parallel model search against a naive serial grid')
+    parser.add_argument('--target', default='Is_Successful')
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='+', default=DEFAULT_WORKERS)
+    parser.add_argument('--full-grid', action='store_true', help='search the whole default grid instead of a slice')
+    args = parser.parse_args()
+
+    raw_df = load_raw_data(RAW_PATH)
+    grid = SEARCH_GRID if args.full_grid else {**SEARCH_GRID, 'min_samples_leaf': [20], 'l2_regularization': [0.0]}
+    print(f"{len(candidate_grid(grid))} candidates x {args.folds} folds on {len(raw_df):,} rows")
+
+    start = time.perf_counter()
+    best = naive_search(raw_df, args.target, grid, args.folds)
+    naive_seconds = time.perf_counter() - start
+    print(f"\n{'run':>22} {'seconds':>9} {'best AUC':>9} {'speedup':>8}")
+    print(f"{'naive serial grid':>22} {naive_seconds:>9.1f} {best:>9.4f} {1:>8.2f}")
+
+    for workers in sorted(set(args.workers)):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            start = time.perf_counter()
+            results = run_model_search(raw_df, args.target, grid, args.folds, max_workers=workers, cache_dir=cache_dir)
+            seconds = time.perf_counter() - start
+        label = f"search, {workers} workers"
+        print(f"{label:>22} {seconds:>9.1f} {results['mean_score'].iloc[0]:>9.4f} {naive_seconds / seconds:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import REGION_COLUMNS, get_processed_data
+from aggregation import build_aggregation_cube
+from snapshots import SNAPSHOT_ANALYSES, run_snapshots, diff_snapshots
+from tracing import configure_tracing
+from synthetic import RAW_PATH
+
+DEFAULT_SNAPSHOTS = 12
+DEFAULT_ROWS = 200_000
+
+def write_snapshots(raw_path, output_dir, n_snapshots, n_rows, seed=0):
+    # monthly exports of a growing catalogue: later months add releases and keep selling the old ones
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(raw_path)
+    base = base.iloc[rng.integers(0, len(base), size=n_rows)].reset_index(drop=True)
+    base['Name'] = base['Name'].fillna('') + ' #' + pd.RangeIndex(n_rows).astype(str)
+
+    paths = []
+    for month in range(n_snapshots):
+        visible = base.iloc[:int(n_rows * (0.9 + 0.1 * month / max(n_snapshots - 1, 1)))].copy()
+        growth = 1 + rng.gamma(0.5, 0.02 * month, size=len(visible))
+        visible[REGION_COLUMNS] = (visible[REGION_COLUMNS].to_numpy() * growth[:, None]).round(2)
+        visible['Global_Sales'] = visible[REGION_COLUMNS].sum(axis=1).round(2)
+
+        path = os.path.join(output_dir, f'sales_{month + 1:02d}.csv')
+        visible.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def serial_pipelines(paths):
+    # what comparing snapshots took before: the full pipeline per file, one after the other
+    for path in paths:
+        df = get_processed_data(path, cache_dir=None, processed_path=None)
+        cube = build_aggregation_cube(df)
+        for analyze in SNAPSHOT_ANALYSES.values():
+            analyze(df, cube=cube)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the snapshot runner against serial full pipelines')
+    parser.add_argument('--raw-path', default=RAW_PATH)
+    parser.add_argument('--snapshots', type=int, default=DEFAULT_SNAPSHOTS)
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    configure_tracing(enabled=True, quiet=True)
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        paths = write_snapshots(args.raw_path, snapshot_dir, args.snapshots, args.rows)
+
+        start = time.perf_counter()
+        serial_pipelines(paths)
+        serial_seconds = time.perf_counter() - start
+
+        timings = {}
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            dictionary, results = run_snapshots(paths, max_workers=workers)
+            diff = diff_snapshots(dictionary, results)
+            timings[workers] = time.perf_counter() - start
+
+    print(f"\n{args.snapshots} snapshots of up to {args.rows:,} rows, {len(diff):,} changed aggregates")
+    print(f"{'run':>22} {'seconds':>9} {'speedup':>8}")
+    print(f"{'serial full pipelines':>22} {serial_seconds:>9.2f} {1:>8.2f}")
+    for workers, seconds in timings.items():
+        label = f"runner, {workers} workers"
+        print(f"{label:>22} {seconds:>9.2f} {serial_seconds / seconds:>8.2f}")
+
+if __name__ == "__main__":
+    main()
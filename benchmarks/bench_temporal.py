@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import get_processed_data
+from temporal import build_temporal_cube, yearly_trends, platform_lifecycle
+from synthetic import RAW_PATH, CACHE_DIR, resample_rows
+
+DEFAULT_SIZES = [16_000, 1_000_000, 10_000_000]
+
+def rescan_trends(df, genres):
+    # the per-query path the cube replaces: filter the rows, then group them by year
+    rows = df[df['Genre'].isin(genres)]
+    grouped = rows.groupby('Year_of_Release', observed=True)
+    return grouped['Is_Successful'].mean(), grouped['Global_Sales'].sum(), grouped['Critic_Score'].mean()
+
+def best_of(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark temporal cube slices against row rescans')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    base_df = get_processed_data(RAW_PATH, CACHE_DIR, processed_path=None)
+    genres = ['Action', 'Shooter']
+
+    print(f"\n{'rows':>12} {'build s':>8} {'slice ms':>9} {'by genre ms':>12} {'lifecycle ms':>13} {'rescan ms':>10}")
+    for n_rows in args.sizes:
+        df = resample_rows(base_df, n_rows)
+
+        start = time.perf_counter()
+        temporal = build_temporal_cube(df)
+        build_seconds = time.perf_counter() - start
+
+        slice_ms = best_of(lambda: yearly_trends(temporal, genres=genres), args.repeats) * 1000
+        by_genre_ms = best_of(lambda: yearly_trends(temporal, by='Genre'), args.repeats) * 1000
+        lifecycle_ms = best_of(lambda: platform_lifecycle(temporal), args.repeats) * 1000
+        rescan_ms = best_of(lambda: rescan_trends(df, genres), args.repeats) * 1000
+        print(f"{n_rows:>12,} {build_seconds:>8.2f} {slice_ms:>9.2f} {by_genre_ms:>12.2f} "
+              f"{lifecycle_ms:>13.2f} {rescan_ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import RAW_SCHEMA, VALIDATION_RULES, load_raw_data
+from validation import validate_frame
+from synthetic import RAW_PATH, resample_rows
+
+DEFAULT_SIZES = [1_000_000, 10_000_000]
+
+def uniquely_named_rows(df, n_rows, seed=0):
+    sample = resample_rows(df, n_rows, seed)
+    # a fresh name per row, or nearly every resampled row would be quarantined as a duplicate key
+    sample['Name'] = sample['Name'].fillna('') + ' #' + pd.RangeIndex(n_rows).astype(str)
+    return sample
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingest validation against raw load time')
+    parser.add_argument('--raw-path', default=RAW_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    # read unparsed so the written file keeps 'tbd' scores, as a real export would
+    base_df = pd.read_csv(args.raw_path, dtype=str)
+
+    print(f"\n{'rows':>12} {'load s':>8} {'validated s':>12} {'validate s':>11} {'overhead':>9} {'quarantined':>12}")
+    for n_rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'sales.csv')
+            uniquely_named_rows(base_df, n_rows).to_csv(csv_path, index=False)
+
+            start = time.perf_counter()
+            load_raw_data(csv_path, validate=False)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load_raw_data(csv_path)
+            validated_seconds = time.perf_counter() - start
+
+            # the frame validation sees inside load_raw_data: parsed, not yet compacted
+            raw = pd.read_csv(csv_path, dtype=RAW_SCHEMA)
+            start = time.perf_counter()
+            validate_frame(raw, VALIDATION_RULES)
+            validate_seconds = time.perf_counter() - start
+
+        overhead = validated_seconds - load_seconds
+        print(f"{n_rows:>12,} {load_seconds:>8.2f} {validated_seconds:>12.2f} {validate_seconds:>11.2f} "
+              f"{overhead / load_seconds:>9.1%} {n_rows - len(loaded):>12,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from data_processing import MAJOR_PUBLISHERS
+
+# benchmarks run from anywhere, so every default path hangs off the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_PATH = os.path.join(PROJECT_ROOT, 'data', 'video_games_sales.csv')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'cache')
+SYNTHETIC_DIR = os.path.join(PROJECT_ROOT, 'data', 'synthetic')
+
+PLATFORMS = ['PS2', 'DS', 'PS3', 'Wii', 'X360', 'PSP', 'PS', 'PC', 'XB', 'GBA', 'GC', '3DS', 'PSV',
+             'PS4', 'N64', 'XOne', 'SNES', 'SAT', 'WiiU', '2600', 'NES', 'GB', 'DC', 'GEN', 'NG',
+             'SCD', 'WS', '3DO', 'TG16', 'GG', 'PCFX']
+GENRES = ['Action', 'Sports', 'Misc', 'Role-Playing', 'Shooter', 'Adventure', 'Racing',
+          'Platform', 'Simulation', 'Fighting', 'Strategy', 'Puzzle']
+RATINGS = ['E', 'T', 'M', 'E10+', 'EC', 'K-A', 'RP', 'AO']
+RATING_WEIGHTS = [0.40, 0.30, 0.16, 0.135, 0.003, 0.001, 0.0005, 0.0005]
+
+# cardinalities of the real 16k-row file, grown sublinearly with row count
+BASE_ROWS = 16_719
+BASE_PUBLISHERS = 580
+BASE_DEVELOPERS = 1_700
+
+# observed missing rates in data/video_games_sales.csv
+MISSING_RATES = {
+    'Year_of_Release': 0.016,
+    'Publisher': 0.003,
+    'Critic_Score': 0.513,
+    'User_Score': 0.255,
+    'Developer': 0.396,
+    'Rating': 0.405
+}
+TBD_RATE = 0.145
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def _scaled_cardinality(base, n_rows):
+    return max(int(base * (n_rows / BASE_ROWS) ** 0.5), 10)
+
+def _name_pool(faker, size, maker):
+    # Faker is far too slow per row at millions of rows; draw a vocabulary once and sample from it
+    return np.array(list(dict.fromkeys(maker(faker) for _ in range(size))), dtype=object)
+
+def _sample(rng, pool, n_rows, weights=None, missing_rate=0.0):
+    values = pool[rng.choice(len(pool), size=n_rows, p=weights)]
+    if missing_rate:
+        values[rng.random(n_rows) < missing_rate] = np.nan
+    return values
+
+def generate_sales_data(n_rows, seed=0):
+    from faker import Faker
+
+    rng = np.random.default_rng(seed)
+    faker = Faker()
+    faker.seed_instance(seed)
+
+    n_publishers = _scaled_cardinality(BASE_PUBLISHERS, n_rows)
+    publishers = np.concatenate([
+        np.array(sorted(MAJOR_PUBLISHERS), dtype=object),
+        _name_pool(faker, n_publishers, lambda f: f.company())
+    ])
+    developers = _name_pool(faker, _scaled_cardinality(BASE_DEVELOPERS, n_rows), lambda f: f.company())
+    titles = _name_pool(faker, min(n_rows, 200_000), lambda f: f.catch_phrase())
+
+    # Global sales are log-normal around the real median of 0.17M; regions split by a Dirichlet draw
+    global_sales = np.round(rng.lognormal(np.log(0.17), 1.3, n_rows), 2)
+    shares = rng.dirichlet([5.0, 3.0, 1.5, 1.0], n_rows)
+    region_sales = np.round(global_sales[:, None] * shares, 2)
+
+    years = np.clip(np.round(rng.normal(2007, 5.9, n_rows)), 1980, 2016)
+    years[rng.random(n_rows) < MISSING_RATES['Year_of_Release']] = np.nan
+
+    sales_z = (np.log(global_sales + 0.01) - np.log(0.17)) / 1.3
+    has_critic = rng.random(n_rows) >= MISSING_RATES['Critic_Score']
+    critic_score = np.where(has_critic, np.clip(np.round(rng.normal(69, 13, n_rows) + 4 * sales_z), 13, 98), np.nan)
+    critic_count = np.where(has_critic, np.clip(np.round(rng.gamma(2.0, 13.0, n_rows)), 3, 113), np.nan)
+
+    # reviewed titles usually also carry a user score; the rest is missing or still 'tbd'
+    user_draw = rng.random(n_rows)
+    user_score = np.round(np.clip(rng.normal(7.1, 1.5, n_rows), 0, 9.7), 1).astype(str).astype(object)
+    user_score[user_draw < TBD_RATE] = 'tbd'
+    user_score[(user_draw >= TBD_RATE) & (user_draw < TBD_RATE + MISSING_RATES['User_Score'])] = np.nan
+    has_user = pd.notna(user_score) & (user_score != 'tbd')
+    user_count = np.where(has_user, np.clip(np.round(rng.lognormal(3.2, 1.5, n_rows)), 4, 10_665), np.nan)
+
+    return pd.DataFrame({
+        'Name': _sample(rng, titles, n_rows),
+        'Platform': _sample(rng, np.array(PLATFORMS, dtype=object), n_rows, _zipf_weights(len(PLATFORMS), 1.1)),
+        'Year_of_Release': years,
+        'Genre': _sample(rng, np.array(GENRES, dtype=object), n_rows, _zipf_weights(len(GENRES), 0.6)),
+        'Publisher': _sample(rng, publishers, n_rows, _zipf_weights(len(publishers), 1.1),
+                             MISSING_RATES['Publisher']),
+        'NA_Sales': region_sales[:, 0],
+        'EU_Sales': region_sales[:, 1],
+        'JP_Sales': region_sales[:, 2],
+        'Other_Sales': region_sales[:, 3],
+        'Global_Sales': global_sales,
+        'Critic_Score': critic_score,
+        'Critic_Count': critic_count,
+        'User_Score': user_score,
+        'User_Count': user_count,
+        'Developer': _sample(rng, developers, n_rows, _zipf_weights(len(developers), 1.0),
+                             MISSING_RATES['Developer']),
+        'Rating': _sample(rng, np.array(RATINGS, dtype=object), n_rows, np.array(RATING_WEIGHTS) / sum(RATING_WEIGHTS),
+                          MISSING_RATES['Rating'])
+    })
+
+def resample_rows(df, n_rows, seed=0):
+    # bootstrap rows of the real data up to benchmark sizes
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(df), size=n_rows)
+    return df.iloc[idx].reset_index(drop=True)
+
+def bench_latency(func, calls):
+    # p50 and p99 of `calls` single calls, in milliseconds
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+def write_synthetic_csv(n_rows, output_dir=SYNTHETIC_DIR, seed=0):
+    path = os.path.join(output_dir, f'video_games_sales_{n_rows}_{seed}.csv')
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    generate_sales_data(n_rows, seed).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    print(f"Wrote {n_rows:,} synthetic rows to {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic copy of the sales dataset')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--output-dir', default=SYNTHETIC_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_synthetic_csv(args.rows, args.output_dir, args.seed)
@@ -0,0 +1,124 @@
+import numpy as np
+
+from data_processing import SALES_COLUMNS, REGION_COLUMNS
+from correlation import compute_correlations
+from temporal import TEMPORAL_AXES, build_temporal_cube
+from tracing import traced
+
+CUBE_DIMENSIONS = ['Genre', 'Platform', 'Publisher', 'Year_of_Release', 'Company_Type', 'Release_Era']
+CUBE_PAIRS = [('Release_Era', 'Platform'), ('Year_of_Release', 'Genre')]
+CORRELATION_COLUMNS = ['Global_Sales', 'NA_Sales', 'EU_Sales', 'JP_Sales',
+                       'Other_Sales', 'Critic_Score', 'User_Score']
+
+def _float64_measures(df):
+    # sales are stored as float64 already; critic scores are float32 and averaged in float64
+    df = df.copy(deep=False)
+    for col in SALES_COLUMNS + ['Critic_Score']:
+        if col in df.columns and df[col].dtype != np.float64:
+            df[col] = df[col].to_numpy(dtype=np.float64)
+    return df
+
+def _aggregate(df, keys):
+    grouped = df.groupby(keys, observed=True)
+
+    table = grouped.agg(
+        count=('Global_Sales', 'size'),
+        total_sales=('Global_Sales', 'sum'),
+        avg_sales=('Global_Sales', 'mean'),
+        median_sales=('Global_Sales', 'median'),
+        success_rate=('Is_Successful', 'mean'),
+        avg_critic=('Critic_Score', 'mean'),
+        first_year=('Year_of_Release', 'min'),
+        last_year=('Year_of_Release', 'max')
+    )
+    table[REGION_COLUMNS] = grouped[REGION_COLUMNS].sum()
+
+    return table
+
+def _temporal_parts(df):
+    # year x genre x platform sums; temporal trends and lifecycles are slices of it, not row scans
+    return {'temporal': build_temporal_cube(df)}
+
+def _correlation_parts(df):
+    # Pearson and Spearman come out of the same pass; every consumer reads them from here
+    correlations = compute_correlations(df, CORRELATION_COLUMNS)
+    return {'correlations': correlations['pearson'], 'rank_correlations': correlations['spearman']}
+
+# parts that need another pass over the rows; built on first access, since most callers never read them
+LAZY_PARTS = {
+    'temporal': (_temporal_parts, TEMPORAL_AXES),
+    'correlations': (_correlation_parts, []),
+    'rank_correlations': (_correlation_parts, [])
+}
+
+class AggregationCube(dict):
+    """Group tables keyed like a dict, with the LAZY_PARTS built from the frame when first read."""
+
+    def __init__(self, df):
+        super().__init__()
+        self._df = df
+
+    def _lazy(self, key):
+        return key in LAZY_PARTS and all(col in self._df.columns for col in LAZY_PARTS[key][1])
+
+    def __missing__(self, key):
+        if not self._lazy(key):
+            raise KeyError(key)
+        self.update(LAZY_PARTS[key][0](self._df))
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._lazy(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def materialize(self):
+        for key in LAZY_PARTS:
+            self.get(key)
+        return dict(self)
+
+    def __reduce__(self):
+        # pickled cubes (pipeline artifacts) are plain dicts with every part, not the frame behind them
+        return dict, (self.materialize(),)
+
+@traced
+def build_aggregation_cube(df, dimensions=CUBE_DIMENSIONS, pairs=CUBE_PAIRS):
+    print("Building aggregation cube...")
+    cube = AggregationCube(df)
+    df = _float64_measures(df)
+
+    cube['overall'] = {
+        'count': len(df),
+        'successful': int(df['Is_Successful'].sum()),
+        'success_rate': df['Is_Successful'].mean(),
+        'total_sales': df['Global_Sales'].sum(),
+        'avg_sales': df['Global_Sales'].mean(),
+        'median_sales': df['Global_Sales'].median(),
+        'avg_critic': df['Critic_Score'].mean(),
+        'first_year': df['Year_of_Release'].min(),
+        'last_year': df['Year_of_Release'].max()
+    }
+    if 'Title_ID' in df.columns:
+        # ports of one game count once here; 'count' stays the number of platform releases
+        cube['overall']['titles'] = df['Title_ID'].nunique()
+
+    for dimension in dimensions:
+        if dimension in df.columns:
+            cube[dimension] = _aggregate(df, dimension)
+
+    if 'Publisher' in cube and 'Company_Type' in df.columns:
+        cube['Publisher']['company_type'] = df.groupby('Publisher', observed=True)['Company_Type'].first()
+
+    for pair in pairs:
+        if all(key in df.columns for key in pair):
+            cube[pair] = _aggregate(df, list(pair))
+
+    if 'Genre' in cube:
+        genre = cube['Genre']
+        cube[('Genre', 'Region')] = genre[REGION_COLUMNS].div(genre['count'], axis=0)
+
+    return cube
+
+def get_cube(df, cube=None):
+    return cube if cube is not None else build_aggregation_cube(df)
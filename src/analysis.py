@@ -1,40 +1,62 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
 import warnings
+from aggregation import get_cube, CORRELATION_COLUMNS
+from temporal import get_temporal_cube, yearly_trends, platform_lifecycle
+from correlation import compute_correlations
+from tracing import traced
 warnings.filterwarnings('ignore')
 
-def calculate_correlations(df):
+@traced
+def calculate_correlations(df, cube=None, method='pearson'):
     print("Calculating correlations...")
-    numeric_columns = ['Global_Sales', 'NA_Sales', 'EU_Sales', 'JP_Sales', 
-                      'Other_Sales', 'Critic_Score', 'User_Score']
-    
-    numeric_columns = [col for col in numeric_columns if col in df.columns]
-    
-    correlation_matrix = df[numeric_columns].corr()
-    
-    print("\nCorrelation Matrix:")
+    cube = get_cube(df, cube)
+    if method == 'pearson':
+        correlation_matrix = cube['correlations']
+    elif 'rank_correlations' in cube:
+        correlation_matrix = cube['rank_correlations']
+    else:
+        # ranks need every row at once, so cubes rebuilt from incremental state do not carry them
+        correlation_matrix = compute_correlations(df, CORRELATION_COLUMNS, methods=['spearman'])['spearman']
+    
+    print(f"\nCorrelation Matrix ({method}):")
     print(correlation_matrix.round(3))
     
     return correlation_matrix
 
-def get_summary_statistics(df):
+@traced
+def calculate_segment_correlations(df, by='Genre', method='pearson'):
+    print(f"Calculating {method} correlations per {by}...")
+    correlations = compute_correlations(df, CORRELATION_COLUMNS, by=by, methods=[method])[method]
+    
+    critic_sales = correlations['Critic_Score'].xs('Global_Sales', level=1)
+    print(f"\nCritic Score vs Global Sales correlation by {by}:")
+    print(critic_sales.round(3).sort_values(ascending=False))
+    
+    return correlations
+
+@traced
+def get_summary_statistics(df, cube=None):
     print("\nGenerating summary statistics...")
+    cube = get_cube(df, cube)
+    overall = cube['overall']
     
     stats_dict = {
-        'total_games': len(df),
-        'successful_games': df['Is_Successful'].sum(),
-        'success_rate': (df['Is_Successful'].sum() / len(df)) * 100,
-        'avg_global_sales': df['Global_Sales'].mean(),
-        'median_global_sales': df['Global_Sales'].median(),
-        'total_global_sales': df['Global_Sales'].sum(),
-        'top_genre_sales': df.groupby('Genre')['Global_Sales'].mean().idxmax(),
-        'top_genre_count': df['Genre'].value_counts().idxmax(),
-        'top_publisher_sales': df.groupby('Publisher')['Global_Sales'].sum().idxmax(),
-        'top_platform_sales': df.groupby('Platform')['Global_Sales'].sum().idxmax(),
-        'avg_critic_score': df['Critic_Score'].mean(),
-        'years_covered': f"{int(df['Year_of_Release'].min())}-{int(df['Year_of_Release'].max())}"
+        'total_games': overall['count'],
+        'successful_games': overall['successful'],
+        'success_rate': overall['success_rate'] * 100,
+        'avg_global_sales': overall['avg_sales'],
+        'median_global_sales': overall['median_sales'],
+        'total_global_sales': overall['total_sales'],
+        'top_genre_sales': cube['Genre']['avg_sales'].idxmax(),
+        'top_genre_count': cube['Genre']['count'].idxmax(),
+        'top_publisher_sales': cube['Publisher']['total_sales'].idxmax(),
+        'top_platform_sales': cube['Platform']['total_sales'].idxmax(),
+        'avg_critic_score': overall['avg_critic'],
+        'years_covered': f"{int(overall['first_year'])}-{int(overall['last_year'])}"
     }
+    if 'titles' in overall:
+        stats_dict['unique_titles'] = overall['titles']
     
     print("\nSummary Statistics:")
     for key, value in stats_dict.items():
@@ -42,7 +64,11 @@ def get_summary_statistics(df):
     
     return stats_dict
 
+@traced
 def perform_statistical_tests(df):
+    # scipy is only needed here; importing it lazily keeps the stats-only CLI commands fast to start
+    from scipy import stats
+
     print("\nPerforming statistical tests...")
     
     results = {}
@@ -79,16 +105,13 @@ def perform_statistical_tests(df):
     
     return results
 
-def analyze_genre_performance(df):
+@traced
+def analyze_genre_performance(df, cube=None):
     print("\nAnalyzing genre performance...")
+    cube = get_cube(df, cube)
     
-    genre_analysis = df.groupby('Genre').agg({
-        'Global_Sales': ['count', 'mean', 'median', 'sum'],
-        'Critic_Score': 'mean',
-        'Is_Successful': 'mean'
-    }).round(3)
-    
-    genre_analysis.columns = ['count', 'avg_sales', 'median_sales', 'total_sales', 'avg_critic', 'success_rate']
+    columns = ['count', 'avg_sales', 'median_sales', 'total_sales', 'avg_critic', 'success_rate']
+    genre_analysis = cube['Genre'][columns].round(3)
     genre_analysis['success_rate'] = genre_analysis['success_rate'] * 100
     
     print("\nGenre Performance Analysis:")
@@ -96,19 +119,13 @@ def analyze_genre_performance(df):
     
     return genre_analysis
 
-def analyze_publisher_performance(df):
+@traced
+def analyze_publisher_performance(df, cube=None):
     print("\nAnalyzing publisher performance...")
+    cube = get_cube(df, cube)
     
-    top_publishers = df.groupby('Publisher')['Global_Sales'].sum().nlargest(20)
-    
-    publisher_analysis = df[df['Publisher'].isin(top_publishers.index)].groupby('Publisher').agg({
-        'Global_Sales': ['count', 'mean', 'sum'],
-        'Critic_Score': 'mean',
-        'Is_Successful': 'mean',
-        'Company_Type': 'first'
-    }).round(3)
-    
-    publisher_analysis.columns = ['count', 'avg_sales', 'total_sales', 'avg_critic', 'success_rate', 'company_type']
+    columns = ['count', 'avg_sales', 'total_sales', 'avg_critic', 'success_rate', 'company_type']
+    publisher_analysis = cube['Publisher'].nlargest(20, 'total_sales')[columns].round(3)
     publisher_analysis['success_rate'] = publisher_analysis['success_rate'] * 100
     publisher_analysis = publisher_analysis.sort_values('total_sales', ascending=False)
     
@@ -117,19 +134,13 @@ def analyze_publisher_performance(df):
     
     return publisher_analysis
 
-def analyze_platform_performance(df):
+@traced
+def analyze_platform_performance(df, cube=None):
     print("\nAnalyzing platform performance...")
+    cube = get_cube(df, cube)
     
-    top_platforms = df.groupby('Platform')['Global_Sales'].sum().nlargest(15)
-    
-    platform_analysis = df[df['Platform'].isin(top_platforms.index)].groupby('Platform').agg({
-        'Global_Sales': ['count', 'mean', 'sum'],
-        'Critic_Score': 'mean',
-        'Is_Successful': 'mean',
-        'Year_of_Release': ['min', 'max']
-    }).round(3)
-    
-    platform_analysis.columns = ['count', 'avg_sales', 'total_sales', 'avg_critic', 'success_rate', 'first_year', 'last_year']
+    columns = ['count', 'avg_sales', 'total_sales', 'avg_critic', 'success_rate', 'first_year', 'last_year']
+    platform_analysis = cube['Platform'].nlargest(15, 'total_sales')[columns].round(3)
     platform_analysis['success_rate'] = platform_analysis['success_rate'] * 100
     platform_analysis['lifespan'] = platform_analysis['last_year'] - platform_analysis['first_year']
     platform_analysis = platform_analysis.sort_values('total_sales', ascending=False)
@@ -139,7 +150,44 @@ def analyze_platform_performance(df):
     
     return platform_analysis
 
-def generate_insights(df, stats_dict, correlation_matrix, statistical_tests):
+@traced
+def analyze_temporal_trends(df, cube=None, recent_years=10):
+    print("\nAnalyzing temporal trends...")
+    temporal = get_temporal_cube(df, cube)
+
+    columns = ['count', 'total_sales', 'success_rate', 'success_rate_3y', 'success_rate_5y', 'sales_growth_3y']
+    market = yearly_trends(temporal)
+    # the latest years hold a handful of stray releases; trends stop at the last full-sized year
+    last_year = market.index[market['count'] >= market['count'].max() * 0.1][-1]
+    market = market.loc[:last_year, columns].tail(recent_years).round(3)
+    
+    genre_share = yearly_trends(temporal, by='Genre')['sales_share_5y'].unstack()
+    genre_shift = pd.DataFrame({
+        'share_5y': genre_share.loc[last_year],
+        'share_5y_before': genre_share.loc[last_year - 5]
+    })
+    genre_shift['change'] = genre_shift['share_5y'] - genre_shift['share_5y_before']
+    genre_shift = (genre_shift * 100).round(2).sort_values('change', ascending=False)
+    
+    lifecycle = platform_lifecycle(temporal)
+    shares = lifecycle.div(lifecycle.sum(axis=1), axis=0)
+    platform_lifecycles = pd.DataFrame({
+        'lifetime_sales': lifecycle.sum(axis=1),
+        'peak_year': lifecycle.idxmax(axis=1),
+        'first_3y_share': shares.iloc[:, :3].sum(axis=1) * 100
+    }).nlargest(15, 'lifetime_sales').round(2)
+    
+    print(f"\nMarket trend (last {len(market)} years to {last_year}):")
+    print(market)
+    print(f"\nGenre share of sales, 5-year window ending {last_year} vs {last_year - 5} (%):")
+    print(genre_shift)
+    print("\nPlatform lifecycles (years since launch):")
+    print(platform_lifecycles)
+    
+    return {'market': market, 'genre_shift': genre_shift, 'platform_lifecycles': platform_lifecycles}
+
+@traced
+def generate_insights(df, stats_dict, correlation_matrix, statistical_tests, cube=None):
     print("\n" + "="*80)
     print("BUSINESS INSIGHTS AND RECOMMENDATIONS")
     print("="*80)
@@ -150,14 +198,15 @@ def generate_insights(df, stats_dict, correlation_matrix, statistical_tests):
     top_publisher = stats_dict['top_publisher_sales']
     top_platform = stats_dict['top_platform_sales']
     
-    genre_performance = df.groupby('Genre')['Global_Sales'].mean().sort_values(ascending=False)
+    cube = get_cube(df, cube)
+    genre_performance = cube['Genre']['avg_sales'].sort_values(ascending=False)
     best_genre = genre_performance.index[0]
     worst_genre = genre_performance.index[-1]
     
     critic_correlation = correlation_matrix.loc['Critic_Score', 'Global_Sales']
     
-    aaa_success = df[df['Company_Type'] == 'AAA']['Is_Successful'].mean() * 100
-    indie_success = df[df['Company_Type'] == 'Indie/Other']['Is_Successful'].mean() * 100
+    aaa_success = cube['Company_Type'].loc['AAA', 'success_rate'] * 100
+    indie_success = cube['Company_Type'].loc['Indie/Other', 'success_rate'] * 100
     
     print(f"\nMARKET OVERVIEW:")
     print(f"• Analyzed {total_games:,} games from {stats_dict['years_covered']}")
@@ -0,0 +1,224 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_processing import MAJOR_PUBLISHERS, COMPANY_TYPES, REGION_COLUMNS
+from tracing import traced
+
+# a mismatch on a categorical costs its weight; numerics cost one unit per `scale` of difference
+CATEGORICAL_WEIGHTS = {'Genre': 2.0, 'Platform': 1.5, 'Company_Type': 1.0, 'Rating': 0.75}
+NUMERIC_SCALES = {'Critic_Score': 10.0, 'Year_of_Release': 3.0}
+PCT_COLUMNS = [f'{region}_Pct' for region in REGION_COLUMNS]
+ROW_COLUMNS = ['Name', 'Platform', 'Year_of_Release', 'Genre', 'Publisher', 'Company_Type', 'Rating',
+               'Critic_Score', 'Global_Sales'] + REGION_COLUMNS + PCT_COLUMNS
+SALES_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+DEFAULT_K = 10
+# ports of one title sit next to each other in feature space; fetch extra so k distinct titles survive,
+# and fetch again this many times wider for any scenario still short of k
+OVERFETCH = 4
+LEAF_SIZE = 40
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_DIR = os.path.join(PROJECT_ROOT, 'models', 'comparables')
+INDEX_VERSION = 1
+# KDTree.__getstate__ leads with its four arrays: data, idx_array, node_data, node_bounds. That layout
+# is private to scikit-learn, so a saved index only loads under the version that wrote it
+TREE_ARRAYS = ['data', 'idx_array', 'node_data', 'node_bounds']
+
+def fit_encoders(df):
+    categories = {col: sorted(df[col].dropna().astype(str).unique()) for col in CATEGORICAL_WEIGHTS}
+    return {
+        'categories': categories,
+        'lookup': {col: {level: i for i, level in enumerate(levels)} for col, levels in categories.items()},
+        # a scenario that leaves a numeric out is placed at the historical median
+        'medians': {col: float(df[col].median()) for col in NUMERIC_SCALES}
+    }
+
+def scenario_columns(scenarios):
+    # scenarios arrive a handful at a time; plain column lists skip the cost of building a frame
+    scenarios = [scenarios] if isinstance(scenarios, dict) else list(scenarios)
+    columns = {col: [scenario.get(col) for scenario in scenarios]
+               for col in list(NUMERIC_SCALES) + list(CATEGORICAL_WEIGHTS) + ['Publisher']}
+    columns['Company_Type'] = [
+        tier if tier is not None or publisher is None
+        else COMPANY_TYPES[0] if publisher in MAJOR_PUBLISHERS else COMPANY_TYPES[1]
+        for tier, publisher in zip(columns['Company_Type'], columns['Publisher'])
+    ]
+    return columns, len(scenarios)
+
+def encode_comparables(columns, n_rows, encoders):
+    lookup = encoders['lookup']
+    X = np.zeros((n_rows, len(NUMERIC_SCALES) + sum(len(levels) for levels in lookup.values())))
+
+    for i, (col, scale) in enumerate(NUMERIC_SCALES.items()):
+        values = np.asarray(columns[col], dtype=np.float64) if col in columns else np.full(n_rows, np.nan)
+        X[:, i] = np.where(np.isnan(values), encoders['medians'][col], values) / scale
+
+    # one-hot at weight/sqrt(2): two different levels end up exactly `weight` apart, and a
+    # missing level sits at the same distance from all of them
+    offset = len(NUMERIC_SCALES)
+    for col, levels in lookup.items():
+        if col in columns:
+            codes = np.array([levels.get(str(value), -1) for value in columns[col]], dtype=np.int64)
+            rows = np.flatnonzero(codes >= 0)
+            X[rows, offset + codes[rows]] = CATEGORICAL_WEIGHTS[col] / np.sqrt(2)
+        offset += len(levels)
+
+    return X
+
+@traced
+def build_comparables_index(df, leaf_size=LEAF_SIZE):
+    from sklearn.neighbors import KDTree
+
+    print("Building comparables index...")
+    start = time.perf_counter()
+    encoders = fit_encoders(df)
+    # KD splits are along single coordinates, so on the one-hot blocks they partition releases by
+    # category; on this encoding that prunes better than a ball tree
+    tree = KDTree(encode_comparables(df, len(df), encoders), leaf_size=leaf_size)
+
+    title_ids = df['Title_ID'] if 'Title_ID' in df.columns else pd.RangeIndex(len(df))
+    rows = df[[col for col in ROW_COLUMNS if col in df.columns]].reset_index(drop=True)
+    # plain strings: rebuilding a 600-level categorical for every handful of fetched rows costs more than the rows
+    rows = rows.astype({col: object for col in rows.columns if isinstance(rows[col].dtype, pd.CategoricalDtype)})
+    index = {
+        'version': INDEX_VERSION,
+        'encoders': encoders,
+        'tree': tree,
+        'title_ids': np.asarray(title_ids, dtype=np.int64),
+        'rows': rows
+    }
+    print(f"Indexed {len(df)} releases in {time.perf_counter() - start:.2f}s")
+    return index
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def save_comparables_index(index, index_dir=DEFAULT_INDEX_DIR):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    os.makedirs(index_dir, exist_ok=True)
+    state = index['tree'].__getstate__()
+
+    # the arrays go to .npy files so a load can memory-map them instead of reading them in
+    arrays = dict(zip(TREE_ARRAYS, state[:len(TREE_ARRAYS)]), title_ids=index['title_ids'])
+    for name, array in arrays.items():
+        _write_atomic(os.path.join(index_dir, f'{name}.npy'), lambda f: np.save(f, array))
+
+    # one record batch: taking rows from a multi-chunk table concatenates the chunks on every call
+    rows = pa.Table.from_pandas(index['rows'], preserve_index=False)
+    _write_atomic(os.path.join(index_dir, 'rows.feather'),
+                  lambda f: feather.write_feather(rows, f, compression='uncompressed', chunksize=max(len(rows), 1)))
+
+    # written last: a directory without meta.pkl is an incomplete index
+    import sklearn
+
+    meta = {'version': index['version'], 'sklearn_version': sklearn.__version__, 'encoders': index['encoders'],
+            'tree_state': state[len(TREE_ARRAYS):]}
+    _write_atomic(os.path.join(index_dir, 'meta.pkl'),
+                  lambda f: pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"Comparables index saved to {index_dir}")
+
+def load_comparables_index(index_dir=DEFAULT_INDEX_DIR):
+    import sklearn
+    from sklearn.neighbors import KDTree
+    import pyarrow.feather as feather
+
+    with open(os.path.join(index_dir, 'meta.pkl'), 'rb') as f:
+        meta = pickle.load(f)
+    if meta.get('version') != INDEX_VERSION:
+        raise ValueError(f"{index_dir} was built by index version {meta.get('version')}, expected {INDEX_VERSION}")
+    if meta.get('sklearn_version') != sklearn.__version__:
+        raise ValueError(f"{index_dir} was built with scikit-learn {meta.get('sklearn_version')}, "
+                         f"running {sklearn.__version__}; rebuild it")
+
+    arrays = {name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r')
+              for name in TREE_ARRAYS + ['title_ids']}
+    tree = KDTree.__new__(KDTree)
+    tree.__setstate__(tuple(arrays[name] for name in TREE_ARRAYS) + tuple(meta['tree_state']))
+
+    return {
+        'version': meta['version'],
+        'encoders': meta['encoders'],
+        'tree': tree,
+        'title_ids': arrays['title_ids'],
+        # kept as an arrow table over the mapped file; only the neighbours' rows are ever converted
+        'rows': feather.read_table(os.path.join(index_dir, 'rows.feather'), memory_map=True)
+    }
+
+def _take_rows(rows, positions):
+    if isinstance(rows, pd.DataFrame):
+        return rows.iloc[positions].reset_index(drop=True)
+    return rows.take(positions).to_pandas()
+
+def _first_per_title(title_ids, k):
+    # per scenario, the nearest release of each title, then the first k of those in distance order
+    order = np.argsort(title_ids, axis=1, kind='stable')
+    ranked = np.take_along_axis(title_ids, order, axis=1)
+    first = np.ones_like(ranked, dtype=bool)
+    first[:, 1:] = ranked[:, 1:] != ranked[:, :-1]
+
+    keep = np.zeros_like(first)
+    np.put_along_axis(keep, order, first, axis=1)
+    return keep & (np.cumsum(keep, axis=1) <= k)
+
+def find_comparables(index, scenarios, k=DEFAULT_K):
+    """The k nearest distinct historical titles for each scenario, with their sales profile.
+
+    A scenario is a dict of Genre, Platform, Company_Type (or Publisher), Critic_Score, Rating and
+    Year_of_Release; any of them may be left out. Every result is indexed by scenario number.
+    """
+    columns, n_scenarios = scenario_columns(scenarios)
+    n_rows = len(index['title_ids'])
+
+    # one tree query and one row fetch for the whole batch of scenarios
+    X = encode_comparables(columns, n_scenarios, index['encoders'])
+    fetch = min(k * OVERFETCH, n_rows)
+    distances, positions = index['tree'].query(X, k=fetch)
+    keep = _first_per_title(index['title_ids'][positions], k)
+
+    short = np.flatnonzero(keep.sum(axis=1) < k)
+    while len(short) and fetch < n_rows:
+        fetch = min(fetch * OVERFETCH, n_rows)
+        more_distances, more_positions = index['tree'].query(X[short], k=fetch)
+        distances = np.pad(distances, ((0, 0), (0, fetch - distances.shape[1])), constant_values=np.inf)
+        positions = np.pad(positions, ((0, 0), (0, fetch - positions.shape[1])))
+        distances[short], positions[short] = more_distances, more_positions
+        keep = _first_per_title(index['title_ids'][positions], k)
+        keep[np.isinf(distances)] = False
+        short = short[keep[short].sum(axis=1) < k]
+
+    scenario = np.nonzero(keep)[0]
+    comparables = _take_rows(index['rows'], positions[keep])
+    comparables.insert(0, 'scenario', scenario)
+    comparables.insert(1, 'distance', distances[keep])
+
+    # (scenario, rank) matrices, NaN where a scenario found fewer than k titles
+    rank = (np.cumsum(keep, axis=1) - 1)[keep]
+    def by_scenario(col):
+        matrix = np.full((n_scenarios, k), np.nan)
+        matrix[scenario, rank] = comparables[col].to_numpy(dtype=np.float64)
+        return matrix
+
+    with np.errstate(all='ignore'):
+        regional_mix = np.column_stack([np.nanmean(by_scenario(col), axis=1) for col in PCT_COLUMNS])
+        sales_quantiles = np.nanquantile(by_scenario('Global_Sales'), SALES_QUANTILES, axis=1).T
+    scenarios_index = pd.RangeIndex(n_scenarios, name='scenario')
+    return {
+        'comparables': comparables,
+        'regional_mix': pd.DataFrame(regional_mix, index=scenarios_index, columns=PCT_COLUMNS),
+        'sales_quantiles': pd.DataFrame(sales_quantiles, index=scenarios_index,
+                                        columns=[f'q{q:g}' for q in SALES_QUANTILES])
+    }
+
+if __name__ == "__main__":
+    from data_processing import get_processed_data
+
+    save_comparables_index(build_comparables_index(get_processed_data()))
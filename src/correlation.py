@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+def co_moments(values, bounds=None):
+    # pairwise-complete sufficient statistics: for every column pair (i, j), sums over rows where both are present.
+    # bounds splits group-sorted rows into contiguous segments, giving one set of moments per segment
+    values = np.asarray(values, dtype=np.float64)
+    bounds = [0, len(values)] if bounds is None else bounds
+    n_groups, n_columns = len(bounds) - 1, values.shape[1]
+    moments = {name: np.zeros((n_groups, n_columns, n_columns)) for name in ('n', 'sx', 'sxx', 'sxy')}
+
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    mask = present.astype(np.float64)
+    squared = filled ** 2
+
+    for group, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        m, x, xx = mask[start:end], filled[start:end], squared[start:end]
+        moments['n'][group] = m.T @ m
+        moments['sx'][group] = x.T @ m
+        moments['sxx'][group] = xx.T @ m
+        moments['sxy'][group] = x.T @ x
+
+    return moments
+
+def correlation_from_moments(moments):
+    n, sx, sxx, sxy = moments['n'], moments['sx'], moments['sxx'], moments['sxy']
+    sy = np.swapaxes(sx, -1, -2)
+    syy = np.swapaxes(sxx, -1, -2)
+
+    covariance = n * sxy - sx * sy
+    variance = (n * sxx - sx ** 2) * (n * syy - sy ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.sqrt(variance)
+    correlation[n < 2] = np.nan
+    return correlation
+
+def average_ranks(values):
+    # tie-averaged ranks of the present values; NaNs sort last and stay NaN
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+
+    new_block = np.r_[True, sorted_values[1:] != sorted_values[:-1]]
+    block_start = np.flatnonzero(new_block)
+    block_end = np.r_[block_start[1:], len(values)]
+
+    ranks = np.empty(len(values))
+    ranks[order] = ((block_start + block_end + 1) / 2)[np.cumsum(new_block) - 1]
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+def _rank_values(values, bounds):
+    ranks = np.empty_like(values)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        for i in range(values.shape[1]):
+            ranks[start:end, i] = average_ranks(values[start:end, i])
+    return ranks
+
+def compute_correlations(df, columns, by=None, methods=('pearson', 'spearman')):
+    columns = [col for col in columns if col in df.columns]
+
+    values = df[columns].to_numpy(dtype=np.float64)
+    bounds = [0, len(values)]
+
+    if by is not None:
+        groups, levels = pd.factorize(df[by], sort=True)
+        groups = groups.astype(np.int16 if len(levels) < 2 ** 15 else np.int64)
+        # one stable (radix) sort makes every segment a contiguous slice; nothing is rescanned per segment
+        order = np.argsort(groups, kind='stable')
+        order = order[groups[order] >= 0]
+        values = values[order]
+        bounds = np.searchsorted(groups[order], np.arange(len(levels) + 1))
+
+    # Spearman's rho is Pearson on ranks; ranks are taken over each column's present values
+    # (within each segment), not re-ranked per column pair as pandas does
+    inputs = {
+        'pearson': lambda: values,
+        'spearman': lambda: _rank_values(values, bounds)
+    }
+
+    results = {}
+    for method in methods:
+        matrices = correlation_from_moments(co_moments(inputs[method](), bounds))
+        if by is None:
+            results[method] = pd.DataFrame(matrices[0], index=columns, columns=columns)
+        else:
+            index = pd.MultiIndex.from_product([levels.astype(str), columns], names=[by, None])
+            results[method] = pd.DataFrame(matrices.reshape(-1, len(columns)), index=index, columns=columns)
+
+    return results
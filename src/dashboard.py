@@ -0,0 +1,50 @@
+import os
+
+import streamlit as st
+
+from data_processing import get_processed_data
+from query import AGGREGATIONS, QUERY_MEASURES, build_query_index, query, query_groups
+
+# run with: streamlit run src/dashboard.py
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_PATH = os.path.join(PROJECT_ROOT, 'data', 'video_games_sales.csv')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'cache')
+FILTER_COLUMNS = ['Genre', 'Platform', 'Publisher', 'Release_Era', 'Rating', 'Company_Type']
+
+@st.cache_resource
+def load_index():
+    # built once per server process; every widget change is then an index lookup, not a frame scan
+    return build_query_index(get_processed_data(RAW_PATH, CACHE_DIR))
+
+def main():
+    st.set_page_config(page_title='Video Game Sales Explorer', layout='wide')
+    st.title('Video Game Sales Explorer')
+    index = load_index()
+
+    filters = {}
+    with st.sidebar:
+        for column in FILTER_COLUMNS:
+            chosen = st.multiselect(column, index['dimensions'][column]['levels'])
+            if chosen:
+                filters[column] = chosen
+
+        years = index['ranges']['Year_of_Release']['sorted']
+        first, last = int(years[0]), int(years[-1])
+        low, high = st.slider('Year of release', first, last, (first, last))
+        if (low, high) != (first, last):
+            filters['Year_of_Release'] = (low, high)
+
+        measure = st.selectbox('Measure', QUERY_MEASURES, index=QUERY_MEASURES.index('Global_Sales'))
+        agg = st.selectbox('Aggregate', AGGREGATIONS, index=AGGREGATIONS.index('sum'))
+        by = st.selectbox('Break down by', FILTER_COLUMNS + ['Year_of_Release'])
+
+    columns = st.columns(3)
+    columns[0].metric('Games', f"{query(index, filters, measure, 'count'):,}")
+    columns[1].metric(f'{agg} {measure}', f"{query(index, filters, measure, agg):,.3f}")
+    columns[2].metric('Success rate', f"{query(index, filters, 'Is_Successful', 'mean'):.1%}")
+
+    breakdown = query_groups(index, by, filters, measure, agg).sort_values(ascending=False)
+    st.bar_chart(breakdown.head(30))
+    st.dataframe(breakdown.to_frame())
+
+main()
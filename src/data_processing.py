@@ -1,14 +1,167 @@
 import pandas as pd
 import numpy as np
 import os 
+import ast
+import hashlib
+from tracing import traced
+from titles import new_title_index, assign_titles
+from validation import validate_frame, format_validation_report, save_quarantine
+
+CATEGORICAL_COLUMNS = ['Platform', 'Genre', 'Publisher', 'Developer', 'Rating']
+SALES_COLUMNS = ['NA_Sales', 'EU_Sales', 'JP_Sales', 'Other_Sales', 'Global_Sales']
+REGION_COLUMNS = ['NA_Sales', 'EU_Sales', 'JP_Sales', 'Other_Sales']
+
+MAJOR_PUBLISHERS = frozenset([
+    'Nintendo', 'Electronic Arts', 'Activision', 'Sony Computer Entertainment',
+    'Ubisoft', 'Take-Two Interactive', 'THQ', 'Sega', 'Microsoft Game Studios',
+    'Capcom', 'Square Enix', 'Bandai Namco Games', 'Konami Digital Entertainment'
+])
+COMPANY_TYPES = ['AAA', 'Indie/Other']
+# clean_data fills missing publishers with this
+UNKNOWN_PUBLISHER = 'Unknown'
+
+# left-closed year bins: [-inf, 1990) -> '1980s', ..., [2010, inf) -> '2010s'
+ERA_BINS = [-np.inf, 1990, 2000, 2010, np.inf]
+ERA_LABELS = ['1980s', '1990s', '2000s', '2010s']
+
+RAW_SCHEMA = {
+    'Name': 'object',
+    'Platform': 'object',
+    'Year_of_Release': 'float32',
+    'Genre': 'object',
+    'Publisher': 'object',
+    # sales stay float64: float32 cents drift (0.17 -> 0.17000000178813934) and the cube and query
+    # layer must agree on every sum
+    'NA_Sales': 'float64',
+    'EU_Sales': 'float64',
+    'JP_Sales': 'float64',
+    'Other_Sales': 'float64',
+    'Global_Sales': 'float64',
+    'Critic_Score': 'float32',
+    'Critic_Count': 'float32',
+    'User_Score': 'object',
+    'User_Count': 'float32',
+    'Developer': 'object',
+    'Rating': 'object'
+}
+
+# checked on every load, before compaction so 'tbd' user scores are still visible
+VALIDATION_RULES = [
+    {'name': 'negative_sales', 'kind': 'range', 'columns': SALES_COLUMNS, 'min': 0, 'action': 'quarantine'},
+    # each column is rounded to 0.01 on its own, so five of them can disagree by up to 0.025
+    {'name': 'global_sales_mismatch', 'kind': 'sum', 'column': 'Global_Sales', 'parts': REGION_COLUMNS,
+     'tolerance': 0.03, 'action': 'quarantine'},
+    {'name': 'critic_score_range', 'kind': 'range', 'columns': ['Critic_Score'], 'min': 0, 'max': 100,
+     'action': 'quarantine'},
+    {'name': 'user_score_range', 'kind': 'range', 'columns': ['User_Score'], 'min': 0, 'max': 10,
+     'action': 'quarantine'},
+    {'name': 'negative_counts', 'kind': 'range', 'columns': ['Critic_Count', 'User_Count'], 'min': 0,
+     'action': 'quarantine'},
+    # not yet rated rather than wrong: the score is treated as missing and imputed
+    {'name': 'user_score_tbd', 'kind': 'values', 'columns': ['User_Score'], 'values': ['tbd'], 'action': 'flag'},
+    {'name': 'duplicate_key', 'kind': 'duplicate', 'columns': ['Name', 'Platform', 'Year_of_Release'],
+     'action': 'quarantine'}
+]
+
+# bump when clean_data/create_features change output in a way the source hash would miss
+PIPELINE_VERSION = 3
+
+IMPUTE_COLUMNS = ['Critic_Score', 'User_Score', 'Critic_Count', 'User_Count']
+# most specific grouping first; anything still missing falls back to the global median
+IMPUTE_LEVELS = [['Platform', 'Genre'], ['Genre']]
+
+# pyarrow leaves empty and 'N/A' strings as-is; the C parser treats them as missing
+PYARROW_NA_STRINGS = ['', 'N/A', 'NA', 'NaN', 'nan', 'null']
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def compact_frame(df, categorical_columns=CATEGORICAL_COLUMNS):
+    for col in categorical_columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in SALES_COLUMNS:
+        if col in df.columns and df[col].dtype != np.float64:
+            df[col] = df[col].astype(np.float64)
+
+    if 'User_Score' in df.columns and df['User_Score'].dtype == object:
+        df['User_Score'] = pd.to_numeric(df['User_Score'], errors='coerce').astype('float32')
+
+    return df
+
+def validate_raw_data(df, rules=VALIDATION_RULES, quarantine_path=None):
+    clean_df, quarantined_df, report = validate_frame(df, rules)
+    print(format_validation_report(report))
+    if quarantine_path is not None and len(quarantined_df):
+        save_quarantine(quarantined_df, quarantine_path)
+    return clean_df.reset_index(drop=True)
+
+@traced
+def load_raw_data(file_path='data/video_games_sales.csv', engine='c', compact=True, validate=True,
+                  quarantine_path=None):
+    if not compact:
+        df = pd.read_csv(file_path, engine=engine)
+        print(f"original dataset shape: {df.shape}")
+        return validate_raw_data(df, quarantine_path=quarantine_path) if validate else df
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in RAW_SCHEMA.items() if col in header}
+
+    df = pd.read_csv(file_path, dtype=dtypes, engine=engine)
+    if engine == 'pyarrow':
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].mask(df[col].isin(PYARROW_NA_STRINGS))
+    print(f"original dataset shape: {df.shape}")
+    if validate:
+        df = validate_raw_data(df, quarantine_path=quarantine_path)
+
+    before_mb = frame_memory_mb(df)
+    df = compact_frame(df)
+    print(f"Frame memory: {before_mb:.2f} MB -> {frame_memory_mb(df):.2f} MB after compaction")
+
+    return df
+
+def _object_index(index):
+    return pd.MultiIndex.from_frame(index.to_frame(index=False).astype(object))
+
+@traced
+def compute_group_medians(df, columns=IMPUTE_COLUMNS, levels=IMPUTE_LEVELS):
+    columns = [col for col in columns if col in df.columns]
+
+    medians = {}
+    for keys in levels:
+        level_medians = df.groupby(keys, observed=True)[columns].median()
+        level_medians.index = _object_index(level_medians.index)
+        medians[tuple(keys)] = level_medians
+    medians[()] = df[columns].median()
+
+    return medians
+
+def impute_group_medians(df, medians, columns=IMPUTE_COLUMNS):
+    columns = [col for col in columns if col in df.columns]
+    values = df[columns].to_numpy(dtype=np.float64)
+
+    for keys, level_medians in medians.items():
+        missing = np.isnan(values)
+        if not missing.any():
+            break
+
+        if keys:
+            row_keys = pd.MultiIndex.from_frame(df[list(keys)])
+            fill = level_medians[columns].reindex(row_keys).to_numpy(dtype=np.float64)
+        else:
+            fill = np.broadcast_to(level_medians[columns].to_numpy(dtype=np.float64), values.shape)
+        values = np.where(missing, fill, values)
+
+    for i, col in enumerate(columns):
+        df[col] = values[:, i].astype(df[col].dtype)
 
-def load_raw_data(file_path='data/video_games_sales.csv'):
-    df = pd.read_csv(file_path)
-    print(f"original dataset shape: {df.shape}")  
     return df
 
-def clean_data(df):
-    df_clean = df.copy()
+@traced
+def clean_data(df, copy=True, impute_columns=IMPUTE_COLUMNS, medians=None):
+    df_clean = df.copy() if copy else df
     
     initial_shape = df_clean.shape[0] 
     
@@ -16,67 +169,162 @@ def clean_data(df):
     missing_data = (df_clean.isnull().sum() / len(df_clean)) * 100
     print(missing_data[missing_data > 0]) 
     
-    df_clean['Critic_Score'] = df_clean.groupby(['Platform', 'Genre'])['Critic_Score'].transform(
-        lambda x: x.fillna(x.median())
-    )
-    df_clean['Critic_Score'].fillna(df_clean['Critic_Score'].median(), inplace=True)
-    df_clean['Publisher'].fillna('Unknown', inplace=True)
-    df_clean = df_clean.dropna(subset=['Year_of_Release', 'Genre', 'Platform'])
+    if medians is None:
+        medians = compute_group_medians(df_clean, impute_columns)
+    impute_group_medians(df_clean, medians, impute_columns)
+
+    if isinstance(df_clean['Publisher'].dtype, pd.CategoricalDtype) and UNKNOWN_PUBLISHER not in df_clean['Publisher'].cat.categories:
+        df_clean['Publisher'] = df_clean['Publisher'].cat.add_categories(UNKNOWN_PUBLISHER)
+    df_clean['Publisher'] = df_clean['Publisher'].fillna(UNKNOWN_PUBLISHER)
+    df_clean.dropna(subset=['Year_of_Release', 'Genre', 'Platform'], inplace=True)
     
     print(f"Removed {initial_shape - df_clean.shape[0]} rows with critical missing values")
     
     return df_clean
 
-def create_features(df):
-    df_processed = df.copy()
-    
-    major_publishers = [
-        'Nintendo', 'Electronic Arts', 'Activision', 'Sony Computer Entertainment',
-        'Ubisoft', 'Take-Two Interactive', 'THQ', 'Sega', 'Microsoft Game Studios',
-        'Capcom', 'Square Enix', 'Bandai Namco Games', 'Konami Digital Entertainment'
-    ]
-    
-    df_processed['Company_Type'] = df_processed['Publisher'].apply(
-        lambda x: 'AAA' if x in major_publishers else 'Indie/Other'
+@traced
+def create_features(df, copy=True, major_publishers=MAJOR_PUBLISHERS, era_bins=ERA_BINS, era_labels=ERA_LABELS):
+    df_processed = df.copy() if copy else df
+
+    is_major = df_processed['Publisher'].isin(major_publishers).to_numpy()
+    df_processed['Company_Type'] = pd.Categorical.from_codes(
+        (~is_major).astype(np.int8), categories=COMPANY_TYPES
     )
 
-    def categorize_era(year):
-        if pd.isna(year):
-            return 'Unknown'
-        year = int(year)
-        if year < 1990:
-            return '1980s'
-        elif year < 2000:
-            return '1990s'
-        elif year < 2010:
-            return '2000s'
-        else:
-            return '2010s'
-    
-    df_processed['Release_Era'] = df_processed['Year_of_Release'].apply(categorize_era)
+    era = pd.cut(df_processed['Year_of_Release'], bins=era_bins, labels=era_labels, right=False)
+    df_processed['Release_Era'] = era.cat.add_categories('Unknown').fillna('Unknown')
 
     df_processed['Is_Successful'] = df_processed['Global_Sales'] > 1.0
     df_processed['Sales_Category'] = pd.cut(df_processed['Global_Sales'], 
         bins=[0, 0.1, 1, 5, 10, 100],
         labels=['flop', 'below average', 'average', 'hit', 'blockbuster'])
     
-    regions = ['NA_Sales', 'EU_Sales', 'JP_Sales', 'Other_Sales'] 
-    for region in regions:
-        df_processed[f'{region}_Pct'] = (df_processed[region] / df_processed['Global_Sales'].replace(0, np.nan)) * 100
-        df_processed[f'{region}_Pct'].fillna(0, inplace=True)
+    global_sales = df_processed['Global_Sales'].to_numpy()
+    global_sales = np.where(global_sales == 0, np.nan, global_sales)
+    region_pct = df_processed[REGION_COLUMNS].to_numpy() / global_sales[:, None] * 100
+    df_processed[[f'{region}_Pct' for region in REGION_COLUMNS]] = np.where(np.isnan(region_pct), 0, region_pct)
         
     return df_processed
 
+@traced
+def resolve_titles(df, copy=True, index=None):
+    # pass a title index to keep IDs stable across calls; it is updated in place with the new rows
+    df_titles = df.copy() if copy else df
+    index = new_title_index() if index is None else index
+
+    title_ids = assign_titles(index, df_titles['Name'], df_titles['Year_of_Release'], df_titles['Global_Sales'])
+    df_titles['Title_ID'] = title_ids
+    df_titles['Title_Ports'] = index['titles']['ports'][title_ids].astype(np.int16)
+    df_titles['Title_Global_Sales'] = index['titles']['sales'][title_ids].astype(np.float32)
+
+    ports = np.bincount(title_ids)
+    print(f"Resolved {len(df_titles)} releases into {np.count_nonzero(ports)} titles "
+          f"({int((ports > 1).sum())} on more than one platform)")
+
+    return df_titles
+
+@traced
 def save_processed_data(df, file_path='data/processed_sales.csv'):
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     df.to_csv(file_path, index=False)
     print(f"Processed data saved to {file_path}")
 
-def get_processed_data():
-    raw_df = load_raw_data('data/video_games_sales.csv')
-    cleaned_df = clean_data(raw_df)
-    processed_df = create_features(cleaned_df)
-    save_processed_data(processed_df)
+def project_sources(source, seen=None):
+    # the file plus every project module it imports (module level or inside functions), transitively
+    seen = set() if seen is None else seen
+    source = os.path.abspath(source)
+    if source in seen:
+        return seen
+    seen.add(source)
+
+    with open(source) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            path = os.path.join(os.path.dirname(source), f"{name}.py")
+            if os.path.exists(path):
+                project_sources(path, seen)
+    return seen
+
+def file_digest(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def pipeline_cache_key(raw_path):
+    digest = hashlib.sha256()
+    digest.update(file_digest(raw_path).encode())
+    digest.update(str(PIPELINE_VERSION).encode())
+    # this module and the ones it calls into (titles, validation) all shape the processed frame
+    for source in sorted(project_sources(__file__)):
+        digest.update(f"{os.path.basename(source)}:{file_digest(source)}".encode())
+    return digest.hexdigest()[:16]
+
+@traced
+def load_cached_data(cache_path):
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+
+    if not os.path.exists(cache_path):
+        return None
+
+    table = feather.read_table(cache_path, memory_map=True)
+    return table.to_pandas()
+
+@traced
+def save_cached_data(df, cache_path):
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        print("pyarrow not installed, skipping processed data cache")
+        return
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+    print(f"Processed data cached to {cache_path}")
+
+    # entries under any other key belong to an older raw file or pipeline and are never read again
+    current = os.path.basename(cache_path)
+    for entry in os.listdir(os.path.dirname(cache_path)):
+        if entry.startswith('processed_') and entry.endswith('.feather') and entry != current:
+            os.remove(os.path.join(os.path.dirname(cache_path), entry))
+
+@traced
+def get_processed_data(raw_path='data/video_games_sales.csv', cache_dir='data/cache', refresh=False,
+                       processed_path=None, quarantine_path=None):
+    # the feather cache is what gets reused; a CSV copy is only written when processed_path asks for one
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, f"processed_{pipeline_cache_key(raw_path)}.feather")
+
+        if not refresh:
+            processed_df = load_cached_data(cache_path)
+            if processed_df is not None:
+                print(f"Loaded processed data from cache {cache_path}")
+                if processed_path is not None:
+                    save_processed_data(processed_df, processed_path)
+                print(f"\nFinal dataset shape: {processed_df.shape}")
+                return processed_df
+
+    raw_df = load_raw_data(raw_path, quarantine_path=quarantine_path)
+    cleaned_df = clean_data(raw_df, copy=False)
+    processed_df = resolve_titles(create_features(cleaned_df, copy=False), copy=False).reset_index(drop=True)
+    if processed_path is not None:
+        save_processed_data(processed_df, processed_path)
+    if cache_path is not None:
+        save_cached_data(processed_df, cache_path)
     
     print(f"\nFinal dataset shape: {processed_df.shape}") 
     print(f"Final dataset columns: {list(processed_df.columns)}")
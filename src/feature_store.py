@@ -0,0 +1,157 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from tracing import traced
+
+# every row gets, per key, what that publisher/developer/platform/genre had done before its release year
+PRIOR_KEYS = ['Publisher', 'Developer', 'Platform', 'Genre']
+PRIOR_STATS = ['Releases', 'Hit_Rate', 'Mean_Sales']
+TOTALS = ['releases', 'hits', 'sales']
+# thin histories are pulled towards the rate of all releases before the same year, as if this
+# many average releases had been seen
+PRIOR_STRENGTH = 10.0
+GLOBAL_LEVEL = '_all'
+
+ROW_KEYS = ['Name', 'Platform', 'Year_of_Release']
+DEFAULT_STORE_DIR = 'data/feature_store'
+FEATURE_STORE_VERSION = 1
+
+def prior_columns(keys=PRIOR_KEYS):
+    return [f'{key}_Prior_{stat}' for key in keys for stat in PRIOR_STATS]
+
+def _year_totals(df, key):
+    levels = np.full(len(df), GLOBAL_LEVEL, dtype=object) if key is None else df[key].astype(object).to_numpy()
+    years = df['Year_of_Release'].to_numpy(dtype=np.float64)
+    values = pd.DataFrame({
+        'releases': np.ones(len(df)),
+        'hits': df['Is_Successful'].to_numpy(dtype=np.float64),
+        'sales': df['Global_Sales'].to_numpy(dtype=np.float64)
+    })
+    # one row per (level, year), sorted, so a running sum within each level is the history up to that year
+    totals = values.groupby([levels, years]).sum()
+    totals.index.names = ['level', 'year']
+    return totals, levels, years
+
+def _prior_totals(df, key, base):
+    totals, levels, years = _year_totals(df, key)
+    through = totals.groupby(level='level').cumsum()
+    # exclusive of the year itself: releases from the same year are not known to each other
+    before = through - totals
+
+    # totals carried over from years already in the store are all strictly earlier than these rows
+    level_index = before.index.get_level_values('level')
+    if base is not None:
+        before += base.reindex(level_index).fillna(0).to_numpy()
+    last = through.groupby(level='level').last()
+    base = last if base is None else base.add(last, fill_value=0)
+
+    rows = before.index.get_indexer(pd.MultiIndex.from_arrays([levels, years]))
+    priors = np.where(rows[:, None] >= 0, before.to_numpy()[rows], 0)
+    return priors, base
+
+def compute_priors(df, state=None, keys=PRIOR_KEYS, strength=PRIOR_STRENGTH):
+    """Per-row prior release count, hit rate and mean sales for each key, from earlier release years only.
+
+    Pass the state returned by an earlier call to continue from the years it covered; every row
+    must then be from a later year. Returns the priors aligned with `df` and the updated state.
+    """
+    if state is not None:
+        if state.get('version') != FEATURE_STORE_VERSION or state['keys'] != list(keys):
+            raise ValueError(f"feature store state is for version {state.get('version')} keys {state['keys']}; "
+                             f"rebuild it for version {FEATURE_STORE_VERSION} keys {list(keys)}")
+        earliest = df['Year_of_Release'].min()
+        if earliest <= state['last_year']:
+            raise ValueError(f"rows from {earliest:.0f} would change priors the store already served "
+                             f"(it covers up to {state['last_year']:.0f}); rebuild the store instead")
+
+    base = state['totals'] if state is not None else {}
+    totals = {}
+
+    global_priors, totals[GLOBAL_LEVEL] = _prior_totals(df, None, base.get(GLOBAL_LEVEL))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        global_rate = global_priors[:, 1] / global_priors[:, 0]
+        global_mean = global_priors[:, 2] / global_priors[:, 0]
+
+    priors = pd.DataFrame(index=df.index)
+    for key in keys:
+        key_priors, totals[key] = _prior_totals(df, key, base.get(key))
+        releases, hits, sales = key_priors.T
+        priors[f'{key}_Prior_Releases'] = releases.astype(np.int32)
+        priors[f'{key}_Prior_Hit_Rate'] = ((hits + strength * global_rate) / (releases + strength)).astype(np.float32)
+        priors[f'{key}_Prior_Mean_Sales'] = ((sales + strength * global_mean) / (releases + strength)).astype(np.float32)
+
+    last_year = float(df['Year_of_Release'].max())
+    state = {
+        'version': FEATURE_STORE_VERSION,
+        'keys': list(keys),
+        'last_year': last_year if state is None else max(last_year, state['last_year']),
+        'totals': totals
+    }
+    return priors, state
+
+def _write_part(priors, store_dir, part_id):
+    import pyarrow.feather as feather
+
+    path = os.path.join(store_dir, f'priors-{part_id:05d}.feather')
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(priors.reset_index(drop=True), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return os.path.basename(path)
+
+def save_store_state(state, store_dir=DEFAULT_STORE_DIR):
+    path = os.path.join(store_dir, 'state.pkl')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_store_state(store_dir=DEFAULT_STORE_DIR):
+    with open(os.path.join(store_dir, 'state.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def _store_rows(df, priors):
+    rows = df[ROW_KEYS].reset_index(drop=True)
+    rows = rows.astype({col: object for col in ROW_KEYS if isinstance(rows[col].dtype, pd.CategoricalDtype)})
+    return pd.concat([rows, priors.reset_index(drop=True)], axis=1)
+
+@traced
+def build_feature_store(df, store_dir=DEFAULT_STORE_DIR, keys=PRIOR_KEYS):
+    print(f"Building feature store in {store_dir}...")
+    os.makedirs(store_dir, exist_ok=True)
+
+    priors, state = compute_priors(df, keys=keys)
+    state['parts'] = [_write_part(_store_rows(df, priors), store_dir, 0)]
+    # written last: the parts it lists are already on disk
+    save_store_state(state, store_dir)
+
+    print(f"Stored priors for {len(df)} releases up to {state['last_year']:.0f}")
+    return state
+
+@traced
+def add_release_years(df, store_dir=DEFAULT_STORE_DIR, state=None):
+    # new years only ever read the stored running totals, so nothing already served is recomputed
+    state = state if state is not None else load_store_state(store_dir)
+    priors, new_state = compute_priors(df, state=state, keys=state['keys'])
+
+    new_state['parts'] = state['parts'] + [_write_part(_store_rows(df, priors), store_dir, len(state['parts']))]
+    save_store_state(new_state, store_dir)
+
+    years = sorted(df['Year_of_Release'].dropna().unique())
+    print(f"Added priors for {len(df)} releases from {', '.join(f'{year:.0f}' for year in years)}")
+    return new_state
+
+def load_priors(store_dir=DEFAULT_STORE_DIR, state=None):
+    import pyarrow.feather as feather
+
+    state = state if state is not None else load_store_state(store_dir)
+    frames = [feather.read_table(os.path.join(store_dir, part), memory_map=True).to_pandas()
+              for part in state['parts']]
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    from data_processing import get_processed_data
+
+    build_feature_store(get_processed_data())
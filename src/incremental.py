@@ -0,0 +1,258 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from data_processing import (
+    REGION_COLUMNS, IMPUTE_COLUMNS, IMPUTE_LEVELS, MAJOR_PUBLISHERS, COMPANY_TYPES,
+    load_raw_data, validate_raw_data, clean_data, create_features, resolve_titles, compact_frame
+)
+from aggregation import CUBE_DIMENSIONS, CUBE_PAIRS, CORRELATION_COLUMNS
+from correlation import co_moments, correlation_from_moments
+from titles import new_title_index, remove_title_rows
+from sketches import group_key_arrays, sketch_counts, merge_counts, count_quantiles, medians_from_counts
+
+KEY_COLUMNS = ['Name', 'Platform']
+SUM_COLUMNS = ['count', 'total_sales', 'successful', 'critic_sum', 'critic_n'] + REGION_COLUMNS
+
+DEFAULT_STORE_DIR = 'data/incremental'
+
+def _plain_index(index, keys):
+    if not keys:
+        return pd.MultiIndex.from_arrays([[0]], names=['_all'])
+    return pd.MultiIndex.from_frame(index.to_frame(index=False).astype(object))
+
+def _sum_table(df, keys):
+    grouped = df.assign(
+        _critic=df['Critic_Score'].fillna(0),
+        _critic_n=df['Critic_Score'].notna()
+    ).groupby(group_key_arrays(df, keys), observed=True)
+
+    table = grouped.agg(
+        count=('Global_Sales', 'size'),
+        total_sales=('Global_Sales', 'sum'),
+        successful=('Is_Successful', 'sum'),
+        critic_sum=('_critic', 'sum'),
+        critic_n=('_critic_n', 'sum'),
+        first_year=('Year_of_Release', 'min'),
+        last_year=('Year_of_Release', 'max')
+    ).astype(np.float64)
+    table[REGION_COLUMNS] = grouped[REGION_COLUMNS].sum().astype(np.float64)
+    table.index = _plain_index(table.index, keys)
+
+    return table
+
+def _merge_sum_tables(current, delta, sign=1):
+    if sign < 0:
+        # min/max are not invertible; removed rows leave the year range as it was
+        delta = delta.assign(first_year=np.nan, last_year=np.nan)
+    delta = delta.copy()
+    delta[SUM_COLUMNS] *= sign
+
+    combined = pd.concat([current, delta])
+    merged = combined.groupby(level=list(range(combined.index.nlevels))).agg(
+        {**{col: 'sum' for col in SUM_COLUMNS}, 'first_year': 'min', 'last_year': 'max'}
+    )
+    if not isinstance(merged.index, pd.MultiIndex):
+        merged.index = pd.MultiIndex.from_arrays([merged.index])
+    return merged[merged['count'] > 0]
+
+def _co_moments(df, columns=CORRELATION_COLUMNS):
+    return {name: matrix[0] for name, matrix in co_moments(df[columns].to_numpy(dtype=np.float64)).items()}
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df[KEY_COLUMNS].astype(str), index=False).to_numpy()
+
+def _contributions(processed_df, raw_df=None):
+    contributions = {
+        'aggregates': {},
+        'sales_sketches': {},
+        'moments': _co_moments(processed_df)
+    }
+    for keys in [()] + [(dim,) for dim in CUBE_DIMENSIONS] + list(CUBE_PAIRS):
+        if all(key in processed_df.columns for key in keys):
+            contributions['aggregates'][keys] = _sum_table(processed_df, list(keys))
+            contributions['sales_sketches'][keys] = sketch_counts(processed_df, list(keys), ['Global_Sales'])
+
+    if raw_df is not None:
+        columns = [col for col in IMPUTE_COLUMNS if col in raw_df.columns]
+        contributions['impute_sketches'] = {
+            tuple(keys): sketch_counts(raw_df, keys, columns) for keys in IMPUTE_LEVELS + [[]]
+        }
+
+    return contributions
+
+def _apply_contributions(state, contributions, sign=1):
+    for keys, table in contributions['aggregates'].items():
+        state['aggregates'][keys] = _merge_sum_tables(state['aggregates'][keys], table, sign)
+    for keys, counts in contributions['sales_sketches'].items():
+        state['sales_sketches'][keys] = merge_counts(state['sales_sketches'][keys], counts, sign)
+    for name, matrix in contributions['moments'].items():
+        state['moments'][name] = state['moments'][name] + sign * matrix
+
+    # imputation priors only ever grow: the observed raw values of replaced rows are not kept
+    for keys, counts in contributions.get('impute_sketches', {}).items():
+        state['impute_sketches'][keys] = merge_counts(state['impute_sketches'][keys], counts)
+
+def _write_part(df, store_dir, part_id):
+    import pyarrow.feather as feather
+
+    path = os.path.join(store_dir, f'part-{part_id:05d}.feather')
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return os.path.basename(path)
+
+def _read_part(store_dir, part_name):
+    import pyarrow.feather as feather
+
+    return feather.read_table(os.path.join(store_dir, part_name), memory_map=True).to_pandas()
+
+def save_state(state, store_dir=DEFAULT_STORE_DIR):
+    path = os.path.join(store_dir, 'state.pkl')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_state(store_dir=DEFAULT_STORE_DIR):
+    with open(os.path.join(store_dir, 'state.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def init_incremental_store(raw_path='data/video_games_sales.csv', store_dir=DEFAULT_STORE_DIR):
+    print(f"Initialising incremental store in {store_dir}...")
+    os.makedirs(store_dir, exist_ok=True)
+
+    raw_df = load_raw_data(raw_path)
+    titles = new_title_index()
+    processed_df = create_features(clean_data(raw_df), copy=False)
+    processed_df = resolve_titles(processed_df, copy=False, index=titles).reset_index(drop=True)
+
+    state = _contributions(processed_df, raw_df)
+    state['titles'] = titles
+    state['parts'] = [_write_part(processed_df, store_dir, 0)]
+    state['key_hash'] = _row_hashes(processed_df)
+    state['key_part'] = np.zeros(len(processed_df), dtype=np.int32)
+    state['key_row'] = np.arange(len(processed_df), dtype=np.int64)
+
+    save_state(state, store_dir)
+    print(f"Stored {len(processed_df)} rows")
+    return state
+
+def impute_medians_from_state(state):
+    return medians_from_counts(state['impute_sketches'])
+
+def apply_delta(delta, store_dir=DEFAULT_STORE_DIR, state=None):
+    state = state if state is not None else load_state(store_dir)
+    raw_delta = load_raw_data(delta) if isinstance(delta, str) else compact_frame(validate_raw_data(delta))
+    print(f"\nApplying delta of {len(raw_delta)} rows...")
+
+    processed_delta = create_features(
+        clean_data(raw_delta, medians=impute_medians_from_state(state)), copy=False
+    ).reset_index(drop=True)
+
+    delta_hashes = _row_hashes(processed_delta)
+    replaced = np.isin(state['key_hash'], delta_hashes)
+
+    if replaced.any():
+        old_rows = []
+        for part_id in np.unique(state['key_part'][replaced]):
+            rows = state['key_row'][replaced & (state['key_part'] == part_id)]
+            old_rows.append(_read_part(store_dir, state['parts'][part_id]).iloc[rows])
+        old_rows = compact_frame(pd.concat(old_rows, ignore_index=True))
+        _apply_contributions(state, _contributions(old_rows), sign=-1)
+        remove_title_rows(state['titles'], old_rows['Title_ID'].to_numpy(), old_rows['Global_Sales'])
+
+    # new names join the titles already indexed, so existing Title_IDs never change
+    processed_delta = resolve_titles(processed_delta, copy=False, index=state['titles'])
+
+    _apply_contributions(state, _contributions(processed_delta, raw_delta))
+
+    part_id = len(state['parts'])
+    state['parts'].append(_write_part(processed_delta, store_dir, part_id))
+    keep = ~replaced
+    state['key_hash'] = np.concatenate([state['key_hash'][keep], delta_hashes])
+    state['key_part'] = np.concatenate([state['key_part'][keep], np.full(len(processed_delta), part_id, dtype=np.int32)])
+    state['key_row'] = np.concatenate([state['key_row'][keep], np.arange(len(processed_delta), dtype=np.int64)])
+
+    save_state(state, store_dir)
+    print(f"Updated {int(replaced.sum())} existing rows, {len(state['key_hash'])} rows live")
+    return state
+
+def load_store_frame(store_dir=DEFAULT_STORE_DIR, state=None):
+    state = state if state is not None else load_state(store_dir)
+
+    frames = []
+    for part_id, part_name in enumerate(state['parts']):
+        rows = np.sort(state['key_row'][state['key_part'] == part_id])
+        if len(rows):
+            frames.append(_read_part(store_dir, part_name).iloc[rows])
+    df = compact_frame(pd.concat(frames, ignore_index=True))
+
+    # stored rows keep the title totals of when they were written; later deltas may have added ports
+    titles = state['titles']['titles']
+    df['Title_Ports'] = titles['ports'][df['Title_ID']].astype(np.int16)
+    df['Title_Global_Sales'] = titles['sales'][df['Title_ID']].astype(np.float32)
+    return df
+
+def _flatten_index(table):
+    if table.index.nlevels == 1:
+        table.index = table.index.get_level_values(0)
+    return table
+
+def _group_medians(counts):
+    medians = count_quantiles(counts).droplevel('column')
+    if not isinstance(medians.index, pd.MultiIndex):
+        medians.index = pd.MultiIndex.from_arrays([medians.index])
+    return medians
+
+def incremental_cube(state):
+    cube = {}
+    for keys, table in state['aggregates'].items():
+        medians = _group_medians(state['sales_sketches'][keys])
+
+        result = pd.DataFrame({
+            'count': table['count'].astype(np.int64),
+            'total_sales': table['total_sales'],
+            'avg_sales': table['total_sales'] / table['count'],
+            'median_sales': medians.reindex(table.index).to_numpy(),
+            'success_rate': table['successful'] / table['count'],
+            'avg_critic': table['critic_sum'] / table['critic_n'].replace(0, np.nan),
+            'first_year': table['first_year'],
+            'last_year': table['last_year']
+        }, index=table.index)
+        result[REGION_COLUMNS] = table[REGION_COLUMNS]
+
+        if keys:
+            cube[keys[0] if len(keys) == 1 else keys] = _flatten_index(result)
+        else:
+            overall = result.iloc[0]
+            cube['overall'] = {
+                'count': int(overall['count']),
+                'successful': int(table['successful'].iloc[0]),
+                'success_rate': overall['success_rate'],
+                'total_sales': overall['total_sales'],
+                'avg_sales': overall['avg_sales'],
+                'median_sales': overall['median_sales'],
+                'avg_critic': overall['avg_critic'],
+                'first_year': overall['first_year'],
+                'last_year': overall['last_year']
+            }
+
+    if 'Publisher' in cube:
+        is_major = cube['Publisher'].index.isin(MAJOR_PUBLISHERS)
+        cube['Publisher']['company_type'] = np.where(is_major, COMPANY_TYPES[0], COMPANY_TYPES[1])
+
+    if 'Genre' in cube:
+        genre = cube['Genre']
+        cube[('Genre', 'Region')] = genre[REGION_COLUMNS].div(genre['count'], axis=0)
+
+    # Pearson comes straight from the running moments; rank correlations cannot be kept up to
+    # date that way, so readers compute them from the store frame (see calculate_correlations)
+    cube['correlations'] = incremental_correlations(state)
+
+    return cube
+
+def incremental_correlations(state, columns=CORRELATION_COLUMNS):
+    return pd.DataFrame(correlation_from_moments(state['moments']), index=columns, columns=columns)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# in-memory budget for the key hashes before runs spill to disk (8 bytes per key)
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+# rows held at once while merging spilled runs, per range of hash values
+MERGE_BATCH_KEYS = 1 << 20
+
+def _probe(run, hashes):
+    # hashes are sorted, so searchsorted walks each run (or its memory-mapped pages) in order
+    if not len(run):
+        return np.zeros(len(hashes), dtype=bool)
+    index = np.searchsorted(run, hashes)
+    return run[np.minimum(index, len(run) - 1)] == hashes
+
+class KeySet:
+    """uint64 key hashes as sorted, disjoint runs: merged LSM-style, spilled to disk past max_bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._memory_runs = []
+        self._disk_runs = []
+        self._spilled = 0
+
+    @property
+    def memory_bytes(self):
+        return sum(run.nbytes for run in self._memory_runs)
+
+    def __len__(self):
+        return sum(len(run) for run in self._memory_runs + self._disk_runs)
+
+    def contains(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind='stable')
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._memory_runs + self._disk_runs:
+            found |= _probe(run, hashes[order])
+        result = np.empty(len(hashes), dtype=bool)
+        result[order] = found
+        return result
+
+    def add(self, hashes):
+        # callers add keys the set does not hold yet, so runs never overlap and merges never dedupe
+        run = np.unique(np.asarray(hashes, dtype=np.uint64))
+        if not len(run):
+            return
+        self._memory_runs.append(run)
+        # a run merges into the one before it once it is at least half that size: run sizes stay
+        # geometric, so there are O(log n) runs to probe and each key is re-sorted O(log n) times
+        while len(self._memory_runs) > 1 and 2 * len(self._memory_runs[-1]) >= len(self._memory_runs[-2]):
+            newer = self._memory_runs.pop()
+            self._memory_runs[-1] = np.union1d(self._memory_runs[-1], newer)
+
+        if self.memory_bytes > self.max_bytes:
+            self._spill()
+
+    def _spill(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='keyset-', dir=self._spill_root)
+        merged = self._memory_runs[0] if len(self._memory_runs) == 1 else np.concatenate(self._memory_runs)
+        merged.sort()
+        self._memory_runs = []
+        self._disk_runs.append(self._write_run(merged))
+        while len(self._disk_runs) > 1 and 2 * len(self._disk_runs[-1]) >= len(self._disk_runs[-2]):
+            newer = self._disk_runs.pop()
+            older = self._disk_runs.pop()
+            self._disk_runs.append(self._merge_disk_runs(older, newer))
+
+    def _write_run(self, run):
+        path = os.path.join(self._spill_dir, f'run-{self._spilled:05d}.npy')
+        self._spilled += 1
+        np.save(path, run)
+        return np.load(path, mmap_mode='r')
+
+    def _merge_disk_runs(self, older, newer):
+        # merged range by range of hash values, so only MERGE_BATCH_KEYS rows are in memory at a time
+        path = os.path.join(self._spill_dir, f'run-{self._spilled:05d}.npy')
+        self._spilled += 1
+        merged = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint64, shape=(len(older) + len(newer),))
+
+        bounds = np.append(older[::MERGE_BATCH_KEYS // 2], np.iinfo(np.uint64).max).astype(np.uint64)
+        position = 0
+        older_start = newer_start = 0
+        for i, upper in enumerate(bounds[1:], start=1):
+            last = i == len(bounds) - 1
+            older_end = len(older) if last else int(np.searchsorted(older, upper))
+            newer_end = len(newer) if last else int(np.searchsorted(newer, upper))
+            block = np.concatenate([older[older_start:older_end], newer[newer_start:newer_end]])
+            block.sort()
+            merged[position:position + len(block)] = block
+            position += len(block)
+            older_start, newer_start = older_end, newer_end
+        merged.flush()
+        del merged
+
+        for run in (older, newer):
+            os.remove(run.filename)
+        return np.load(path, mmap_mode='r')
+
+    def close(self):
+        self._memory_runs, self._disk_runs = [], []
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
@@ -1,41 +1,359 @@
-from data_processing import get_processed_data
-from visualization import *
-from analysis import *
+import argparse
 import os
+import sys
+
+# heavy modules (pandas, scipy, matplotlib, seaborn) are imported inside the commands that need them,
+# so `process` and `stats` start without paying for the plotting stack
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_PATH = os.path.join(PROJECT_ROOT, 'data', 'video_games_sales.csv')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'cache')
+FIGURES_DIR = os.path.join(PROJECT_ROOT, 'reports', 'figures')
+
+COMMANDS = ['process', 'stats', 'tests', 'plot', 'all', 'run', 'query', 'comparables', 'search', 'trends', 'snapshots']
+MANIFEST_PATH = os.path.join(PROJECT_ROOT, 'reports', 'pipeline_manifest.json')
+STAGE_DIR = os.path.join(CACHE_DIR, 'stages')
+COMPARABLES_DIR = os.path.join(PROJECT_ROOT, 'models', 'comparables')
+SEARCH_DIR = os.path.join(CACHE_DIR, 'model_search')
+
+def load_data(args):
+    from data_processing import get_processed_data
 
-def main():
-    print("Starting Video Game Success Analysis...")
-    
-    os.makedirs('../reports/figures/genre_analysis', exist_ok=True)
-    os.makedirs('../reports/figures/publisher_analysis', exist_ok=True)
-    os.makedirs('../reports/figures/platform_analysis', exist_ok=True)
-    
     print("Loading and processing data...")
-    df = get_processed_data()
-    
-    setup_visuals()
-    
-    print("Generating visualizations...")
-    plot_genre_analysis(df, '../reports/figures/genre_analysis/genre_overview.png')
-    plot_critic_analysis(df, '../reports/figures/critic_analysis/critic_vs_sales.png')
-    plot_publisher_analysis(df, '../reports/figures/publisher_analysis/publisher_overview.png')
-    plot_platform_analysis(df, '../reports/figures/platform_analysis/platform_overview.png')
-    plot_regional_analysis(df, '../reports/figures/regional_analysis/regional_overview.png')
-    
-    print("Performing statistical analysis...")
-    correlations = calculate_correlations(df)
-    stats_summary = get_summary_statistics(df)
-    statistical_tests = perform_statistical_tests(df)
-    
+    return get_processed_data(args.raw_path, args.cache_dir, refresh=args.refresh,
+                              processed_path=args.processed_path, quarantine_path=args.quarantine_path)
+
+def print_summary(stats_summary):
     print("\n" + "="*60)
     print("KEY INSIGHTS SUMMARY")
     print("="*60)
     for key, value in stats_summary.items():
         print(f"{key}: {value}")
-    
+
+def render(args, df, cube, names=None):
+    from rendering import FIGURE_JOBS, render_figure, render_figures
+    from visualization import enable_batch_mode, setup_visuals
+
+    names = list(names or FIGURE_JOBS)
+    unknown = [name for name in names if name not in FIGURE_JOBS]
+    if unknown:
+        raise SystemExit(f"unknown figure(s): {', '.join(unknown)}; choose from {', '.join(FIGURE_JOBS)}")
+
+    print("Generating visualizations...")
+    if args.batch:
+        enable_batch_mode()
+        render_figures(df, args.figures_dir, names, cube=cube, max_workers=args.workers)
+    else:
+        setup_visuals()
+        for name in names:
+            render_figure(name, args.figures_dir, df, cube)
+
+def run_process(args):
+    load_data(args)
+
+def run_stats(args):
+    from aggregation import build_aggregation_cube
+    from analysis import get_summary_statistics
+
+    df = load_data(args)
+    print_summary(get_summary_statistics(df, cube=build_aggregation_cube(df)))
+
+def run_tests(args):
+    from aggregation import build_aggregation_cube
+    from analysis import calculate_correlations, perform_statistical_tests
+
+    df = load_data(args)
+    cube = build_aggregation_cube(df)
+    correlations = calculate_correlations(df, cube=cube)
+    rank_correlations = calculate_correlations(df, cube=cube, method='spearman')
+    perform_statistical_tests(df)
+    print(f"\nCritic Score vs Global Sales correlation: {correlations.loc['Critic_Score', 'Global_Sales']:.3f} "
+          f"(Spearman {rank_correlations.loc['Critic_Score', 'Global_Sales']:.3f})")
+
+    if args.resamples:
+        from resampling import segment_pair_tests
+
+        results = segment_pair_tests(df, n_resamples=args.resamples, correction=args.correction,
+                                     seed=args.seed, max_workers=args.workers)
+        significant = results[results['mean_significant']].sort_values('mean_p_adj')
+        print(f"\nSignificant mean sales differences ({len(significant)} of {len(results)} pairs):")
+        print(significant[['dimension', 'group_a', 'group_b', 'mean_diff', 'mean_ci_low', 'mean_ci_high',
+                           'mean_p_adj']].head(args.top).to_string(index=False))
+
+def run_plot(args):
+    from aggregation import build_aggregation_cube
+
+    df = load_data(args)
+    render(args, df, build_aggregation_cube(df), None if 'all' in args.names else args.names)
+
+def run_all(args):
+    from aggregation import build_aggregation_cube
+    from analysis import calculate_correlations, get_summary_statistics, perform_statistical_tests, analyze_temporal_trends
+
+    print("Starting Video Game Success Analysis...")
+
+    df = load_data(args)
+    cube = build_aggregation_cube(df)
+
+    render(args, df, cube)
+
+    print("Performing statistical analysis...")
+    correlations = calculate_correlations(df, cube=cube)
+    stats_summary = get_summary_statistics(df, cube=cube)
+    statistical_tests = perform_statistical_tests(df)
+    analyze_temporal_trends(df, cube=cube)
+
+    print_summary(stats_summary)
+
     print(f"\nCritic Score vs Global Sales correlation: {correlations.loc['Critic_Score', 'Global_Sales']:.3f}")
-    
-    print("Analysis complete!")
+
+def run_dag(args):
+    from pipeline import run_pipeline
+
+    manifest, _ = run_pipeline(args.raw_path, args.figures_dir, args.stage_dir, args.manifest,
+                               figures=not args.no_figures, force=args.refresh, max_workers=args.workers)
+
+    print(f"\n{'stage':<24} {'status':<8} {'seconds':>8}")
+    for name, entry in manifest['stages'].items():
+        print(f"{name:<24} {entry['status']:<8} {entry['seconds']:>8.2f}")
+
+def parse_where(expression):
+    from query import QUERY_RANGES
+
+    # Genre=Role-Playing, Platform=PS2,PS3, Year_of_Release=2003:2007 (either end may be left open)
+    column, _, value = expression.partition('=')
+    if column in QUERY_RANGES:
+        if ':' not in value:
+            return column, float(value)
+        low, high = value.split(':')
+        return column, (float(low) if low else None, float(high) if high else None)
+    values = value.split(',')
+    return column, values[0] if len(values) == 1 else values
+
+def run_query(args):
+    from query import build_query_index, query, query_groups
+
+    index = build_query_index(load_data(args))
+    filters = dict(parse_where(expression) for expression in args.where)
+    label = f"{args.agg} {args.measure}" + (f" where {' and '.join(args.where)}" if args.where else '')
+
+    try:
+        if args.by:
+            print(f"\n{label}, by {args.by}:")
+            print(query_groups(index, args.by, filters, args.measure, args.agg).to_string())
+        else:
+            print(f"\n{label}: {query(index, filters, args.measure, args.agg):.4f}")
+    except ValueError as error:
+        raise SystemExit(str(error))
+
+def run_comparables(args):
+    from comparables import build_comparables_index, save_comparables_index, load_comparables_index, find_comparables
+
+    if args.refresh or not os.path.exists(os.path.join(args.index_dir, 'meta.pkl')):
+        save_comparables_index(build_comparables_index(load_data(args)), args.index_dir)
+    try:
+        index = load_comparables_index(args.index_dir)
+    except ValueError as error:
+        # an index from another version of this code or of scikit-learn is rebuilt, not read
+        print(f"{error}; rebuilding")
+        save_comparables_index(build_comparables_index(load_data(args)), args.index_dir)
+        index = load_comparables_index(args.index_dir)
+
+    scenario = {'Genre': args.genre, 'Platform': args.platform, 'Publisher': args.publisher,
+                'Company_Type': args.tier, 'Critic_Score': args.critic_score, 'Rating': args.rating,
+                'Year_of_Release': args.year}
+    result = find_comparables(index, scenario, k=args.k)
+
+    columns = ['distance', 'Name', 'Platform', 'Year_of_Release', 'Genre', 'Company_Type', 'Rating',
+               'Critic_Score', 'Global_Sales']
+    print(f"\n{args.k} most comparable titles:")
+    print(result['comparables'][columns].to_string(index=False))
+    print("\nRegional mix (%):")
+    print(result['regional_mix'].iloc[0].to_string(float_format=lambda v: f"{v:.1f}"))
+    print("\nGlobal sales quantiles (millions):")
+    print(result['sales_quantiles'].iloc[0].to_string(float_format=lambda v: f"{v:.2f}"))
+
+def run_trends(args):
+    from temporal import build_temporal_cube, yearly_trends, platform_lifecycle
+
+    temporal = build_temporal_cube(load_data(args))
+    genres = args.genre.split(',') if args.genre else None
+    platforms = args.platform.split(',') if args.platform else None
+
+    try:
+        if args.lifecycle:
+            result = platform_lifecycle(temporal, platforms=platforms, genres=genres, normalize=args.normalize)
+        else:
+            result = yearly_trends(temporal, by=args.by, genres=genres, platforms=platforms)
+            result = result[[col for col in result.columns if col in args.columns]] if args.columns else result
+    except ValueError as error:
+        raise SystemExit(str(error))
+
+    if not args.lifecycle:
+        years = result.index.get_level_values('Year_of_Release')
+        result = result[(years >= (args.from_year or years.min())) & (years <= (args.to_year or years.max()))]
+    print(result.to_string(float_format=lambda v: f"{v:.3f}"))
+
+def run_snapshots(args):
+    from snapshots import run_snapshots, diff_snapshots, summarize_diff
+
+    if len(args.paths) < 2:
+        raise SystemExit("need at least two snapshot files to compare")
+    dictionary, results = run_snapshots(args.paths, max_workers=args.workers)
+    diff = diff_snapshots(dictionary, results, baseline=args.baseline)
+
+    print(summarize_diff(diff, top=args.top))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        diff.to_csv(args.output, index=False)
+        print(f"Snapshot diff saved to {args.output}")
+
+def run_search(args):
+    from data_processing import load_raw_data
+    from model_search import run_model_search
+
+    # the search cleans and encodes each fold itself, from its training years only
+    raw_df = load_raw_data(args.raw_path, quarantine_path=args.quarantine_path)
+    results = run_model_search(raw_df, target=args.target, n_folds=args.folds,
+                               keep_fraction=args.keep_fraction, max_workers=args.workers,
+                               cache_dir=args.search_dir, seed=args.seed)
+    print(f"\nTop {args.top} candidates:")
+    print(results.head(args.top).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        results.to_csv(args.output, index=False)
+        print(f"Search results saved to {args.output}")
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--raw-path', default=RAW_PATH)
+    common.add_argument('--processed-path', default=None, help='also write the processed dataset as CSV here')
+    common.add_argument('--cache-dir', default=CACHE_DIR)
+    common.add_argument('--figures-dir', default=FIGURES_DIR)
+    common.add_argument('--quarantine-path', default=None,
+                        help='write rows that fail ingest validation to this CSV when the data is reprocessed')
+    common.add_argument('--refresh', action='store_true', help='rebuild processed data even if cached')
+    common.add_argument('--trace', default=None, help='write per-stage timings as JSON to this path')
+    common.add_argument('--chrome-trace', default=None, help='write a chrome://tracing compatible trace to this path')
+    common.add_argument('--trace-memory', action='store_true',
+                        help='record peak memory per stage with tracemalloc (slows the run down and runs '
+                             'pipeline stages one at a time)')
+    common.add_argument('--quiet', action='store_true', help="suppress the stages' own progress output")
+
+    rendering = argparse.ArgumentParser(add_help=False)
+    rendering.add_argument('--batch', action='store_true',
+                           help='render figures headless in a process pool without showing them')
+    rendering.add_argument('--workers', type=int, default=None, help='number of rendering processes')
+
+    parser = argparse.ArgumentParser(description='Video game success analysis')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('process', parents=[common], help='load, clean and cache the processed dataset') \
+        .set_defaults(func=run_process)
+    commands.add_parser('stats', parents=[common], help='print summary statistics') \
+        .set_defaults(func=run_stats)
+    tests = commands.add_parser('tests', parents=[common], help='print correlations and statistical tests')
+    tests.add_argument('--resamples', type=int, default=0,
+                       help='also run permutation/bootstrap tests across all segment pairs with this many resamples')
+    tests.add_argument('--correction', default='fdr_bh', choices=['fdr_bh', 'holm', 'bonferroni'])
+    tests.add_argument('--seed', type=int, default=0)
+    tests.add_argument('--workers', type=int, default=None, help='number of resampling processes')
+    tests.add_argument('--top', type=int, default=20, help='how many significant pairs to print')
+    tests.set_defaults(func=run_tests)
+
+    plot = commands.add_parser('plot', parents=[common, rendering], help='render one or more figures')
+    plot.add_argument('names', nargs='+', help="figure names (genre, critic, publisher, platform, regional, temporal) or 'all'")
+    plot.set_defaults(func=run_plot)
+
+    commands.add_parser('all', parents=[common, rendering], help='process, plot and analyse everything') \
+        .set_defaults(func=run_all)
+
+    run = commands.add_parser('run', parents=[common],
+                              help='run the stage graph, rebuilding only stages whose inputs changed')
+    run.add_argument('--stage-dir', default=STAGE_DIR, help='where intermediate stage results are kept')
+    run.add_argument('--manifest', default=MANIFEST_PATH)
+    run.add_argument('--no-figures', action='store_true')
+    run.add_argument('--workers', type=int, default=None, help='threads per wave and rendering processes')
+    run.set_defaults(func=run_dag)
+
+    query = commands.add_parser('query', parents=[common], help='filtered aggregate over the indexed dataset')
+    query.add_argument('--where', action='append', default=[], metavar='COLUMN=VALUE',
+                       help="repeatable; VALUE may be a comma-separated list, or LOW:HIGH for Year_of_Release")
+    query.add_argument('--measure', default='Global_Sales')
+    query.add_argument('--agg', default='mean', choices=['count', 'sum', 'mean', 'min', 'max', 'median'])
+    query.add_argument('--by', default=None, help='break the aggregate down by this column')
+    query.set_defaults(func=run_query)
+
+    comparables = commands.add_parser('comparables', parents=[common],
+                                      help='nearest historical titles to a hypothetical release')
+    comparables.add_argument('--genre')
+    comparables.add_argument('--platform')
+    comparables.add_argument('--publisher', help='used to infer the tier when --tier is not given')
+    comparables.add_argument('--tier', choices=['AAA', 'Indie/Other'])
+    comparables.add_argument('--critic-score', type=float)
+    comparables.add_argument('--rating')
+    comparables.add_argument('--year', type=float)
+    comparables.add_argument('--k', type=int, default=10)
+    comparables.add_argument('--index-dir', default=COMPARABLES_DIR, help="rebuilt here when missing, stale or with --refresh")
+    comparables.set_defaults(func=run_comparables)
+
+    search = commands.add_parser('search', parents=[common],
+                                 help='cross-validated hyperparameter search over time-ordered folds')
+    search.add_argument('--target', default='Is_Successful', choices=['Is_Successful', 'Sales_Category'])
+    search.add_argument('--folds', type=int, default=4)
+    search.add_argument('--keep-fraction', type=float, default=0.5,
+                        help='share of candidates kept after each fold once the first two are scored')
+    search.add_argument('--workers', type=int, default=None, help='number of fitting processes')
+    search.add_argument('--seed', type=int, default=0)
+    search.add_argument('--top', type=int, default=10, help='how many candidates to print')
+    search.add_argument('--search-dir', default=SEARCH_DIR, help='where the per-fold feature matrices are cached')
+    search.add_argument('--output', default=None, help='write the full results table as CSV to this path')
+    search.set_defaults(func=run_search)
+
+    trends = commands.add_parser('trends', parents=[common],
+                                 help='yearly trends with moving windows, or platform lifecycles, from the temporal cube')
+    trends.add_argument('--by', choices=['Genre', 'Platform'], default=None)
+    trends.add_argument('--genre', help='comma-separated genres to keep')
+    trends.add_argument('--platform', help='comma-separated platforms to keep')
+    trends.add_argument('--from-year', type=int, default=None)
+    trends.add_argument('--to-year', type=int, default=None)
+    trends.add_argument('--columns', nargs='+', default=None, help='metrics to print, e.g. success_rate_5y sales_share_3y')
+    trends.add_argument('--lifecycle', action='store_true', help='platform sales by years since launch instead')
+    trends.add_argument('--normalize', action='store_true', help='lifecycle as a share of lifetime sales')
+    trends.set_defaults(func=run_trends)
+
+    snapshots = commands.add_parser('snapshots', parents=[common],
+                                    help='compare genre/platform/publisher aggregates across snapshot files')
+    snapshots.add_argument('paths', nargs='+', help='snapshot CSV files, oldest first')
+    snapshots.add_argument('--baseline', default='previous', choices=['previous', 'first'],
+                           help='compare each snapshot with the one before it or with the first')
+    snapshots.add_argument('--workers', type=int, default=None, help='number of snapshot processes')
+    snapshots.add_argument('--top', type=int, default=10, help='how many rank moves to print per pair')
+    snapshots.add_argument('--output', default=None, help='write every changed aggregate as CSV to this path')
+    snapshots.set_defaults(func=run_snapshots)
+
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # bare `main.py [--batch ...]` keeps running the full analysis
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['all'] + argv
+    args = build_parser().parse_args(argv)
+
+    from tracing import configure_tracing, print_trace_summary, write_trace, write_chrome_trace
+
+    configure_tracing(enabled=True, trace_memory=args.trace_memory, quiet=args.quiet)
+    args.func(args)
+
+    print_trace_summary()
+    if args.trace:
+        write_trace(args.trace)
+    if args.chrome_trace:
+        write_chrome_trace(args.chrome_trace)
+
+    if args.command == 'all':
+        print("Analysis complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,210 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_processing import compute_group_medians, clean_data, create_features, project_sources, file_digest
+from prediction import NUMERIC_FEATURES, CATEGORICAL_FEATURES, fit_category_encoders, encode_features, _categorical_mask
+from tracing import traced, silenced
+
+TARGETS = ['Is_Successful', 'Sales_Category']
+SEARCH_GRID = {
+    'learning_rate': [0.03, 0.1, 0.3],
+    'max_leaf_nodes': [15, 31, 63],
+    'min_samples_leaf': [20, 80],
+    'l2_regularization': [0.0, 1.0]
+}
+# fixed for every candidate; each fit still stops on its own inner holdout once it stops improving
+BASE_PARAMS = {'max_iter': 300, 'early_stopping': True, 'n_iter_no_change': 10}
+
+DEFAULT_FOLDS = 4
+# the oldest half of the rows only ever trains; validation blocks walk forward through the rest
+MIN_TRAIN_FRACTION = 0.5
+# every candidate sees this many folds; after that, each further fold only goes to the best KEEP_FRACTION
+MIN_ROUNDS = 2
+KEEP_FRACTION = 0.5
+
+DEFAULT_CACHE_DIR = 'data/cache/model_search'
+SEARCH_VERSION = 2
+
+def candidate_grid(grid=SEARCH_GRID):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+def time_folds(years, n_folds=DEFAULT_FOLDS, min_train_fraction=MIN_TRAIN_FRACTION):
+    # expanding window over whole years: train on everything before a cut year, validate up to the next cut
+    unique_years, counts = np.unique(years[~np.isnan(years)], return_counts=True)
+    share = np.cumsum(counts) / counts.sum()
+    targets = min_train_fraction + (1 - min_train_fraction) * np.arange(n_folds) / n_folds
+    cuts = np.unique(unique_years[np.minimum(np.searchsorted(share, targets, side='right'), len(unique_years) - 1)])
+    bounds = list(cuts) + [np.inf]
+
+    return [
+        (np.flatnonzero(years < start), np.flatnonzero((years >= start) & (years < end)), (float(start), float(end)))
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+def encode_target(df, target):
+    if target == 'Is_Successful':
+        return df[target].to_numpy(dtype=np.float64)
+    codes = df[target].cat.codes.to_numpy()
+    return np.where(codes < 0, np.nan, codes).astype(np.float64)
+
+def _fold_key(raw_df, n_folds, min_train_fraction):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(raw_df, index=False).to_numpy().tobytes())
+    digest.update(f"{n_folds}:{min_train_fraction}:{SEARCH_VERSION}".encode())
+    # cleaning, feature and encoder code all shape the cached matrices, like pipeline_cache_key
+    for source in sorted(project_sources(__file__)):
+        digest.update(f"{os.path.basename(source)}:{file_digest(source)}".encode())
+    return digest.hexdigest()[:16]
+
+def fold_matrices(raw_train, raw_val, target):
+    # imputation medians and category encoders come from the training years only, then are
+    # applied unchanged to the validation years, as they would be to future releases
+    medians = compute_group_medians(raw_train)
+    with silenced():
+        train, val = (create_features(clean_data(raw, medians=medians), copy=False) for raw in (raw_train, raw_val))
+    encoding = {
+        'numeric_features': list(NUMERIC_FEATURES),
+        'categories': fit_category_encoders(train, CATEGORICAL_FEATURES)
+    }
+
+    matrices = []
+    for frame in (train, val):
+        X, y = encode_features(frame, encoding), encode_target(frame, target)
+        labelled = ~np.isnan(y)
+        matrices += [X[labelled], y[labelled].astype(np.int8)]
+    return tuple(matrices), encoding
+
+@traced
+def prepare_folds(raw_df, target='Is_Successful', n_folds=DEFAULT_FOLDS, min_train_fraction=MIN_TRAIN_FRACTION,
+                  cache_dir=DEFAULT_CACHE_DIR):
+    # folds split the validated raw rows; each fold is cleaned and encoded on its own training rows and
+    # its matrices are written out so workers memory-map them
+    fold_dir = os.path.join(cache_dir, f"{target}-{_fold_key(raw_df, n_folds, min_train_fraction)}")
+    meta_path = os.path.join(fold_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        print(f"Reusing cached fold matrices in {fold_dir}")
+        with open(meta_path) as f:
+            return fold_dir, json.load(f)
+
+    folds = time_folds(raw_df['Year_of_Release'].to_numpy(dtype=np.float64), n_folds, min_train_fraction)
+    os.makedirs(fold_dir, exist_ok=True)
+    n_classes, fold_meta = 0, []
+    for i, (train, val, span) in enumerate(folds):
+        (X_train, y_train, X_val, y_val), encoding = fold_matrices(raw_df.iloc[train], raw_df.iloc[val], target)
+        for name, array in (('X_train', X_train), ('y_train', y_train), ('X_val', X_val), ('y_val', y_val)):
+            np.save(os.path.join(fold_dir, f'fold{i}-{name}.npy'), array)
+        n_classes = max(n_classes, int(max(y_train.max(), y_val.max())) + 1)
+        fold_meta.append({'train_rows': len(y_train), 'val_rows': len(y_val), 'val_years': list(span)})
+
+    meta = {
+        'target': target,
+        'n_classes': n_classes,
+        'categorical_mask': _categorical_mask(encoding).tolist(),
+        'folds': fold_meta
+    }
+    # written last: a directory without meta.json is an incomplete cache
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+    print(f"Cached {len(folds)} time-ordered folds in {fold_dir}")
+    return fold_dir, meta
+
+def _init_worker():
+    from threadpoolctl import threadpool_limits
+
+    # one process per core already; OpenMP threads inside each fit would only oversubscribe
+    global _thread_limits
+    _thread_limits = threadpool_limits(limits=1)
+
+def _fold_score(y, proba):
+    # ROC AUC; one-vs-rest averaged over the classes present in the fold when there are more than two
+    from sklearn.metrics import roc_auc_score
+
+    if proba.shape[1] == 2:
+        return roc_auc_score(y, proba[:, 1])
+    scores = [roc_auc_score(y == c, proba[:, c]) for c in np.unique(y) if 0 < (y == c).sum() < len(y)]
+    return float(np.mean(scores))
+
+def _evaluate(task):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    candidate, fold, params, fold_dir, meta, seed = task
+    load = lambda name: np.load(os.path.join(fold_dir, f'fold{fold}-{name}.npy'), mmap_mode='r')
+
+    start = time.perf_counter()
+    model = HistGradientBoostingClassifier(categorical_features=np.array(meta['categorical_mask']),
+                                           random_state=seed, **BASE_PARAMS, **params)
+    model.fit(load('X_train'), load('y_train'))
+
+    # classes missing from a training fold get zero probability rather than shifting the columns
+    proba = np.zeros((len(load('y_val')), meta['n_classes']))
+    proba[:, model.classes_] = model.predict_proba(load('X_val'))
+    return candidate, fold, _fold_score(np.asarray(load('y_val')), proba), time.perf_counter() - start
+
+@traced
+def run_model_search(raw_df, target='Is_Successful', grid=SEARCH_GRID, n_folds=DEFAULT_FOLDS,
+                     min_train_fraction=MIN_TRAIN_FRACTION, keep_fraction=KEEP_FRACTION, min_rounds=MIN_ROUNDS,
+                     max_workers=None, cache_dir=DEFAULT_CACHE_DIR, seed=0):
+    if target not in TARGETS:
+        raise ValueError(f"unknown target {target!r}; choose from {TARGETS}")
+
+    fold_dir, meta = prepare_folds(raw_df, target, n_folds, min_train_fraction, cache_dir)
+    candidates = candidate_grid(grid)
+    n_folds = len(meta['folds'])
+    print(f"Searching {len(candidates)} candidates over {n_folds} folds "
+          f"(validation years {meta['folds'][0]['val_years'][0]:.0f}+)...")
+    start = time.perf_counter()
+
+    scores = np.full((len(candidates), n_folds), np.nan)
+    seconds = np.zeros(len(candidates))
+    pruned_after = np.zeros(len(candidates), dtype=np.int64)
+    survivors = list(range(len(candidates)))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        # the first rounds run together so the pool has every candidate x fold to spread out
+        rounds = [list(range(min(min_rounds, n_folds)))] + [[fold] for fold in range(min(min_rounds, n_folds), n_folds)]
+        for round_number, folds in enumerate(rounds):
+            tasks = [(c, fold, candidates[c], fold_dir, meta, seed) for c in survivors for fold in folds]
+            for candidate, fold, score, fit_seconds in pool.map(_evaluate, tasks):
+                scores[candidate, fold] = score
+                seconds[candidate] += fit_seconds
+
+            if round_number == len(rounds) - 1:
+                break
+            # race: rank on the folds every survivor has now seen and drop the weaker half
+            means = np.nanmean(scores[survivors], axis=1)
+            keep = max(int(np.ceil(len(survivors) * keep_fraction)), 1)
+            ranked = [survivors[i] for i in np.argsort(-means, kind='stable')]
+            for candidate in ranked[keep:]:
+                pruned_after[candidate] = folds[-1] + 1
+            survivors = ranked[:keep]
+
+    results = pd.DataFrame(candidates)
+    results.insert(0, 'candidate', np.arange(len(candidates)))
+    results['folds_scored'] = np.isfinite(scores).sum(axis=1)
+    results['mean_score'] = np.nanmean(scores, axis=1)
+    results['std_score'] = np.nanstd(scores, axis=1)
+    results['status'] = np.where(pruned_after > 0, 'pruned', 'finished')
+    results['fit_seconds'] = seconds
+    for fold in range(n_folds):
+        results[f'fold{fold}_score'] = scores[:, fold]
+    # finished candidates were scored on every fold, so only they compete for the top
+    results = results.sort_values(['status', 'mean_score'], ascending=[True, False]).reset_index(drop=True)
+
+    fits = int(np.isfinite(scores).sum())
+    print(f"Ran {fits} of {scores.size} fits in {time.perf_counter() - start:.1f}s "
+          f"({seconds.sum():.1f}s of fitting across {max_workers} workers)")
+    best = results.iloc[0]
+    print(f"Best {target} ROC AUC {best['mean_score']:.4f}: "
+          f"{ {name: best[name] for name in grid} }")
+    return results
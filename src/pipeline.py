@@ -0,0 +1,204 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from data_processing import (
+    PIPELINE_VERSION, load_raw_data, clean_data, create_features, resolve_titles, file_digest, project_sources,
+    load_cached_data, save_cached_data
+)
+from aggregation import build_aggregation_cube
+from analysis import (
+    calculate_correlations, get_summary_statistics, perform_statistical_tests,
+    analyze_genre_performance, analyze_publisher_performance, analyze_platform_performance, analyze_temporal_trends
+)
+from tracing import tracing_config
+
+DEFAULT_STAGE_DIR = 'data/cache/stages'
+DEFAULT_MANIFEST = 'reports/pipeline_manifest.json'
+
+# name -> (function, upstream stages, kind); upstream results are passed positionally,
+# except 'cube' which every consumer takes as cube=
+PIPELINE_STAGES = {
+    'load': (load_raw_data, [], 'frame'),
+    'clean': (clean_data, ['load'], 'frame'),
+    'features': (create_features, ['clean'], 'frame'),
+    'titles': (resolve_titles, ['features'], 'frame'),
+    'cube': (build_aggregation_cube, ['titles'], 'object'),
+    'correlations': (calculate_correlations, ['titles', 'cube'], 'object'),
+    'summary': (get_summary_statistics, ['titles', 'cube'], 'object'),
+    'tests': (perform_statistical_tests, ['titles'], 'object'),
+    'genre_performance': (analyze_genre_performance, ['titles', 'cube'], 'object'),
+    'publisher_performance': (analyze_publisher_performance, ['titles', 'cube'], 'object'),
+    'platform_performance': (analyze_platform_performance, ['titles', 'cube'], 'object'),
+    'temporal_trends': (analyze_temporal_trends, ['titles', 'cube'], 'object')
+}
+
+def _figure_stages():
+    # rendering pulls in matplotlib; only import it when a run includes figures
+    from rendering import FIGURE_JOBS
+    return {f'plot_{name}': (FIGURE_JOBS[name][0], ['titles', 'cube'], 'figure') for name in FIGURE_JOBS}
+
+def stage_fingerprints(stages, raw_path, params=None):
+    params = params or {}
+    fingerprints = {}
+    module_digests = {}
+
+    for name, (func, deps, _) in stages.items():
+        # whole modules and every project module they import, so edits to private helpers or to
+        # the modules doing the work (correlation, temporal, titles, validation) invalidate the stage
+        sources = sorted(project_sources(inspect.getsourcefile(inspect.unwrap(func))))
+        for source in sources:
+            if source not in module_digests:
+                module_digests[source] = file_digest(source)
+
+        digest = hashlib.sha256()
+        digest.update(f"{name}:{PIPELINE_VERSION}".encode())
+        for source in sources:
+            digest.update(f"{os.path.basename(source)}:{module_digests[source]}".encode())
+        digest.update(repr(sorted(params.get(name, {}).items())).encode())
+        if not deps:
+            digest.update(file_digest(raw_path).encode())
+        for dep in deps:
+            digest.update(fingerprints[dep].encode())
+        fingerprints[name] = digest.hexdigest()[:16]
+
+    return fingerprints
+
+def _artifact_path(stage_dir, name, kind, fingerprint, figures_dir):
+    if kind == 'figure':
+        from rendering import FIGURE_JOBS
+        return os.path.join(figures_dir, FIGURE_JOBS[name[len('plot_'):]][1])
+    extension = 'feather' if kind == 'frame' else 'pkl'
+    return os.path.join(stage_dir, f'{name}-{fingerprint}.{extension}')
+
+def _artifact_exists(path, kind):
+    if kind == 'figure':
+        return os.path.isdir(path) and bool(os.listdir(path))
+    return os.path.exists(path)
+
+def _save_artifact(result, path, kind):
+    if kind == 'frame':
+        save_cached_data(result, path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def _load_artifact(path, kind):
+    if kind == 'frame':
+        return load_cached_data(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def load_manifest(manifest_path=DEFAULT_MANIFEST):
+    if not os.path.exists(manifest_path):
+        return {'stages': {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path=DEFAULT_MANIFEST):
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _waves(stages, stale):
+    # topological levels of the stale stages; everything in a wave can run at once
+    done = set(stages) - stale
+    waves = []
+    while len(done) < len(stages):
+        wave = [name for name in stages if name not in done and all(dep in done for dep in stages[name][1])]
+        waves.append(wave)
+        done.update(wave)
+    return waves
+
+def run_pipeline(raw_path='data/video_games_sales.csv', figures_dir='reports/figures', stage_dir=DEFAULT_STAGE_DIR,
+                 manifest_path=DEFAULT_MANIFEST, figures=True, force=False, max_workers=None):
+    stages = dict(PIPELINE_STAGES)
+    if figures:
+        stages.update(_figure_stages())
+
+    fingerprints = stage_fingerprints(stages, raw_path, params={'load': {'file_path': os.path.abspath(raw_path)}})
+    previous = load_manifest(manifest_path)['stages']
+    paths = {name: _artifact_path(stage_dir, name, kind, fingerprints[name], figures_dir)
+             for name, (_, _, kind) in stages.items()}
+
+    stale = {
+        name for name, (_, _, kind) in stages.items()
+        if force
+        or previous.get(name, {}).get('fingerprint') != fingerprints[name]
+        or not _artifact_exists(paths[name], kind)
+    }
+    print(f"Pipeline: {len(stale)} of {len(stages)} stages to rebuild")
+
+    results = {}
+    def result(name):
+        # fresh upstream results are only read back when a stale stage actually needs them
+        if name not in results:
+            results[name] = _load_artifact(paths[name], stages[name][2])
+        return results[name]
+
+    def run_stage(name):
+        func, deps, kind = stages[name]
+        args = [result(dep) for dep in deps if dep != 'cube']
+        kwargs = {'cube': result('cube')} if 'cube' in deps else {}
+        if name == 'load':
+            args = [raw_path]
+
+        start = time.perf_counter()
+        output = func(*args, **kwargs)
+        if kind == 'frame':
+            output = output.reset_index(drop=True)
+        seconds = time.perf_counter() - start
+
+        _save_artifact(output, paths[name], kind)
+        results[name] = output
+        return seconds
+
+    def render_stages(names):
+        from rendering import render_figures
+
+        # plots go through the render pool: pyplot state is per process, not per thread
+        timings = render_figures(result('titles'), figures_dir, [name[len('plot_'):] for name in names],
+                                 cube=result('cube'), max_workers=max_workers)
+        return {f'plot_{name}': seconds for name, seconds in timings.items()}
+
+    seconds = {}
+    for wave in _waves(stages, stale):
+        plots = [name for name in wave if stages[name][2] == 'figure']
+        others = [name for name in wave if stages[name][2] != 'figure']
+
+        if others:
+            # tracemalloc's peak is process-wide, so stages only get their own peak when they run alone
+            workers = 1 if tracing_config()['trace_memory'] else max_workers or len(others)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                seconds.update(zip(others, pool.map(run_stage, others)))
+        if plots:
+            from visualization import enable_batch_mode
+            enable_batch_mode()
+            seconds.update(render_stages(plots))
+
+    now = datetime.now(timezone.utc).isoformat()
+    manifest = {'created': now, 'raw_path': raw_path, 'stages': {}}
+    for name in stages:
+        rebuilt = name in stale
+        manifest['stages'][name] = {
+            'fingerprint': fingerprints[name],
+            'status': 'rebuilt' if rebuilt else 'skipped',
+            'seconds': seconds.get(name, 0.0),
+            'artifact': paths[name],
+            'built_at': now if rebuilt else previous.get(name, {}).get('built_at')
+        }
+    save_manifest(manifest, manifest_path)
+
+    rebuilt = [name for name in stages if name in stale]
+    print(f"Rebuilt {len(rebuilt)} stages, skipped {len(stages) - len(rebuilt)}; manifest at {manifest_path}")
+    return manifest, results
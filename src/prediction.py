@@ -0,0 +1,132 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_processing import MAJOR_PUBLISHERS
+
+NUMERIC_FEATURES = ['Year_of_Release', 'Critic_Score', 'Critic_Count', 'User_Score', 'User_Count']
+CATEGORICAL_FEATURES = ['Platform', 'Genre', 'Publisher', 'Rating']
+# HistGradientBoosting caps native categorical features at 255 distinct codes
+MAX_CATEGORIES = 250
+SUCCESS_THRESHOLD = 1.0
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_ROOT, 'models', 'success_model.pkl')
+MODEL_VERSION = 1
+
+def feature_names(numeric=NUMERIC_FEATURES, categorical=CATEGORICAL_FEATURES):
+    return list(numeric) + ['Is_Major_Publisher'] + list(categorical)
+
+def fit_category_encoders(df, categorical=CATEGORICAL_FEATURES, max_categories=MAX_CATEGORIES):
+    # keep the most frequent levels; rarer and unseen levels encode as missing. Categorical columns
+    # list every level of the dtype, so levels with no rows here are dropped too
+    encoders = {}
+    for col in categorical:
+        counts = df[col].value_counts(sort=True)
+        encoders[col] = counts[counts > 0].index[:max_categories].astype(str).tolist()
+    return encoders
+
+def encode_features(frame, model):
+    numeric = model['numeric_features']
+    categories = model['categories']
+
+    X = np.empty((len(frame), len(numeric) + 1 + len(categories)), dtype=np.float32)
+    for i, col in enumerate(numeric):
+        X[:, i] = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+
+    X[:, len(numeric)] = frame['Publisher'].isin(MAJOR_PUBLISHERS).to_numpy()
+
+    for i, (col, levels) in enumerate(categories.items(), start=len(numeric) + 1):
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.rename_categories(values.cat.categories.astype(str))
+        else:
+            values = values.astype(str)
+        codes = pd.Categorical(values, categories=levels).codes
+        X[:, i] = np.where(codes < 0, np.nan, codes)
+
+    return X
+
+def _categorical_mask(model):
+    n_numeric = len(model['numeric_features']) + 1
+    return np.arange(n_numeric + len(model['categories'])) >= n_numeric
+
+def train_success_model(df, test_size=0.2, random_state=42):
+    from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+    from sklearn.metrics import roc_auc_score, r2_score
+    from sklearn.model_selection import train_test_split
+
+    print("Training success model...")
+    model = {
+        'version': MODEL_VERSION,
+        'numeric_features': list(NUMERIC_FEATURES),
+        'categories': fit_category_encoders(df),
+        'success_threshold': SUCCESS_THRESHOLD
+    }
+
+    X = encode_features(df, model)
+    y_success = (df['Global_Sales'] > SUCCESS_THRESHOLD).to_numpy()
+    # sales are heavily right-skewed; the regressor works on log1p and predictions are mapped back
+    y_sales = np.log1p(df['Global_Sales'].to_numpy(dtype=np.float64))
+
+    X_train, X_test, s_train, s_test, v_train, v_test = train_test_split(
+        X, y_success, y_sales, test_size=test_size, random_state=random_state, stratify=y_success
+    )
+
+    categorical_mask = _categorical_mask(model)
+    classifier = HistGradientBoostingClassifier(categorical_features=categorical_mask, random_state=random_state)
+    regressor = HistGradientBoostingRegressor(categorical_features=categorical_mask, random_state=random_state)
+
+    start = time.perf_counter()
+    classifier.fit(X_train, s_train)
+    regressor.fit(X_train, v_train)
+    print(f"Fitted on {len(X_train)} rows in {time.perf_counter() - start:.2f}s")
+
+    model['metrics'] = {
+        'roc_auc': roc_auc_score(s_test, classifier.predict_proba(X_test)[:, 1]),
+        'log_sales_r2': r2_score(v_test, regressor.predict(X_test)),
+        'test_rows': len(X_test)
+    }
+    print(f"Holdout ROC AUC: {model['metrics']['roc_auc']:.3f}, "
+          f"log-sales R^2: {model['metrics']['log_sales_r2']:.3f}")
+
+    # refit on everything now that the holdout has been scored
+    model['classifier'] = classifier.fit(X, y_success)
+    model['regressor'] = regressor.fit(X, y_sales)
+
+    return model
+
+def predict_batch(frame, model):
+    X = encode_features(frame, model)
+
+    probability = model['classifier'].predict_proba(X)[:, 1]
+    predicted_sales = np.expm1(model['regressor'].predict(X)).clip(min=0)
+
+    return pd.DataFrame({
+        'success_probability': probability,
+        'predicted_success': probability >= 0.5,
+        'predicted_sales': predicted_sales
+    }, index=frame.index)
+
+def save_model(model, model_path=DEFAULT_MODEL_PATH):
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    tmp_path = f"{model_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, model_path)
+    print(f"Model saved to {model_path}")
+
+def load_model(model_path=DEFAULT_MODEL_PATH):
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    if model.get('version') != MODEL_VERSION:
+        raise ValueError(f"{model_path} was built by model version {model.get('version')}, expected {MODEL_VERSION}")
+    return model
+
+if __name__ == "__main__":
+    from data_processing import get_processed_data
+
+    save_model(train_success_model(get_processed_data()))
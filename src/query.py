@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from data_processing import REGION_COLUMNS
+from tracing import traced
+
+QUERY_DIMENSIONS = ['Genre', 'Platform', 'Publisher', 'Release_Era', 'Rating', 'Company_Type']
+QUERY_RANGES = ['Year_of_Release']
+QUERY_MEASURES = REGION_COLUMNS + ['Global_Sales', 'Critic_Score', 'User_Score', 'Is_Successful']
+AGGREGATIONS = ['count', 'sum', 'mean', 'min', 'max', 'median']
+# what the rollup keeps per measure; every aggregation but the median can be rebuilt from these
+ROLLUP_STATS = ['count', 'sum', 'min', 'max']
+
+def _dimension_index(values):
+    codes, levels = pd.factorize(values, sort=True)
+    codes = codes.astype(np.int16 if len(levels) < 2 ** 15 else np.int32)
+
+    # a stable sort by code lays each level's rows out as one ascending run of positions;
+    # missing values (code -1) sort first and fall outside every run
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    bounds = np.searchsorted(codes[order], np.arange(len(levels) + 1))
+
+    return {
+        'codes': codes,
+        'levels': list(levels),
+        'lookup': {level: i for i, level in enumerate(levels)},
+        'positions': order,
+        'bounds': bounds
+    }
+
+def _range_index(values):
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(values, kind='stable')
+    # NaNs sort last; keeping them out means no range can ever match them
+    order = order[~np.isnan(values[order])].astype(np.int32)
+    return {'values': values, 'sorted': values[order], 'positions': order}
+
+def _table_index(column, rows, dimensions, ranges, measures):
+    return {
+        'rows': rows,
+        'dimensions': {col: _dimension_index(column(col)) for col in dimensions},
+        'ranges': {col: _range_index(column(col)) for col in ranges},
+        'measures': measures
+    }
+
+@traced
+def build_query_index(df, dimensions=QUERY_DIMENSIONS, ranges=QUERY_RANGES, measures=QUERY_MEASURES):
+    print("Building query index...")
+    dimensions = [col for col in dimensions if col in df.columns]
+    ranges = [col for col in ranges if col in df.columns]
+    measures = [col for col in measures if col in df.columns]
+
+    values = df[dimensions + ranges].copy()
+    values[measures] = df[measures].astype(np.float64)
+
+    # one row per distinct combination of indexed values: additive aggregates are answered from here,
+    # so their cost follows the number of matching combinations instead of the number of games
+    rollup = values.groupby(dimensions + ranges, observed=True, dropna=False, sort=False)[measures].agg(ROLLUP_STATS)
+
+    return {
+        **_table_index(lambda col: df[col], len(df), dimensions, ranges,
+                       {col: values[col].to_numpy() for col in measures}),
+        'rollup': _table_index(rollup.index.get_level_values, len(rollup), dimensions, ranges,
+                               {(col, stat): rollup[(col, stat)].to_numpy(dtype=np.float64)
+                                for col in measures for stat in ROLLUP_STATS})
+    }
+
+def _range_bounds(value):
+    if isinstance(value, tuple):
+        low, high = value
+        return -np.inf if low is None else low, np.inf if high is None else high
+    return value, value
+
+def _plan(table, column, value):
+    # (estimated rows, positions, residual mask) for one filter, without touching any row data
+    if column in table['dimensions']:
+        dim = table['dimensions'][column]
+        wanted = [value] if isinstance(value, str) or not np.iterable(value) else list(value)
+        codes = np.array([dim['lookup'][v] for v in wanted if v in dim['lookup']], dtype=np.int64)
+        size = int((dim['bounds'][codes + 1] - dim['bounds'][codes]).sum())
+
+        def positions():
+            runs = [dim['positions'][dim['bounds'][c]:dim['bounds'][c + 1]] for c in codes]
+            return runs[0] if len(runs) == 1 else np.sort(np.concatenate(runs or [np.empty(0, np.int32)]))
+
+        def residual(rows):
+            values = dim['codes'][rows]
+            return values == codes[0] if len(codes) == 1 else np.isin(values, codes)
+
+        return size, positions, residual
+
+    if column in table['ranges']:
+        rng = table['ranges'][column]
+        low, high = _range_bounds(value)
+        start = np.searchsorted(rng['sorted'], low, side='left')
+        end = np.searchsorted(rng['sorted'], high, side='right')
+
+        def positions():
+            return np.sort(rng['positions'][start:end])
+
+        def residual(rows):
+            values = rng['values'][rows]
+            return (values >= low) & (values <= high)
+
+        return max(end - start, 0), positions, residual
+
+    raise ValueError(f"no index on {column!r}; choose from {list(table['dimensions']) + list(table['ranges'])}")
+
+def select(table, filters=None):
+    """Positions of the rows of an index (or its rollup) matching every filter.
+
+    Dimension filters take a value or a list of values; range filters take a value or an
+    inclusive (low, high) tuple, either end None for open.
+    """
+    if not filters:
+        return np.arange(table['rows'])
+
+    plans = sorted((_plan(table, column, value) for column, value in filters.items()), key=lambda p: p[0])
+
+    # drive from the most selective index and check the rest only on its rows,
+    # so the cost follows the smallest match rather than the table size
+    _, positions, _ = plans[0]
+    rows = positions()
+    for _, _, residual in plans[1:]:
+        if not len(rows):
+            break
+        rows = rows[residual(rows)]
+    return rows
+
+def _check(index, measure, agg):
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"unknown aggregation {agg!r}; choose from {AGGREGATIONS}")
+    if measure not in index['measures']:
+        raise ValueError(f"unknown measure {measure!r}; choose from {list(index['measures'])}")
+
+def _combine(stats, agg):
+    # fold rollup rows (or groups of them) back into one aggregate
+    count = stats['count'].sum()
+    if agg == 'count':
+        return int(count)
+    if agg == 'sum':
+        return float(stats['sum'].sum())
+    if not count:
+        return np.nan
+    if agg == 'mean':
+        return float(stats['sum'].sum() / count)
+    return float(np.nanmin(stats['min']) if agg == 'min' else np.nanmax(stats['max']))
+
+def query(index, filters=None, measure='Global_Sales', agg='mean'):
+    _check(index, measure, agg)
+
+    if agg != 'median':
+        rollup = index['rollup']
+        rows = select(rollup, filters)
+        return _combine({stat: rollup['measures'][(measure, stat)][rows] for stat in ROLLUP_STATS}, agg)
+
+    values = index['measures'][measure][select(index, filters)]
+    values = values[~np.isnan(values)]
+    return float(np.median(values)) if len(values) else np.nan
+
+def query_groups(index, by, filters=None, measure='Global_Sales', agg='sum'):
+    _check(index, measure, agg)
+    table = index if agg == 'median' else index['rollup']
+    rows = select(table, filters)
+    name = f'{agg}_{measure}'
+
+    if by in table['dimensions']:
+        dim = table['dimensions'][by]
+        keys, labels = dim['codes'][rows], dim['levels']
+    elif by in table['ranges']:
+        keys, labels = pd.factorize(table['ranges'][by]['values'][rows], sort=True)
+    else:
+        raise ValueError(f"no index on {by!r}; choose from {list(table['dimensions']) + list(table['ranges'])}")
+
+    keep = keys >= 0
+    keys, rows = keys[keep], rows[keep]
+    labels = np.array(labels, dtype=object if by in table['dimensions'] else np.float64)
+
+    if agg in ('count', 'sum', 'mean'):
+        # bincount over the dictionary codes: no hashing, no intermediate frame
+        stats = table['measures']
+        counts = np.bincount(keys, weights=stats[(measure, 'count')][rows], minlength=len(labels))
+        sums = np.bincount(keys, weights=stats[(measure, 'sum')][rows], minlength=len(labels))
+        present = np.flatnonzero(counts)
+        result = {'count': counts.astype(np.int64), 'sum': sums}.get(agg)
+        result = sums / np.maximum(counts, 1) if result is None else result
+        return pd.Series(result[present], index=pd.Index(labels[present], name=by), name=name)
+
+    if agg == 'median':
+        values = index['measures'][measure][rows]
+    else:
+        values = table['measures'][(measure, agg)][rows]
+    # min of the per-combination minimums (and so on); NaN rows are skipped by the group reduction
+    result = pd.Series(values).groupby(keys).agg(agg).dropna()
+    return pd.Series(result.to_numpy(), index=pd.Index(labels[result.index], name=by), name=name)
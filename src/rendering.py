@@ -0,0 +1,73 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from visualization import (
+    enable_batch_mode, setup_visuals, plot_genre_analysis, plot_critic_analysis,
+    plot_publisher_analysis, plot_platform_analysis, plot_regional_analysis, plot_temporal_analysis
+)
+from tracing import configure_tracing, tracing_config, drain_trace_events, record_trace_events
+
+# name -> (plot function, subdirectory under the figures root); every plot function takes cube=
+FIGURE_JOBS = {
+    'genre': (plot_genre_analysis, 'genre_analysis'),
+    'critic': (plot_critic_analysis, 'critic_analysis'),
+    'publisher': (plot_publisher_analysis, 'publisher_analysis'),
+    'platform': (plot_platform_analysis, 'platform_analysis'),
+    'regional': (plot_regional_analysis, 'regional_analysis'),
+    'temporal': (plot_temporal_analysis, 'temporal_analysis')
+}
+# lazy cube parts each figure reads; built in the parent so forked workers inherit them instead of
+# every worker building its own
+FIGURE_CUBE_PARTS = {
+    'critic': ['correlations'],
+    'temporal': ['temporal']
+}
+
+_worker_df = None
+_worker_cube = None
+
+def _init_worker(df, cube, tracing):
+    global _worker_df, _worker_cube
+    configure_tracing(**tracing)
+    # forked workers inherit the parent's events; start empty so only their own are sent back
+    drain_trace_events()
+    enable_batch_mode()
+    setup_visuals()
+    _worker_df = df
+    _worker_cube = cube
+
+def render_figure(name, figures_dir, df, cube=None):
+    plot_func, subdir = FIGURE_JOBS[name]
+    save_dir = os.path.join(figures_dir, subdir)
+
+    start = time.perf_counter()
+    plot_func(df, save_dir, cube=cube)
+    return name, time.perf_counter() - start
+
+def _render_in_worker(name, figures_dir):
+    # worker stage events travel back with the result so the parent's trace covers them
+    return render_figure(name, figures_dir, _worker_df, _worker_cube), drain_trace_events()
+
+def render_figures(df, figures_dir, names=None, cube=None, max_workers=None):
+    names = list(names or FIGURE_JOBS)
+    max_workers = max_workers or min(len(names), os.cpu_count() or 1)
+    print(f"Rendering {len(names)} figures with {max_workers} workers...")
+
+    if cube is not None:
+        for part in {part for name in names for part in FIGURE_CUBE_PARTS.get(name, [])}:
+            cube.get(part)
+
+    timings = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(df, cube, tracing_config())) as pool:
+        futures = [pool.submit(_render_in_worker, name, figures_dir) for name in names]
+        for future in as_completed(futures):
+            (name, seconds), events = future.result()
+            record_trace_events(events)
+            timings[name] = seconds
+            print(f"  {name}: {seconds:.2f}s")
+
+    print(f"Rendered {len(names)} figures in {time.perf_counter() - start:.2f}s wall time")
+    return timings
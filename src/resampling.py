@@ -0,0 +1,260 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from tracing import traced
+
+SEGMENT_DIMENSIONS = ['Genre', 'Platform', 'Company_Type', 'Release_Era']
+DEFAULT_RESAMPLES = 10_000
+# levels with fewer rows are left out of their dimension's pairs
+MIN_GROUP_SIZE = 20
+# upper bound on resamples x rows held in one batch (~16 MB per float64 matrix)
+BATCH_ELEMENTS = 2_000_000
+CORRECTIONS = ['fdr_bh', 'holm', 'bonferroni']
+
+def _dimension_arrays(df, dimension, value, min_group_size):
+    values = df[value].to_numpy(dtype=np.float64)
+    labels = df[dimension]
+
+    sizes = labels.value_counts()
+    keep = labels.isin(sizes.index[sizes >= min_group_size]).to_numpy() & ~np.isnan(values)
+    codes, levels = pd.factorize(labels[keep], sort=True)
+
+    # sorted values keep every level and every pair's pooled rows in value order
+    order = np.argsort(values[keep], kind='stable')
+    return values[keep][order], codes[order], [str(level) for level in levels]
+
+def _batches(n_resamples, n_rows):
+    batch = max(BATCH_ELEMENTS // max(n_rows, 1), 1)
+    return [min(batch, n_resamples - start) for start in range(0, n_resamples, batch)]
+
+def _pair_blocks(sorted_values, codes, first, second):
+    # each pair's pooled rows as runs of tied values, laid end to end across pairs
+    values, sizes, ends, middles = [], [], [], []
+    offset = 0
+    for a, b in zip(first, second):
+        pooled = sorted_values[(codes == a) | (codes == b)]
+        run_starts = np.flatnonzero(np.concatenate([[True], pooled[1:] != pooled[:-1]]))
+        run_ends = np.append(run_starts[1:], len(pooled))
+        values.append(pooled[run_starts])
+        sizes.append(run_ends - run_starts)
+        ends.append(run_ends)
+        # the walk for the permuted medians starts from the run holding the pooled median
+        middles.append(offset + np.searchsorted(run_ends, (len(pooled) - 1) // 2, side='right'))
+        offset += len(run_starts)
+    return np.concatenate(values), np.concatenate(sizes), np.concatenate(ends), np.array(middles)
+
+def _permutation_means(rng, level_values, first, second, n_resamples):
+    sizes = np.array([len(values) for values in level_values])
+    # prefix sums of every level in a fresh random order, each level led by a zero column
+    offsets = np.concatenate([[0], np.cumsum(sizes + 1)[:-1]])
+    prefix = np.zeros((n_resamples, offsets[-1] + sizes[-1] + 1))
+    # shuffling in place in one reused contiguous buffer is cheaper than shuffling a fresh copy
+    buffer = np.empty(n_resamples * sizes.max())
+    for level, values in enumerate(level_values):
+        shuffled = buffer[:n_resamples * len(values)].reshape(n_resamples, len(values))
+        shuffled[:] = values
+        rng.permuted(shuffled, axis=1, out=shuffled)
+        np.cumsum(shuffled, axis=1, out=prefix[:, offsets[level] + 1:offsets[level] + sizes[level] + 1])
+
+    # relabelling A+B at random keeps a hypergeometric share of A's rows in A and fills the
+    # rest from B; taking both shares off the front of independent orders makes the new A a
+    # uniform subset of the pair, and one order per level serves every pair it belongs to
+    n_a, n_b = sizes[first], sizes[second]
+    kept = rng.hypergeometric(n_a, n_b, n_a, size=(n_resamples, len(first)))
+    sum_a = (np.take_along_axis(prefix, offsets[first] + kept, axis=1)
+             + np.take_along_axis(prefix, offsets[second] + n_a - kept, axis=1))
+    total = prefix[:, offsets[first] + n_a] + prefix[:, offsets[second] + n_b]
+    return sum_a / n_a - (total - sum_a) / n_b
+
+def _permutation_medians(rng, blocks, n_a, n_b, n_resamples):
+    block_values, block_sizes, block_ends, pair_middles = blocks
+    pair = np.tile(np.arange(len(n_a)), n_resamples)
+    chosen_total, rows = n_a[pair], (n_a + n_b)[pair]
+    # 1-based ranks of the two middle rows of the new A (first two) and the new B (last two)
+    ranks = np.column_stack([(chosen_total - 1) // 2, chosen_total // 2,
+                             (rows - chosen_total - 1) // 2, (rows - chosen_total) // 2]) + 1
+
+    def counts(seen, chosen):
+        # rows of the new A and the new B among the first `seen` rows of the pair
+        return np.column_stack([chosen, chosen, seen - chosen, seen - chosen])
+
+    # a random relabelling is a hypergeometric bridge over the runs of tied values: draw how
+    # many new-A rows fall up to the middle run, then walk outwards one run at a time until
+    # every middle rank is placed, without materialising any permutation
+    middle = pair_middles[pair]
+    chosen_middle = rng.hypergeometric(block_ends[middle], rows - block_ends[middle], chosen_total)
+    left = counts(block_ends[middle], chosen_middle) >= ranks
+    answer = np.zeros(ranks.shape, dtype=np.int64)
+
+    for step, pending in ((-1, left), (1, ~left)):
+        index = np.flatnonzero(pending.any(axis=1))
+        block, chosen, pending = middle[index], chosen_middle[index], pending[index]
+        while index.size:
+            if step < 0:
+                # rows of the new A inside this run, given how many lie up to its end
+                at, seen = block, block_ends[block] - block_sizes[block]
+                chosen = chosen - rng.hypergeometric(block_sizes[at], seen, chosen)
+                done = pending & (counts(seen, chosen) < ranks[index])
+            else:
+                # rows of the new A inside the next run, out of those still to place after it
+                at = block + 1
+                seen = block_ends[at]
+                chosen = chosen + rng.hypergeometric(block_sizes[at], rows[index] - seen, chosen_total[index] - chosen)
+                done = pending & (counts(seen, chosen) >= ranks[index])
+
+            entry, rank = np.nonzero(done)
+            answer[index[entry], rank] = at[entry]
+            pending = pending & ~done
+            keep = pending.any(axis=1)
+            index, block, chosen, pending = index[keep], (at + min(step, 0))[keep], chosen[keep], pending[keep]
+
+    medians = block_values[answer]
+    return ((medians[:, 0] + medians[:, 1]) / 2 - (medians[:, 2] + medians[:, 3]) / 2).reshape(n_resamples, len(n_a))
+
+def _permutation_batch(level_values, first, second, blocks, n_resamples, seed):
+    # every pair is tested against relabellings of its own rows only, A against B
+    rng = np.random.default_rng(seed)
+    sizes = np.array([len(values) for values in level_values])
+    mean_diffs = _permutation_means(rng, level_values, first, second, n_resamples)
+    median_diffs = _permutation_medians(rng, blocks, sizes[first], sizes[second], n_resamples)
+    return mean_diffs, median_diffs
+
+def _bootstrap_batch(group_values, n_resamples, seed):
+    rng = np.random.default_rng(seed)
+    n = len(group_values)
+    # int64 indices gather faster than narrower ones, which numpy would widen first
+    means = group_values[rng.integers(0, n, size=(n_resamples, n))].mean(axis=1)
+
+    # values are sorted, so the median sample is the one at the median rank; the middle ranks
+    # of n uniform draws are Beta order statistics, and flooring them to an index keeps order
+    lower, upper = (n - 1) // 2, n // 2
+    u_lower = rng.beta(lower + 1, n - lower, size=n_resamples)
+    u_upper = u_lower if upper == lower else u_lower + (1 - u_lower) * rng.beta(1, n - upper, size=n_resamples)
+    middle = np.minimum((np.column_stack([u_lower, u_upper]) * n).astype(np.int64), n - 1)
+    medians = (group_values[middle[:, 0]] + group_values[middle[:, 1]]) / 2
+    return means, medians
+
+def _run_task(task):
+    kind, args = task
+    if kind == 'permutation':
+        return _permutation_batch(*args)
+    return _bootstrap_batch(*args)
+
+def adjust_pvalues(pvalues, method='fdr_bh'):
+    pvalues = np.asarray(pvalues, dtype=np.float64)
+    n = len(pvalues)
+    if n == 0 or method is None:
+        return pvalues
+
+    order = np.argsort(pvalues)
+    ranked = pvalues[order]
+    if method == 'bonferroni':
+        adjusted = ranked * n
+    elif method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (n - np.arange(n)))
+    elif method == 'fdr_bh':
+        adjusted = np.minimum.accumulate((ranked * n / np.arange(1, n + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"unknown correction {method!r}; choose from {CORRECTIONS}")
+
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+def _pair_results(dimension, levels, sorted_values, codes, perm_mean_diffs, perm_median_diffs,
+                  boot_means, boot_medians, confidence):
+    counts = np.bincount(codes, minlength=len(levels))
+    means = np.bincount(codes, weights=sorted_values, minlength=len(levels)) / counts
+    medians = np.array([np.median(sorted_values[codes == i]) for i in range(len(levels))])
+
+    first, second = np.triu_indices(len(levels), k=1)
+    tail = (1 - confidence) / 2 * 100
+    n_resamples = len(perm_mean_diffs)
+
+    table = pd.DataFrame({
+        'dimension': dimension,
+        'group_a': np.array(levels, dtype=object)[first],
+        'group_b': np.array(levels, dtype=object)[second],
+        'n_a': counts[first],
+        'n_b': counts[second]
+    })
+
+    for stat, observed, perm_diff, booted in (('mean', means, perm_mean_diffs, boot_means),
+                                              ('median', medians, perm_median_diffs, boot_medians)):
+        diff = observed[first] - observed[second]
+        # the small tolerance keeps ties from float rounding on the 'as extreme' side
+        extreme = np.abs(perm_diff) >= np.abs(diff) - 1e-12
+        boot_diff = booted[:, first] - booted[:, second]
+
+        table[f'{stat}_diff'] = diff
+        table[f'{stat}_ci_low'] = np.percentile(boot_diff, tail, axis=0)
+        table[f'{stat}_ci_high'] = np.percentile(boot_diff, 100 - tail, axis=0)
+        table[f'{stat}_p'] = (extreme.sum(axis=0) + 1) / (n_resamples + 1)
+
+    return table
+
+@traced
+def segment_pair_tests(df, dimensions=SEGMENT_DIMENSIONS, value='Global_Sales', n_resamples=DEFAULT_RESAMPLES,
+                       confidence=0.95, correction='fdr_bh', alpha=0.05, seed=0, max_workers=None,
+                       min_group_size=MIN_GROUP_SIZE):
+    print(f"\nRunning {n_resamples:,} permutation and bootstrap resamples per segment pair...")
+    start = time.perf_counter()
+
+    arrays = {}
+    tasks = []
+    for dimension in dimensions:
+        if dimension not in df.columns:
+            continue
+        sorted_values, codes, levels = _dimension_arrays(df, dimension, value, min_group_size)
+        if len(levels) < 2:
+            continue
+        arrays[dimension] = (sorted_values, codes, levels)
+
+        first, second = np.triu_indices(len(levels), k=1)
+        level_values = [sorted_values[codes == level] for level in range(len(levels))]
+        blocks = _pair_blocks(sorted_values, codes, first, second)
+        for batch in _batches(n_resamples, len(codes)):
+            tasks.append((dimension, None, ('permutation', (level_values, first, second, blocks, batch))))
+        for level, group_values in enumerate(level_values):
+            for batch in _batches(n_resamples, len(group_values)):
+                tasks.append((dimension, level, ('bootstrap', (group_values, batch))))
+
+    # one child seed per task, fixed by task order, so results do not depend on the worker count
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    jobs = [(kind, args + (task_seed,)) for (_, _, (kind, args)), task_seed in zip(tasks, seeds)]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        outputs = [_run_task(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            outputs = list(pool.map(_run_task, jobs, chunksize=max(len(jobs) // (4 * max_workers), 1)))
+
+    tables = []
+    for dimension, (sorted_values, codes, levels) in arrays.items():
+        perm = [out for (dim, level, _), out in zip(tasks, outputs) if dim == dimension and level is None]
+        boot = {}
+        for (dim, level, _), out in zip(tasks, outputs):
+            if dim == dimension and level is not None:
+                boot.setdefault(level, []).append(out)
+
+        boot_means = np.column_stack([np.concatenate([m for m, _ in boot[i]]) for i in range(len(levels))])
+        boot_medians = np.column_stack([np.concatenate([m for _, m in boot[i]]) for i in range(len(levels))])
+        tables.append(_pair_results(
+            dimension, levels, sorted_values, codes,
+            np.concatenate([m for m, _ in perm]), np.concatenate([m for _, m in perm]),
+            boot_means, boot_medians, confidence
+        ))
+
+    results = pd.concat(tables, ignore_index=True)
+    for stat in ('mean', 'median'):
+        results[f'{stat}_p_adj'] = adjust_pvalues(results[f'{stat}_p'], correction)
+        results[f'{stat}_significant'] = results[f'{stat}_p_adj'] < alpha
+
+    print(f"Tested {len(results)} pairs across {len(arrays)} dimensions in {time.perf_counter() - start:.2f}s "
+          f"({int(results['mean_significant'].sum())} significant mean differences after {correction})")
+    return results
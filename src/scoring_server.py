@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediction import predict_batch, load_model, DEFAULT_MODEL_PATH
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_MS = 2.0
+LATENCY_WINDOW = 10_000
+
+# JSON values a title field may hold; lists and objects cannot be encoded as one feature
+FIELD_TYPES = (str, int, float, bool, type(None))
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies_ms = np.zeros(window)
+        self.window = window
+        self.requests = 0
+        self.batches = 0
+        self.rows_scored = 0
+        self.started = time.perf_counter()
+
+    def record_request(self, latency_ms):
+        self.latencies_ms[self.requests % self.window] = latency_ms
+        self.requests += 1
+
+    def record_batch(self, rows):
+        self.batches += 1
+        self.rows_scored += rows
+
+    def snapshot(self):
+        recent = self.latencies_ms[:min(self.requests, self.window)]
+        uptime = time.perf_counter() - self.started
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'rows_scored': self.rows_scored,
+            'avg_batch_size': self.rows_scored / self.batches if self.batches else 0.0,
+            'p50_ms': float(np.percentile(recent, 50)) if len(recent) else None,
+            'p99_ms': float(np.percentile(recent, 99)) if len(recent) else None,
+            'requests_per_sec': self.requests / uptime if uptime else 0.0,
+            'uptime_sec': uptime
+        }
+
+class MicroBatcher:
+    def __init__(self, model, stats, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.model = model
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # fields a request leaves out are scored as missing
+        self.columns = model['numeric_features'] + list(model['categories'])
+
+    async def score(self, records):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        pending = [await self.queue.get()]
+        rows = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            rows += len(item[0])
+
+        return pending
+
+    async def _score_frame(self, records):
+        frame = pd.DataFrame(records, columns=self.columns)
+        # scoring runs off the event loop so new requests keep queueing for the next batch
+        scores = await asyncio.get_running_loop().run_in_executor(None, predict_batch, frame, self.model)
+        self.stats.record_batch(len(frame))
+        return scores.to_dict(orient='records')
+
+    async def run(self):
+        while True:
+            pending = await self._collect()
+            try:
+                results = await self._score_frame([record for records, _ in pending for record in records])
+            except Exception:
+                # a request that got past validation but still breaks scoring fails alone, not its whole batch
+                for records, future in pending:
+                    try:
+                        result = await self._score_frame(records)
+                    except Exception as exc:
+                        if not future.done():
+                            future.set_exception(exc)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+
+            offset = 0
+            for records, future in pending:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(records)])
+                offset += len(records)
+
+def validate_records(records, columns):
+    # checked before a request joins a batch, so a bad payload gets its own 400
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            return f'record {i} is not a title object'
+        for field in columns:
+            if not isinstance(record.get(field), FIELD_TYPES):
+                return f'record {i}: {field} must be a string, number or null'
+    return None
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+def _write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, default=float).encode()
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+
+async def _dispatch(method, path, body, batcher, stats):
+    if path == '/stats':
+        return 200, stats.snapshot()
+    if path == '/health':
+        return 200, {'status': 'ok'}
+    if path != '/predict':
+        return 404, {'error': f'unknown path {path}'}
+    if method != 'POST':
+        return 405, {'error': 'use POST for /predict'}
+
+    try:
+        payload = json.loads(body)
+    except ValueError as exc:
+        return 400, {'error': f'invalid JSON: {exc}'}
+
+    single = isinstance(payload, dict)
+    records = [payload] if single else payload
+    if not isinstance(records, list) or not records:
+        return 400, {'error': 'expected a title object or a list of title objects'}
+    error = validate_records(records, batcher.columns)
+    if error:
+        return 400, {'error': error}
+
+    start = time.perf_counter()
+    try:
+        results = await batcher.score(records)
+    except (KeyError, ValueError, TypeError) as exc:
+        return 400, {'error': f'could not score request: {exc}'}
+    stats.record_request((time.perf_counter() - start) * 1000)
+
+    return 200, results[0] if single else results
+
+def make_handler(batcher, stats):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    _write_response(writer, 400, {'error': 'malformed request'}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await _dispatch(method, path, body, batcher, stats)
+                except Exception as exc:
+                    status, payload = 500, {'error': str(exc)}
+
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+async def serve(model_path=DEFAULT_MODEL_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None,
+                max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    model = load_model(model_path)
+    stats = LatencyStats()
+    batcher = MicroBatcher(model, stats, max_batch_size, max_wait_ms)
+
+    # first call pays for lazy sklearn/pandas initialisation; keep it out of the latency figures
+    predict_batch(pd.DataFrame([{}], columns=batcher.columns), model)
+
+    handler = make_handler(batcher, stats)
+    if unix_socket:
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+        print(f"Scoring server listening on {unix_socket}")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"Scoring server listening on http://{host}:{port}")
+
+    batch_task = asyncio.create_task(batcher.run())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve success predictions over HTTP with request micro-batching')
+    parser.add_argument('--model-path', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix-socket', default=None, help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='how long the first request in a batch may wait for others to join')
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.model_path, args.host, args.port, args.unix_socket,
+                      args.max_batch_size, args.max_wait_ms))
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# relative accuracy of the log-bucketed quantile sketches (DDSketch-style)
+SKETCH_ALPHA = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+def group_key_arrays(df, keys):
+    if keys:
+        return [df[key].astype(object) for key in keys]
+    return [np.zeros(len(df), dtype=np.int8)]
+
+def _sketch_buckets(values):
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buckets = np.ceil(np.log(values) / np.log(SKETCH_GAMMA))
+    return np.where(values > 0, buckets, ZERO_BUCKET).astype(np.int64)
+
+def _bucket_values(buckets):
+    buckets = np.asarray(buckets, dtype=np.float64)
+    values = 2 * SKETCH_GAMMA ** buckets / (SKETCH_GAMMA + 1)
+    return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+def sketch_counts(df, keys, columns, exact=False):
+    # exact=True counts distinct values instead of log buckets; only sensible for low-cardinality columns
+    parts = []
+    for col in columns:
+        present = df[col].notna().to_numpy()
+        part = pd.DataFrame({
+            f'_key{i}': key[present] for i, key in enumerate(group_key_arrays(df, keys))
+        })
+        part['column'] = col
+        values = df[col].to_numpy(dtype=np.float64)[present]
+        part['bucket'] = values if exact else _sketch_buckets(values)
+        parts.append(part)
+
+    long = pd.concat(parts, ignore_index=True)
+    counts = long.groupby(list(long.columns)).size().astype(np.int64)
+    counts.index.names = (list(keys) or ['_all']) + ['column', 'bucket']
+    return counts
+
+def merge_counts(current, delta, sign=1):
+    if current is None:
+        return delta * sign
+    combined = pd.concat([current, delta * sign])
+    merged = combined.groupby(level=list(range(combined.index.nlevels))).sum()
+    return merged[merged > 0]
+
+def _value_at_rank(counts, cumulative, group_levels, rank, exact):
+    reached = counts[cumulative > rank].reset_index()
+    first = reached.groupby(list(reached.columns[:len(group_levels)]), sort=False)['bucket'].first()
+    values = first.to_numpy(dtype=np.float64) if exact else _bucket_values(first.to_numpy())
+    return pd.Series(values, index=first.index)
+
+def count_quantiles(counts, q=0.5, exact=False):
+    # interpolates between the two bracketing ranks like np.quantile's default 'linear' method
+    counts = counts.sort_index()
+    group_levels = list(range(counts.index.nlevels - 1))
+    cumulative = counts.groupby(level=group_levels).cumsum()
+    position = (counts.groupby(level=group_levels).transform('sum') - 1) * q
+
+    lower = _value_at_rank(counts, cumulative, group_levels, np.floor(position), exact)
+    upper = _value_at_rank(counts, cumulative, group_levels, np.ceil(position), exact)
+    weight = (position - np.floor(position)).groupby(level=group_levels).first()
+    weight.index = lower.index
+
+    return lower + (upper.reindex(lower.index) - lower) * weight
+
+def medians_from_counts(counts_by_level, exact=False):
+    # same layout as data_processing.compute_group_medians, so clean_data(medians=...) accepts it
+    medians = {}
+    for keys, counts in counts_by_level.items():
+        level = count_quantiles(counts, exact=exact).unstack('column')
+        if keys and not isinstance(level.index, pd.MultiIndex):
+            level.index = pd.MultiIndex.from_arrays([level.index])
+        medians[keys] = level.iloc[0] if not keys else level
+    return medians
@@ -0,0 +1,157 @@
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_processing import UNKNOWN_PUBLISHER, load_raw_data, clean_data, create_features
+from aggregation import build_aggregation_cube
+from analysis import analyze_genre_performance, analyze_publisher_performance, analyze_platform_performance
+from tracing import configure_tracing, tracing_config, drain_trace_events, record_trace_events, traced
+
+# dimension -> the analysis whose table is compared across snapshots; the platform and publisher
+# analyses keep their top levels only, so ranks are within those lists
+SNAPSHOT_ANALYSES = {
+    'Genre': analyze_genre_performance,
+    'Platform': analyze_platform_performance,
+    'Publisher': analyze_publisher_performance
+}
+SNAPSHOT_METRICS = ['count', 'total_sales', 'avg_sales', 'success_rate', 'avg_critic', 'rank']
+# smallest change worth reporting; success_rate is in percentage points, rank is by total sales
+METRIC_TOLERANCES = {
+    'count': 0.5, 'total_sales': 0.005, 'avg_sales': 0.0005, 'success_rate': 0.05, 'avg_critic': 0.05, 'rank': 0.5
+}
+BASELINES = ['previous', 'first']
+
+def snapshot_label(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def _snapshot_levels(path):
+    # only the dictionary columns are parsed; the full read happens once the dictionary is known
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [col for col in SNAPSHOT_ANALYSES if col in header]
+    levels = pd.read_csv(path, usecols=columns, dtype=str)
+    return {col: levels[col].dropna().unique() for col in columns}
+
+def build_category_dictionary(level_sets):
+    # one sorted level list per dimension across every snapshot, so a code means the same thing in all of them
+    level_sets = list(level_sets)
+    dictionary = {}
+    for col in SNAPSHOT_ANALYSES:
+        values = [levels[col] for levels in level_sets if col in levels]
+        dictionary[col] = sorted(set(np.concatenate(values))) if values else []
+    # missing publishers are filled in after the scan, so their stand-in needs a code too
+    if UNKNOWN_PUBLISHER not in dictionary['Publisher']:
+        dictionary['Publisher'] = sorted(dictionary['Publisher'] + [UNKNOWN_PUBLISHER])
+    return dictionary
+
+def _init_worker(tracing):
+    configure_tracing(**tracing)
+    # forked workers inherit the parent's events; start empty so only their own are sent back
+    drain_trace_events()
+
+def _encode_table(table, levels):
+    # analysis tables come back keyed by label; place each row at its global code
+    values = np.full((len(levels), len(SNAPSHOT_METRICS)), np.nan)
+    codes = pd.Categorical(table.index.astype(str), categories=levels).codes
+    ranked = table['total_sales'].rank(ascending=False, method='min').to_numpy()
+    for i, metric in enumerate(SNAPSHOT_METRICS):
+        values[codes, i] = ranked if metric == 'rank' else table[metric].to_numpy(dtype=np.float64)
+    return values
+
+def process_snapshot(path, dictionary):
+    start = time.perf_counter()
+    df = create_features(clean_data(load_raw_data(path), copy=False), copy=False)
+    for col, levels in dictionary.items():
+        df[col] = df[col].astype('category').cat.set_categories(levels)
+
+    cube = build_aggregation_cube(df, dimensions=list(SNAPSHOT_ANALYSES), pairs=[])
+    tables = {col: _encode_table(analyze(df, cube=cube), dictionary[col]) for col, analyze in SNAPSHOT_ANALYSES.items()}
+    return {
+        'label': snapshot_label(path),
+        'rows': len(df),
+        'tables': tables,
+        'seconds': time.perf_counter() - start
+    }
+
+def _process_in_worker(path, dictionary):
+    # the analyses print their tables; the parent prints one line per finished snapshot instead
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_snapshot(path, dictionary)
+    return result, drain_trace_events()
+
+@traced
+def run_snapshots(paths, max_workers=None):
+    """Process every snapshot file in a process pool against one shared category dictionary.
+
+    Each result holds, per dimension, a (level code x SNAPSHOT_METRICS) array, so snapshots
+    compare by position rather than by joining on labels.
+    """
+    paths = list(paths)
+    max_workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    print(f"Processing {len(paths)} snapshots with {max_workers} workers...")
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(tracing_config(),)) as pool:
+        dictionary = build_category_dictionary(pool.map(_snapshot_levels, paths))
+        print("Shared dictionary: " + ', '.join(f"{len(levels)} {col}" for col, levels in dictionary.items()))
+
+        results = []
+        for result, events in pool.map(_process_in_worker, paths, [dictionary] * len(paths)):
+            record_trace_events(events)
+            results.append(result)
+            print(f"  {result['label']}: {result['rows']} rows in {result['seconds']:.2f}s")
+
+    print(f"Processed {len(paths)} snapshots in {time.perf_counter() - start:.2f}s wall time")
+    return dictionary, results
+
+def diff_snapshots(dictionary, results, baseline='previous'):
+    """Every aggregate that moved by more than its tolerance, one row per (pair, level, metric).
+
+    Levels present in only one of the two snapshots are reported with a NaN on the other side.
+    """
+    if baseline not in BASELINES:
+        raise ValueError(f"unknown baseline {baseline!r}; choose from {BASELINES}")
+
+    tolerances = np.array([METRIC_TOLERANCES[metric] for metric in SNAPSHOT_METRICS])
+    frames = []
+    for i in range(1, len(results)):
+        before, after = results[0 if baseline == 'first' else i - 1], results[i]
+        for col, levels in dictionary.items():
+            old, new = before['tables'][col], after['tables'][col]
+            with np.errstate(invalid='ignore'):
+                changed = (np.abs(new - old) > tolerances) | (np.isnan(old) != np.isnan(new))
+            rows, metrics = np.nonzero(changed)
+            # labels are only looked up for the cells that changed
+            frames.append(pd.DataFrame({
+                'from': before['label'],
+                'to': after['label'],
+                'dimension': col,
+                'level': np.asarray(levels, dtype=object)[rows],
+                'metric': np.asarray(SNAPSHOT_METRICS, dtype=object)[metrics],
+                'before': old[rows, metrics],
+                'after': new[rows, metrics],
+                'change': new[rows, metrics] - old[rows, metrics]
+            }))
+
+    columns = ['from', 'to', 'dimension', 'level', 'metric', 'before', 'after', 'change']
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def summarize_diff(diff, top=10):
+    lines = []
+    for (before, after), pair in diff.groupby(['from', 'to'], sort=False):
+        counts = pair.groupby(['dimension', 'metric']).size().unstack(fill_value=0)
+        lines.append(f"\n{before} -> {after}: {len(pair)} changed aggregates")
+        lines.append(counts.to_string())
+
+        moves = pair[pair['metric'] == 'rank'].dropna(subset=['before', 'after'])
+        if len(moves):
+            moves = moves.reindex(moves['change'].abs().sort_values(ascending=False).index).head(top)
+            lines.append("Largest rank moves:")
+            lines.append(moves[['dimension', 'level', 'before', 'after']].to_string(
+                index=False, float_format=lambda v: f"{v:.0f}"))
+    return '\n'.join(lines) if lines else "No aggregates changed between snapshots"
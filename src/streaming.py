@@ -0,0 +1,130 @@
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from data_processing import (
+    RAW_SCHEMA, IMPUTE_COLUMNS, IMPUTE_LEVELS, VALIDATION_RULES, compact_frame, clean_data, create_features
+)
+from sketches import sketch_counts, merge_counts, medians_from_counts
+from keyset import KeySet
+from validation import validate_frame, merge_validation_reports, format_validation_report, append_quarantine
+
+DEFAULT_MEMORY_LIMIT_MB = 512
+DEFAULT_OUTPUT_DIR = 'data/processed_partitions'
+# working-set multiplier over a compacted chunk: parsing buffers, feature columns and write buffers
+CHUNK_OVERHEAD_FACTOR = 4
+SAMPLE_ROWS = 10_000
+# share of the memory limit kept for the duplicate-key hashes; past it they spill to disk
+KEY_MEMORY_SHARE = 0.25
+
+def _raw_dtypes(file_path):
+    header = pd.read_csv(file_path, nrows=0).columns
+    return {col: dtype for col, dtype in RAW_SCHEMA.items() if col in header}
+
+def estimate_chunk_rows(file_path, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    # measured before compaction: the object-dtype parse is the largest form a chunk takes;
+    # the duplicate-key set has its own share of the limit
+    sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS, dtype=_raw_dtypes(file_path))
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    chunk_bytes = memory_limit_mb * 1024 ** 2 * (1 - KEY_MEMORY_SHARE)
+    return max(int(chunk_bytes / (bytes_per_row * CHUNK_OVERHEAD_FACTOR)), 1_000)
+
+def iter_raw_chunks(file_path, chunk_rows, rules=VALIDATION_RULES, validation=None,
+                    memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    # every chunk goes through the batch path's rules before compaction, with duplicate keys tracked
+    # across chunks so the first occurrence in the file wins; `validation` collects the chunk reports
+    # when the caller wants them, and appends the quarantined rows to its 'quarantine_path' if set
+    duplicate_rules = [rule['name'] for rule in rules if rule['kind'] == 'duplicate']
+    key_bytes = int(memory_limit_mb * 1024 ** 2 * KEY_MEMORY_SHARE / max(len(duplicate_rules), 1))
+    seen_keys = {name: KeySet(max_bytes=key_bytes) for name in duplicate_rules}
+
+    reader = pd.read_csv(file_path, dtype=_raw_dtypes(file_path), chunksize=chunk_rows)
+    try:
+        for chunk in reader:
+            if rules:
+                chunk, quarantined, report = validate_frame(chunk, rules, seen_keys=seen_keys)
+                if validation is not None:
+                    validation['reports'].append(report)
+                    if validation.get('quarantine_path') and len(quarantined):
+                        append_quarantine(quarantined, validation['quarantine_path'])
+                chunk = chunk.reset_index(drop=True)
+            yield compact_frame(chunk)
+    finally:
+        for key_set in seen_keys.values():
+            key_set.close()
+
+def collect_impute_counts(file_path, chunk_rows, columns=IMPUTE_COLUMNS, levels=IMPUTE_LEVELS,
+                          memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    counts = {tuple(keys): None for keys in levels + [[]]}
+    rows = 0
+    for chunk in iter_raw_chunks(file_path, chunk_rows, memory_limit_mb=memory_limit_mb):
+        present = [col for col in columns if col in chunk.columns]
+        for keys in counts:
+            counts[keys] = merge_counts(counts[keys], sketch_counts(chunk, list(keys), present, exact=True))
+        rows += len(chunk)
+    return counts, rows
+
+def _write_partitions(df, output_dir, partition_by, chunk_id):
+    written = 0
+    for value, part in df.groupby(partition_by, observed=True):
+        part_dir = os.path.join(output_dir, f'{partition_by}={value}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f'part-{chunk_id:05d}.parquet')
+        tmp_path = f"{path}.tmp"
+        part.drop(columns=partition_by).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        written += 1
+    return written
+
+def process_file_streaming(file_path='data/video_games_sales.csv', output_dir=DEFAULT_OUTPUT_DIR,
+                           partition_by='Release_Era', memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                           chunk_rows=None, quarantine_path=None):
+    chunk_rows = chunk_rows or estimate_chunk_rows(file_path, memory_limit_mb)
+    print(f"Streaming {file_path} in chunks of {chunk_rows:,} rows (limit {memory_limit_mb} MB)")
+
+    start = time.perf_counter()
+    counts, rows_valid = collect_impute_counts(file_path, chunk_rows, memory_limit_mb=memory_limit_mb)
+    # an empty file has nothing to impute; pass 2 then sees no chunks either
+    medians = medians_from_counts(counts, exact=True) if rows_valid else None
+    print(f"Pass 1: collected imputation medians over {rows_valid:,} valid rows in {time.perf_counter() - start:.2f}s")
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    start = time.perf_counter()
+    rows_out = 0
+    files_written = 0
+    # quarantined rows go to a tmp file chunk by chunk and only replace quarantine_path once complete
+    tmp_quarantine = f"{quarantine_path}.tmp" if quarantine_path is not None else None
+    if tmp_quarantine is not None and os.path.exists(tmp_quarantine):
+        os.remove(tmp_quarantine)
+    validation = {'reports': [], 'quarantine_path': tmp_quarantine}
+    for chunk_id, chunk in enumerate(iter_raw_chunks(file_path, chunk_rows, validation=validation,
+                                                             memory_limit_mb=memory_limit_mb)):
+        processed = create_features(clean_data(chunk, copy=False, medians=medians), copy=False)
+        files_written += _write_partitions(processed, output_dir, partition_by, chunk_id)
+        rows_out += len(processed)
+
+    report = merge_validation_reports(validation['reports'])
+    print(format_validation_report(report))
+    if tmp_quarantine is not None and os.path.exists(tmp_quarantine):
+        os.replace(tmp_quarantine, quarantine_path)
+        print(f"Quarantined rows saved to {quarantine_path}")
+    print(f"Pass 2: wrote {rows_out:,} rows to {files_written} files under {output_dir} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    return {
+        'rows_in': report['rows'],
+        'rows_out': rows_out,
+        'quarantined': report['quarantined'],
+        'chunk_rows': chunk_rows,
+        'files_written': files_written,
+        'output_dir': output_dir,
+        'partition_by': partition_by
+    }
+
+def load_partitioned_data(output_dir=DEFAULT_OUTPUT_DIR, filters=None, columns=None):
+    return compact_frame(pd.read_parquet(output_dir, filters=filters, columns=columns))
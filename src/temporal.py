@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from data_processing import REGION_COLUMNS
+from tracing import traced
+
+TEMPORAL_AXES = ['Year_of_Release', 'Genre', 'Platform']
+# additive measures only: every trend is a sum over cells, and rates are ratios of those sums
+TEMPORAL_MEASURES = ['count', 'successful', 'critic_sum', 'critic_n'] + REGION_COLUMNS + ['Global_Sales']
+ROLLING_WINDOWS = [3, 5]
+# a platform launches in the first year with at least this share of its busiest year's releases;
+# stray mis-dated rows (a 1985 DS game) would otherwise stretch its lifecycle by decades
+LAUNCH_MIN_SHARE = 0.02
+
+def _codes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), list(values.cat.categories)
+    codes, levels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), list(levels)
+
+@traced
+def build_temporal_cube(df):
+    """Year x Genre x Platform cells of every measure in TEMPORAL_MEASURES, from one pass over the rows.
+
+    Years run from the first to the last release year without gaps, so calendar windows are
+    plain offsets along the year axis.
+    """
+    years = df['Year_of_Release'].to_numpy(dtype=np.float64)
+    first_year, last_year = int(np.nanmin(years)), int(np.nanmax(years))
+    genre_codes, genres = _codes(df['Genre'])
+    platform_codes, platforms = _codes(df['Platform'])
+    shape = (last_year - first_year + 1, len(genres), len(platforms))
+
+    cells = ((years - first_year).astype(np.int64) * shape[1] + genre_codes) * shape[2] + platform_codes
+    critic = df['Critic_Score'].to_numpy(dtype=np.float64)
+    weights = [
+        None,
+        df['Is_Successful'].to_numpy(dtype=np.float64),
+        np.nan_to_num(critic),
+        (~np.isnan(critic)).astype(np.float64)
+    ] + [df[col].to_numpy(dtype=np.float64) for col in REGION_COLUMNS + ['Global_Sales']]
+
+    size = int(np.prod(shape))
+    values = np.stack([np.bincount(cells, weights=w, minlength=size) for w in weights], axis=-1)
+
+    return {
+        'years': np.arange(first_year, last_year + 1),
+        'genres': genres,
+        'platforms': platforms,
+        'measures': list(TEMPORAL_MEASURES),
+        'values': values.reshape(shape + (len(TEMPORAL_MEASURES),))
+    }
+
+def get_temporal_cube(df, cube=None):
+    # the aggregation cube carries one; cubes rebuilt elsewhere (incremental state) may not
+    if cube is not None and 'temporal' in cube:
+        return cube['temporal']
+    return build_temporal_cube(df)
+
+def _select(levels, chosen, name):
+    if chosen is None:
+        return np.arange(len(levels))
+    chosen = [chosen] if isinstance(chosen, str) else list(chosen)
+    lookup = {level: i for i, level in enumerate(levels)}
+    unknown = [level for level in chosen if level not in lookup]
+    if unknown:
+        raise ValueError(f"unknown {name} {unknown}; choose from {levels}")
+    return np.array([lookup[level] for level in chosen], dtype=np.int64)
+
+def _slice(temporal, genres=None, platforms=None, by=None):
+    # (year, group, measure) sums for the chosen genres and platforms, grouped by one axis or none
+    genre_idx = _select(temporal['genres'], genres, 'genres')
+    platform_idx = _select(temporal['platforms'], platforms, 'platforms')
+    values = temporal['values'][:, genre_idx][:, :, platform_idx]
+
+    if by is None:
+        return values.sum(axis=(1, 2))[:, None, :], ['All']
+    if by == 'Genre':
+        return values.sum(axis=2), [temporal['genres'][i] for i in genre_idx]
+    if by == 'Platform':
+        return values.sum(axis=1), [temporal['platforms'][i] for i in platform_idx]
+    raise ValueError(f"unknown grouping {by!r}; choose from ['Genre', 'Platform']")
+
+def _window_sums(values, window):
+    # calendar window ending at each year, NaN until a full window exists
+    padded = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    sums = padded[window:] - padded[:-window]
+    return np.concatenate([np.full((window - 1,) + values.shape[1:], np.nan), sums])
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+def yearly_trends(temporal, by=None, genres=None, platforms=None, windows=ROLLING_WINDOWS):
+    """Per-year metrics and their moving windows for a slice of the cube.
+
+    Sales share is of all sales in the cube that year, so a filtered slice reads as its share of
+    the market. Growth over a window compares it with the window just before it.
+    """
+    values, labels = _slice(temporal, genres, platforms, by)
+    column = {name: i for i, name in enumerate(temporal['measures'])}
+    count, successful, sales = (values[..., column[name]] for name in ['count', 'successful', 'Global_Sales'])
+    market = temporal['values'][..., column['Global_Sales']].sum(axis=(1, 2))[:, None]
+
+    metrics = {
+        'count': count,
+        'successful': successful,
+        'total_sales': sales,
+        'success_rate': _ratio(successful, count),
+        'avg_sales': _ratio(sales, count),
+        'avg_critic': _ratio(values[..., column['critic_sum']], values[..., column['critic_n']]),
+        'sales_share': _ratio(sales, market),
+        'sales_growth': np.concatenate([np.full((1, len(labels)), np.nan), _ratio(sales[1:], sales[:-1]) - 1])
+    }
+    for window in windows:
+        window_sales = _window_sums(sales, window)
+        previous = np.concatenate([np.full((window, len(labels)), np.nan), window_sales[:-window]])
+        metrics[f'success_rate_{window}y'] = _ratio(_window_sums(successful, window), _window_sums(count, window))
+        metrics[f'sales_share_{window}y'] = _ratio(window_sales, _window_sums(market, window))
+        metrics[f'sales_growth_{window}y'] = _ratio(window_sales, previous) - 1
+
+    if by is None:
+        index = pd.Index(temporal['years'], name='Year_of_Release')
+        return pd.DataFrame({name: metric[:, 0] for name, metric in metrics.items()}, index=index)
+    index = pd.MultiIndex.from_product([temporal['years'], labels], names=['Year_of_Release', by])
+    return pd.DataFrame({name: metric.ravel() for name, metric in metrics.items()}, index=index)
+
+def platform_lifecycle(temporal, platforms=None, genres=None, normalize=False):
+    """Global sales of each platform by years since its first release, one row per platform.
+
+    With normalize=True each row is the share of the platform's lifetime sales.
+    """
+    values, labels = _slice(temporal, genres, platforms, by='Platform')
+    column = {name: i for i, name in enumerate(temporal['measures'])}
+    sales = values[..., column['Global_Sales']]
+    counts = values[..., column['count']]
+    released = (counts > 0) & (counts >= LAUNCH_MIN_SHARE * counts.max(axis=0, keepdims=True))
+
+    active = released.any(axis=0)
+    launch = released.argmax(axis=0)
+    age = np.arange(len(temporal['years']))[:, None] - launch[None, :]
+    keep = (age >= 0) & active[None, :]
+
+    curves = np.zeros((len(labels), len(temporal['years'])))
+    curves[np.nonzero(keep)[1], age[keep]] = sales[keep]
+    last_age = int(age[keep & released].max()) + 1 if keep.any() else 0
+    curves = curves[active, :last_age]
+    if normalize:
+        curves = _ratio(curves, curves.sum(axis=1, keepdims=True))
+
+    index = pd.MultiIndex.from_arrays(
+        [[label for label, is_active in zip(labels, active) if is_active], temporal['years'][launch[active]]],
+        names=['Platform', 'launch_year']
+    )
+    return pd.DataFrame(curves, index=index, columns=pd.RangeIndex(last_age, name='years_since_launch'))
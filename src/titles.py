@@ -0,0 +1,305 @@
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# characters kept after normalisation; each maps to a digit of a base-37 shingle code
+ALPHABET = ' abcdefghijklmnopqrstuvwxyz0123456789'
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs with Jaccard ~0.75 collide in some band >99% of the time, pairs under ~0.4 rarely
+BANDS = 16
+SIMILARITY_THRESHOLD = 0.85
+# releases of one name more than this many years after a title's first are different titles
+# (remakes, reboots, reused names)
+YEAR_GAP = 3
+# upper bound on shingles x permutations hashed at once (~128 MB of int64)
+BATCH_ELEMENTS = 16_000_000
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1234)
+_HASH_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_HASH_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+
+_PARENTHESES = re.compile(r'\([^)]*\)')
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+_GREEK_LETTERS = re.compile('[\u0391-\u03a9\u03b1-\u03c9]')
+_GREEK_NAMES = sorted({unicodedata.name(chr(code)).split()[-1].lower() for code in range(0x3b1, 0x3ca)})
+# numbers (with any ordinal suffix), roman numerals and single letters; greek letters arrive spelled out
+_DISTINCT_TOKENS = re.compile(rf"\b(?:(\d+)(?:st|nd|rd|th)?|([ivx]+|[a-z]|{'|'.join(_GREEK_NAMES)}))\b")
+_CHAR_CODES = np.full(256, 0, dtype=np.int64)
+_CHAR_CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+
+def normalize_title(name):
+    # '(JP sales)', '(2015)', '(DS Version)' are bookkeeping, not part of the title; years are handled by YEAR_GAP.
+    # Greek letters are spelled out rather than dropped by the ascii fold: 'Taisen α' is not 'Taisen'; apostrophes
+    # go so a possessive 's' does not read as a letter suffix
+    name = _GREEK_LETTERS.sub(lambda letter: f" {unicodedata.name(letter.group()).split()[-1]} ", str(name))
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    name = _NON_ALPHANUMERIC.sub(' ', _PARENTHESES.sub(' ', name.replace('&', ' and ').replace("'", '')))
+    return ' '.join(name.split())
+
+def _distinct_key(name):
+    # sequels differ by little more than a number, a letter or '2nd' ('Project Diva', '... f', '... F 2nd'),
+    # so titles only match when these tokens agree
+    tokens = [str(int(number)) if number else token for number, token in _DISTINCT_TOKENS.findall(name)]
+    return zlib.crc32(' '.join(tokens).encode())
+
+def _shingles(names):
+    # every padded name laid end to end; a shingle is a base-37 code of SHINGLE_SIZE consecutive characters
+    padded = [f' {name} ' for name in names]
+    lengths = np.array([len(name) for name in padded], dtype=np.int64)
+    chars = _CHAR_CODES[np.frombuffer(''.join(padded).encode(), dtype=np.uint8)]
+
+    codes = np.zeros(max(len(chars) - SHINGLE_SIZE + 1, 0), dtype=np.int64)
+    for offset in range(SHINGLE_SIZE):
+        codes = codes * len(ALPHABET) + chars[offset:offset + len(codes)]
+
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    counts = np.maximum(lengths - SHINGLE_SIZE + 1, 0)
+    # drop the shingles that straddle two names
+    owner = np.repeat(np.arange(len(names)), counts)
+    positions = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return codes[positions], owner, counts
+
+def minhash_signatures(names):
+    codes, owner, counts = _shingles(names)
+    signatures = np.full((len(names), NUM_PERM), _PRIME, dtype=np.int64)
+    if not len(codes):
+        return signatures.astype(np.uint32)
+
+    # whole names per batch, so every name's minimum is taken within one reduceat
+    ends = np.cumsum(counts)
+    batch = max(BATCH_ELEMENTS // NUM_PERM, int(counts.max()))
+    first = 0
+    while first < len(names):
+        last = max(np.searchsorted(ends, ends[first] - counts[first] + batch, side='right'), first + 1)
+        start, end = ends[first] - counts[first], ends[last - 1]
+        block_names = np.arange(first, last)[counts[first:last] > 0]
+        if len(block_names):
+            hashed = (codes[start:end, None] * _HASH_A + _HASH_B) % _PRIME
+            offsets = np.searchsorted(owner[start:end], block_names)
+            signatures[block_names] = np.minimum.reduceat(hashed, offsets, axis=0)
+        first = last
+
+    return signatures.astype(np.uint32)
+
+def band_keys(signatures):
+    rows = NUM_PERM // BANDS
+    keys = np.zeros((BANDS, len(signatures)), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for band in range(BANDS):
+            for value in signatures[:, band * rows:(band + 1) * rows].T.astype(np.uint64):
+                keys[band] = keys[band] * np.uint64(0x100000001B3) + value
+    return keys
+
+def new_title_index():
+    return {
+        'lookup': {},
+        'signatures': np.empty((0, NUM_PERM), dtype=np.uint32),
+        'distinct_keys': np.empty(0, dtype=np.int64),
+        'clusters': np.empty(0, dtype=np.int32),
+        # per name cluster, the node of its first name: every later member must match it directly
+        'representatives': np.empty(0, dtype=np.int64),
+        # per band, the keys of every indexed name in sorted order and the name each came from
+        'band_keys': np.empty((BANDS, 0), dtype=np.uint64),
+        'band_nodes': np.empty((BANDS, 0), dtype=np.int32),
+        'n_clusters': 0,
+        # per title: its name cluster, the years it spans, how many rows and how much it sold
+        'titles': {
+            'cluster': np.empty(0, dtype=np.int32),
+            'first_year': np.empty(0),
+            'last_year': np.empty(0),
+            'ports': np.empty(0, dtype=np.int64),
+            'sales': np.empty(0)
+        }
+    }
+
+def _candidate_pairs(index, keys, has_shingles):
+    n_existing = len(index['clusters'])
+    pairs = []
+    for band in range(BANDS):
+        band_new = keys[band]
+
+        # new names sharing a bucket: neighbours after sorting by key
+        members = np.flatnonzero(has_shingles)
+        order = members[np.argsort(band_new[members], kind='stable')]
+        same = band_new[order[1:]] == band_new[order[:-1]]
+        pairs.append(np.column_stack([order[1:][same], order[:-1][same] + n_existing]))
+
+        # new names landing in a bucket an indexed name already occupies
+        existing = index['band_keys'][band]
+        positions = np.searchsorted(existing, band_new[members])
+        hit = positions < len(existing)
+        hit[hit] = existing[positions[hit]] == band_new[members][hit]
+        pairs.append(np.column_stack([members[hit], index['band_nodes'][band][positions[hit]]]))
+
+    # pairs are (new name, node), where nodes below n_existing are indexed names and the rest new ones
+    pairs = np.concatenate(pairs).astype(np.int64)
+    return np.unique(pairs, axis=0) if len(pairs) else pairs.reshape(0, 2)
+
+def _similarity(signatures, left, right):
+    return (signatures[left] == signatures[right]).mean(axis=1)
+
+def _join_clusters(signatures, representatives, node_clusters, left, right, assigned, n_existing):
+    # pending names join the most similar cluster they have a match in, if they match its representative too
+    candidate = (assigned[left - n_existing] < 0) & (node_clusters[right] >= 0)
+    if not candidate.any():
+        return 0
+    names, clusters = np.unique(np.column_stack([left[candidate], node_clusters[right[candidate]]]), axis=0).T
+    similarity = _similarity(signatures, names, representatives[clusters])
+    close = similarity >= SIMILARITY_THRESHOLD
+    names, clusters, similarity = names[close], clusters[close], similarity[close]
+    order = np.lexsort([clusters, -similarity, names])
+    best = order[np.r_[True, names[order][1:] != names[order][:-1]]] if len(order) else order
+    assigned[names[best] - n_existing] = clusters[best]
+    return len(best)
+
+def _insert_names(index, names):
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n_existing, n_new = len(index['clusters']), len(names)
+    signatures = minhash_signatures(names)
+    distinct_keys = np.array([_distinct_key(name) for name in names], dtype=np.int64)
+    has_shingles = np.array([len(name) > 0 for name in names])
+    keys = band_keys(signatures)
+
+    all_signatures = np.concatenate([index['signatures'], signatures])
+    all_distinct_keys = np.concatenate([index['distinct_keys'], distinct_keys])
+    pairs = _candidate_pairs(index, keys, has_shingles)
+    left = pairs[:, 0] + n_existing
+    right = pairs[:, 1]
+    similarity = _similarity(all_signatures, left, right)
+    matched = (similarity >= SIMILARITY_THRESHOLD) & (all_distinct_keys[left] == all_distinct_keys[right])
+    left, right = left[matched], right[matched]
+    # matches between two new names go both ways: either may be the one already clustered
+    among_new = right >= n_existing
+    left, right = np.concatenate([left, right[among_new]]), np.concatenate([right, left[among_new]])
+
+    # matches chain ('Taisen A' ~ 'Taisen' ~ 'Taisen F'), so a name joins a cluster only when it also
+    # matches the cluster's representative, its first name. Pending names join the clusters of the
+    # names they match for as long as any do; the rest form components among themselves, whose first
+    # names found new clusters for the next round. Clusters already handed out are never merged, so
+    # Title_IDs stay stable as names are added
+    representatives = index['representatives']
+    n_clusters = index['n_clusters']
+    assigned = np.full(n_new, -1, dtype=np.int64)
+    while (assigned < 0).any():
+        while _join_clusters(all_signatures, representatives, np.concatenate([index['clusters'], assigned]),
+                             left, right, assigned, n_existing):
+            pass
+        pending = assigned < 0
+        if not pending.any():
+            break
+
+        both_pending = (right >= n_existing) & pending[left - n_existing] & pending[np.maximum(right - n_existing, 0)]
+        graph = coo_matrix((np.ones(both_pending.sum()), (left[both_pending] - n_existing,
+                                                          right[both_pending] - n_existing)), shape=(n_new, n_new))
+        _, labels = connected_components(graph, directed=False)
+        first = np.full(labels.max() + 1, n_new, dtype=np.int64)
+        np.minimum.at(first, labels[pending], np.flatnonzero(pending))
+        first = first[first < n_new]
+        assigned[first] = n_clusters + np.arange(len(first))
+        representatives = np.concatenate([representatives, first + n_existing])
+        n_clusters += len(first)
+    clusters = assigned.astype(np.int32)
+
+    index['lookup'].update({name: n_existing + i for i, name in enumerate(names)})
+    index['signatures'] = all_signatures
+    index['distinct_keys'] = all_distinct_keys
+    index['clusters'] = np.concatenate([index['clusters'], clusters])
+    index['representatives'] = representatives
+    index['n_clusters'] = n_clusters
+
+    # keep each band sorted: an insertion into the sorted run is a copy, not a re-sort
+    members = np.flatnonzero(has_shingles)
+    band_keys_sorted, band_nodes = [], []
+    for band in range(BANDS):
+        order = members[np.argsort(keys[band][members], kind='stable')]
+        positions = np.searchsorted(index['band_keys'][band], keys[band][order])
+        band_keys_sorted.append(np.insert(index['band_keys'][band], positions, keys[band][order]))
+        band_nodes.append(np.insert(index['band_nodes'][band], positions, order + n_existing))
+    index['band_keys'] = np.array(band_keys_sorted, dtype=np.uint64).reshape(BANDS, -1)
+    index['band_nodes'] = np.array(band_nodes, dtype=np.int32).reshape(BANDS, -1)
+
+def _assign_title_spans(index, clusters, years):
+    titles = index['titles']
+    existing = np.flatnonzero(np.isin(titles['cluster'], clusters))
+
+    # existing titles enter at their first year, ahead of rows released the same year
+    record_cluster = np.concatenate([clusters, titles['cluster'][existing]])
+    record_year = np.concatenate([years, titles['first_year'][existing]])
+    record_title = np.concatenate([np.full(len(clusters), -1), existing])
+
+    order = np.lexsort([record_title < 0, record_year, record_cluster])
+    cluster, year, title = record_cluster[order], record_year[order], record_title[order]
+
+    # a title runs YEAR_GAP years from its first release, so a row starts a new one once it is further
+    # from the start of its segment than that. Rows without a year stand alone
+    finite = np.isfinite(year)
+    starts = np.r_[True, cluster[1:] != cluster[:-1]] | ~finite | (title >= 0)
+    if finite.any():
+        # clusters laid end to end on one axis, so a searchsorted finds the first row past start + YEAR_GAP
+        low = year[finite].min()
+        span = year[finite].max() - low + YEAR_GAP + 1
+        axis = np.cumsum(np.r_[0, cluster[1:] != cluster[:-1]]) * span + np.where(finite, year - low, span - 0.5)
+        next_start = np.searchsorted(axis, axis + YEAR_GAP, side='right')
+        frontier = np.flatnonzero(starts & finite)
+        while len(frontier):
+            reached = next_start[frontier]
+            reached = np.unique(reached[reached < len(starts)])
+            frontier = reached[~starts[reached]]
+            starts[frontier] = True
+    segment = np.cumsum(starts) - 1
+
+    n_segments = segment[-1] + 1 if len(segment) else 0
+    segment_title = np.full(n_segments, np.iinfo(np.int64).max)
+    np.minimum.at(segment_title, segment[title >= 0], title[title >= 0])
+    fresh = segment_title == np.iinfo(np.int64).max
+    segment_title[fresh] = len(titles['cluster']) + np.arange(fresh.sum())
+
+    row_titles = np.empty(len(clusters), dtype=np.int64)
+    is_row = title < 0
+    row_titles[order[is_row]] = segment_title[segment[is_row]]
+
+    n_fresh = int(fresh.sum())
+    first_year = np.full(n_fresh, np.inf)
+    last_year = np.full(n_fresh, -np.inf)
+    titles['cluster'] = np.concatenate([titles['cluster'], np.zeros(n_fresh, dtype=np.int32)])
+    titles['cluster'][segment_title[fresh]] = cluster[np.searchsorted(segment, np.flatnonzero(fresh))]
+    titles['first_year'] = np.concatenate([titles['first_year'], first_year])
+    titles['last_year'] = np.concatenate([titles['last_year'], last_year])
+    titles['ports'] = np.concatenate([titles['ports'], np.zeros(n_fresh, dtype=np.int64)])
+    titles['sales'] = np.concatenate([titles['sales'], np.zeros(n_fresh)])
+
+    present = ~np.isnan(years)
+    np.minimum.at(titles['first_year'], row_titles[present], years[present])
+    np.maximum.at(titles['last_year'], row_titles[present], years[present])
+    return row_titles
+
+def assign_titles(index, names, years, sales=None):
+    """Title IDs for rows of (Name, Year_of_Release), inserting unseen names into the index in place."""
+    name_codes, unique_names = pd.factorize(pd.Series(names, dtype=object).fillna(''))
+    normalized = [normalize_title(name) for name in unique_names]
+
+    lookup = index['lookup']
+    unseen = list(dict.fromkeys(name for name in normalized if name not in lookup))
+    if unseen:
+        _insert_names(index, unseen)
+
+    nodes = np.array([lookup[name] for name in normalized], dtype=np.int64)
+    clusters = index['clusters'][nodes[name_codes]]
+    row_titles = _assign_title_spans(index, clusters, np.asarray(years, dtype=np.float64))
+
+    sales = np.zeros(len(row_titles)) if sales is None else np.nan_to_num(np.asarray(sales, dtype=np.float64))
+    np.add.at(index['titles']['ports'], row_titles, 1)
+    np.add.at(index['titles']['sales'], row_titles, sales)
+    return row_titles.astype(np.int32)
+
+def remove_title_rows(index, title_ids, sales):
+    # spans are left as they were: like min/max elsewhere, they are not invertible
+    np.subtract.at(index['titles']['ports'], title_ids, 1)
+    np.subtract.at(index['titles']['sales'], title_ids, np.nan_to_num(np.asarray(sales, dtype=np.float64)))
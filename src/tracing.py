@@ -0,0 +1,212 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# module-level switches, set once by configure_tracing (and mirrored into render workers)
+TRACING = {'enabled': False, 'trace_memory': False, 'quiet': False}
+
+_events = []
+_stack = threading.local()
+_origin = time.perf_counter()
+_stdout_lock = threading.Lock()
+
+def configure_tracing(enabled=True, trace_memory=False, quiet=False):
+    TRACING.update(enabled=enabled, trace_memory=trace_memory, quiet=quiet)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def tracing_config():
+    return dict(TRACING)
+
+def _frames():
+    if not hasattr(_stack, 'frames'):
+        _stack.frames = []
+    return _stack.frames
+
+def _row_count(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], (pd.DataFrame, pd.Series)):
+        return len(value[0])
+    return None
+
+class _ThreadStdout:
+    # stages run on worker threads, so quiet mode cannot swap sys.stdout for the whole process:
+    # writes from a silenced thread are dropped and every other thread reaches the real stream
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        if getattr(_stack, 'silenced', False):
+            return len(text)
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+@contextlib.contextmanager
+def silenced():
+    # drops the calling thread's output; other threads keep printing
+    with _stdout_lock:
+        if not isinstance(sys.stdout, _ThreadStdout):
+            sys.stdout = _ThreadStdout(sys.stdout)
+    previous = getattr(_stack, 'silenced', False)
+    _stack.silenced = True
+    try:
+        yield
+    finally:
+        _stack.silenced = previous
+
+class _Frame:
+    def __init__(self, name, rows_in):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak_seen = 0
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    if not TRACING['enabled']:
+        yield None
+        return
+
+    frames = _frames()
+    frame = _Frame(name, rows_in)
+    trace_memory = TRACING['trace_memory'] and tracemalloc.is_tracing()
+
+    if trace_memory:
+        # fold the parent's peak so far into it before the child resets the high-water mark
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            frames[-1].peak_seen = max(frames[-1].peak_seen, peak)
+        tracemalloc.reset_peak()
+        start_memory = current
+
+    # only the outermost stage of each thread silences it; nested stages are already quiet
+    silence = TRACING['quiet'] and not frames
+    frames.append(frame)
+
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        with silenced() if silence else contextlib.nullcontext():
+            yield frame
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        frames.pop()
+
+        peak_delta_mb = None
+        if trace_memory:
+            frame.peak_seen = max(frame.peak_seen, tracemalloc.get_traced_memory()[1])
+            if frames:
+                frames[-1].peak_seen = max(frames[-1].peak_seen, frame.peak_seen)
+            peak_delta_mb = (frame.peak_seen - start_memory) / 1024 ** 2
+
+        _events.append({
+            'stage': name,
+            'start': start - _origin,
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_delta_mb': peak_delta_mb,
+            'rows_in': frame.rows_in,
+            'rows_out': frame.rows_out,
+            'depth': len(frames),
+            'pid': os.getpid(),
+            'tid': threading.get_ident()
+        })
+
+def traced(func=None, name=None):
+    if func is None:
+        return functools.partial(traced, name=name)
+
+    stage_name = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not TRACING['enabled']:
+            return func(*args, **kwargs)
+
+        with stage(stage_name, _row_count(args[0]) if args else None) as frame:
+            result = func(*args, **kwargs)
+            frame.rows_out = _row_count(result)
+        return result
+
+    return wrapper
+
+def trace_events():
+    return list(_events)
+
+def drain_trace_events():
+    events = list(_events)
+    _events.clear()
+    return events
+
+def record_trace_events(events):
+    _events.extend(events)
+
+def trace_summary(events=None):
+    events = trace_events() if events is None else events
+    if not events:
+        return pd.DataFrame()
+
+    frame = pd.DataFrame(events)
+    summary = frame.groupby('stage', sort=False).agg(
+        calls=('wall_seconds', 'size'),
+        wall_seconds=('wall_seconds', 'sum'),
+        cpu_seconds=('cpu_seconds', 'sum'),
+        peak_delta_mb=('peak_delta_mb', 'max'),
+        rows_in=('rows_in', 'max'),
+        rows_out=('rows_out', 'max'),
+        depth=('depth', 'min')
+    )
+    summary[['rows_in', 'rows_out']] = summary[['rows_in', 'rows_out']].astype('Int64')
+    return summary.sort_values('wall_seconds', ascending=False)
+
+def print_trace_summary(events=None):
+    summary = trace_summary(events)
+    if summary.empty:
+        return summary
+
+    print("\n" + "="*60)
+    print("STAGE TIMINGS")
+    print("="*60)
+    print(summary.drop(columns='depth').to_string(float_format=lambda v: f"{v:.3f}"))
+    return summary
+
+def _write_json(payload, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, default=float)
+    os.replace(tmp_path, path)
+
+def write_trace(path, events=None):
+    events = trace_events() if events is None else events
+    _write_json({'config': tracing_config(), 'events': events}, path)
+    print(f"Trace written to {path}")
+
+def write_chrome_trace(path, events=None):
+    # loadable in chrome://tracing and Perfetto: complete ('X') events in microseconds
+    events = trace_events() if events is None else events
+    chrome_events = [{
+        'name': event['stage'],
+        'cat': event['stage'].split('.')[0],
+        'ph': 'X',
+        'ts': event['start'] * 1e6,
+        'dur': event['wall_seconds'] * 1e6,
+        'pid': event['pid'],
+        'tid': event['tid'],
+        'args': {key: event[key] for key in ('cpu_seconds', 'peak_delta_mb', 'rows_in', 'rows_out')}
+    } for event in events]
+    _write_json({'traceEvents': chrome_events, 'displayTimeUnit': 'ms'}, path)
+    print(f"Chrome trace written to {path}")
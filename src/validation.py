@@ -0,0 +1,151 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from keyset import KeySet
+from tracing import traced
+
+# a rule either quarantines the rows it matches or only counts them
+ACTIONS = ['quarantine', 'flag']
+VIOLATIONS_COLUMN = 'Violations'
+
+def _numeric(df, col, converted):
+    # object columns (User_Score holds 'tbd') are parsed once per pass, however many rules read them
+    if col not in converted:
+        values = df[col]
+        if values.dtype == object:
+            # a score column has a few hundred distinct strings; parse those, not every row
+            codes, uniques = pd.factorize(values)
+            parsed = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=np.float32)
+            values = pd.Series(np.where(codes < 0, np.nan, parsed[codes]).astype(np.float32), index=df.index)
+        converted[col] = values
+    return converted[col].to_numpy(dtype=np.float64)
+
+def _range_mask(df, rule, converted):
+    mask = np.zeros(len(df), dtype=bool)
+    for col in rule['columns']:
+        values = _numeric(df, col, converted)
+        # missing values pass; clean_data decides what to do with them
+        if 'min' in rule:
+            mask |= values < rule['min']
+        if 'max' in rule:
+            mask |= values > rule['max']
+    return mask
+
+def _sum_mask(df, rule, converted):
+    total = _numeric(df, rule['column'], converted)
+    parts = sum(_numeric(df, col, converted) for col in rule['parts'])
+    return np.abs(total - parts) > rule['tolerance']
+
+def _values_mask(df, rule, converted):
+    mask = np.zeros(len(df), dtype=bool)
+    for col in rule['columns']:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            mask |= df[col].isin(rule['values']).to_numpy()
+    return mask
+
+def _duplicate_mask(df, rule, converted):
+    # the first occurrence of a key is kept; every later one is the violation
+    return df.duplicated(subset=rule['columns'], keep='first').to_numpy()
+
+def _seen_before(df, rule, seen_keys):
+    # keys already met in earlier chunks of the same file; the chunk's new keys are added for the next one
+    hashes = pd.util.hash_pandas_object(df[rule['columns']], index=False).to_numpy()
+    seen = seen_keys.setdefault(rule['name'], KeySet())
+    found = seen.contains(hashes)
+    seen.add(hashes[~found])
+    return found
+
+RULE_KINDS = {
+    'range': _range_mask,
+    'sum': _sum_mask,
+    'values': _values_mask,
+    'duplicate': _duplicate_mask
+}
+
+def _rule_columns(rule):
+    return list(rule.get('columns', [])) + ([rule['column']] if 'column' in rule else []) + list(rule.get('parts', []))
+
+@traced
+def validate_frame(df, rules, seen_keys=None):
+    """Split `df` into clean and quarantined rows by a declarative rule set.
+
+    Each rule is a dict with a name, a kind from RULE_KINDS, an action from ACTIONS and the
+    kind's parameters. Rules whose columns are not in the frame are skipped. Returns the clean
+    frame, the quarantined rows with a Violations column naming the rules they broke, and a report.
+    When a file is validated chunk by chunk, pass the same `seen_keys` dict for every chunk so
+    duplicate rules also catch keys first seen in an earlier chunk; it maps rule names to KeySets,
+    created with the default budget for rules the caller did not size.
+    """
+    start = time.perf_counter()
+    rules = [rule for rule in rules if all(col in df.columns for col in _rule_columns(rule))]
+    for rule in rules:
+        if rule['kind'] not in RULE_KINDS:
+            raise ValueError(f"unknown rule kind {rule['kind']!r} in {rule['name']}; choose from {list(RULE_KINDS)}")
+        if rule['action'] not in ACTIONS:
+            raise ValueError(f"unknown action {rule['action']!r} in {rule['name']}; choose from {ACTIONS}")
+
+    converted = {}
+    violations = np.zeros((len(rules), len(df)), dtype=bool)
+    for i, rule in enumerate(rules):
+        violations[i] = RULE_KINDS[rule['kind']](df, rule, converted)
+        if rule['kind'] == 'duplicate' and seen_keys is not None:
+            violations[i] |= _seen_before(df, rule, seen_keys)
+
+    quarantine_rules = np.array([rule['action'] == 'quarantine' for rule in rules], dtype=bool)
+    quarantined = violations[quarantine_rules].any(axis=0)
+
+    # text columns that were parsed here stay parsed, so compaction does not parse them a second time
+    parsed_df = df.copy(deep=False)
+    for col, values in converted.items():
+        if df[col].dtype == object:
+            parsed_df[col] = values
+    clean_df = parsed_df[~quarantined] if quarantined.any() else parsed_df
+    quarantined_df = df[quarantined].copy()
+    # names are only built for the handful of quarantined rows
+    names = np.array([rule['name'] for rule in rules], dtype=object)
+    quarantined_df[VIOLATIONS_COLUMN] = [';'.join(names[rows]) for rows in violations[:, quarantined].T]
+
+    report = {
+        'rows': len(df),
+        'clean': len(df) - int(quarantined.sum()),
+        'quarantined': int(quarantined.sum()),
+        'violations': {rule['name']: int(count) for rule, count in zip(rules, violations.sum(axis=1))},
+        'actions': {rule['name']: rule['action'] for rule in rules},
+        'seconds': time.perf_counter() - start
+    }
+    return clean_df, quarantined_df, report
+
+def format_validation_report(report):
+    share = report['quarantined'] / report['rows'] if report['rows'] else 0.0
+    lines = [f"Validation: {report['rows']} rows, {report['quarantined']} quarantined ({share:.2%}) "
+             f"in {report['seconds']:.2f}s"]
+    for name, count in report['violations'].items():
+        if count:
+            lines.append(f"  {name:<24} {count:>8}  {report['actions'][name]}")
+    return '\n'.join(lines)
+
+def merge_validation_reports(reports):
+    # chunk reports of one file add up to the report of validating it whole
+    merged = {'rows': 0, 'clean': 0, 'quarantined': 0, 'violations': {}, 'actions': {}, 'seconds': 0.0}
+    for report in reports:
+        for key in ('rows', 'clean', 'quarantined', 'seconds'):
+            merged[key] += report[key]
+        for name, count in report['violations'].items():
+            merged['violations'][name] = merged['violations'].get(name, 0) + count
+        merged['actions'].update(report['actions'])
+    return merged
+
+def save_quarantine(quarantined_df, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    quarantined_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    print(f"Quarantined rows saved to {path}")
+
+def append_quarantine(quarantined_df, path):
+    # chunked validation writes each chunk's rows as it goes; the header comes with the first ones
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    quarantined_df.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
@@ -3,7 +3,33 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 import os
+from matplotlib.colors import LogNorm
 from matplotlib.patches import Patch
+from aggregation import get_cube
+from temporal import ROLLING_WINDOWS, get_temporal_cube, yearly_trends, platform_lifecycle
+from tracing import traced
+
+BATCH_MODE = False
+
+# plot_critic_analysis switches from per-row scatter to 2D binning above this many rows
+DENSITY_THRESHOLD = 50_000
+DENSITY_GRIDSIZE = 60
+
+def enable_batch_mode():
+    global BATCH_MODE
+    plt.switch_backend('Agg')
+    BATCH_MODE = True
+
+def save_figure(fig, path, dpi=300):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    file_format = os.path.splitext(path)[1].lstrip('.') or 'png'
+    fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format=file_format)
+    os.replace(tmp_path, path)
+
+    if BATCH_MODE:
+        plt.close(fig)
+    else:
+        plt.show()
 
 def setup_visuals():
     plt.style.use('seaborn-v0_8')
@@ -12,14 +38,16 @@ def setup_visuals():
     plt.rcParams['font.size'] = 12
     print("Visualization style configured")
 
-def plot_genre_analysis(df, save_dir='../reports/figures/genre_analysis'):
+@traced
+def plot_genre_analysis(df, save_dir='../reports/figures/genre_analysis', cube=None):
     print("Creating genre analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
+    genre_cube = get_cube(df, cube)['Genre']
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 15))
     fig.suptitle('Genre Analysis for Video Game Success', fontsize=16, fontweight='bold')
     
-    genre_sales = df.groupby('Genre')['Global_Sales'].mean().sort_values(ascending=True)
+    genre_sales = genre_cube['avg_sales'].sort_values(ascending=True)
     axes[0,0].barh(genre_sales.index, genre_sales.values, color='skyblue', alpha=0.8)
     axes[0,0].set_title('Average Global Sales by Genre', fontweight='bold')
     axes[0,0].set_xlabel('Average Global Sales (Millions)')
@@ -28,20 +56,20 @@ def plot_genre_analysis(df, save_dir='../reports/figures/genre_analysis'):
     for i, v in enumerate(genre_sales.values):
         axes[0,0].text(v + 0.1, i, f'${v:.2f}M', va='center', fontweight='bold')
 
-    total_sales = df.groupby('Genre')['Global_Sales'].sum().sort_values(ascending=True)
+    total_sales = genre_cube['total_sales'].sort_values(ascending=True)
     axes[0,1].barh(total_sales.index, total_sales.values, color='lightgreen', alpha=0.8)
     axes[0,1].set_title('Total Global Sales by Genre', fontweight='bold')
     axes[0,1].set_xlabel('Total Global Sales (Millions)')
     axes[0,1].grid(axis='x', alpha=0.3)
 
-    genre_count = df['Genre'].value_counts()
+    genre_count = genre_cube['count'].sort_values(ascending=False)
     axes[1,0].bar(genre_count.index, genre_count.values, color='salmon', alpha=0.8)
     axes[1,0].set_title('Number of Games by Genre', fontweight='bold')
     axes[1,0].set_ylabel('Number of Games')
     axes[1,0].tick_params(axis='x', rotation=45)
     axes[1,0].grid(axis='y', alpha=0.3)
 
-    success_rate = df.groupby('Genre')['Is_Successful'].mean().sort_values(ascending=True)
+    success_rate = genre_cube['success_rate'].sort_values(ascending=True)
     axes[1,1].barh(success_rate.index, success_rate.values * 100, color='gold', alpha=0.8)
     axes[1,1].set_title('Success Rate by Genre (%)', fontweight='bold')
     axes[1,1].set_xlabel('Success Rate (%)')
@@ -51,33 +79,51 @@ def plot_genre_analysis(df, save_dir='../reports/figures/genre_analysis'):
         axes[1,1].text(v + 1, i, f'{v:.1f}%', va='center', fontweight='bold')
 
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/genre_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/genre_analysis.png')
     
     return genre_sales, total_sales, success_rate
 
-def plot_critic_analysis(df, save_dir='../reports/figures/critic_analysis'):
+def _density_grid(x, y, bins):
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    return np.ma.masked_equal(counts.T, 0), x_edges, y_edges
+
+@traced
+def plot_critic_analysis(df, save_dir='../reports/figures/critic_analysis', cube=None,
+                         density=None, density_threshold=DENSITY_THRESHOLD, gridsize=DENSITY_GRIDSIZE):
     print("Creating critic score analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 12))
     fig.suptitle('Critic Score vs Sales Relationship', fontsize=16, fontweight='bold')
 
-    valid_data = df.dropna(subset=['Critic_Score', 'Global_Sales'])
-    scatter = axes[0,0].scatter(valid_data['Critic_Score'], valid_data['Global_Sales'], 
-                               alpha=0.6, c=valid_data['Global_Sales'], cmap='viridis')
+    valid = df['Critic_Score'].notna().to_numpy() & df['Global_Sales'].notna().to_numpy()
+    critic_scores = df['Critic_Score'].to_numpy(dtype=np.float64)[valid]
+    global_sales = df['Global_Sales'].to_numpy(dtype=np.float64)[valid]
+    # above the threshold one artist per row dominates render time and file size
+    density = len(critic_scores) > density_threshold if density is None else density
+
+    if density:
+        counts, x_edges, y_edges = _density_grid(critic_scores, global_sales, gridsize)
+        scatter = axes[0,0].pcolormesh(x_edges, y_edges, counts, cmap='viridis',
+                                       norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+        colorbar_label = 'Games per Bin'
+    else:
+        scatter = axes[0,0].scatter(critic_scores, global_sales,
+                                   alpha=0.6, c=global_sales, cmap='viridis')
+        colorbar_label = 'Global Sales (Millions)'
     axes[0,0].set_xlabel('Critic Score')
     axes[0,0].set_ylabel('Global Sales (Millions)')
     axes[0,0].set_title('Critic Score vs Global Sales', fontweight='bold')
     axes[0,0].grid(True, alpha=0.3)
-    plt.colorbar(scatter, ax=axes[0,0], label='Global Sales (Millions)')
+    plt.colorbar(scatter, ax=axes[0,0], label=colorbar_label)
 
-    z = np.polyfit(valid_data['Critic_Score'], valid_data['Global_Sales'], 1)
+    z = np.polyfit(critic_scores, global_sales, 1)
     p = np.poly1d(z)
-    axes[0,0].plot(valid_data['Critic_Score'], p(valid_data['Critic_Score']), "r--", alpha=0.8, linewidth=2)
+    trend_x = np.linspace(critic_scores.min(), critic_scores.max(), 100)
+    axes[0,0].plot(trend_x, p(trend_x), "r--", alpha=0.8, linewidth=2)
     
     critic_bins = pd.cut(df['Critic_Score'], bins=10)
-    score_sales = df.groupby(critic_bins)['Global_Sales'].mean()
+    score_sales = df.groupby(critic_bins, observed=False)['Global_Sales'].mean()
     axes[0,1].plot(range(len(score_sales)), score_sales.values, 
                   marker='o', linewidth=2, markersize=8, color='green')
     axes[0,1].set_xlabel('Critic Score Range')
@@ -94,7 +140,7 @@ def plot_critic_analysis(df, save_dir='../reports/figures/critic_analysis'):
     box_data = [unsuccessful_games['Critic_Score'].dropna(), 
                 successful_games['Critic_Score'].dropna()]
     box_plot = axes[1,0].boxplot(box_data, labels=['Unsuccessful', 'Successful'],
-                                patch_artist=True)
+                                patch_artist=True, showfliers=not density)
     
     colors = ['lightcoral', 'lightgreen']
     for patch, color in zip(box_plot['boxes'], colors):
@@ -105,7 +151,7 @@ def plot_critic_analysis(df, save_dir='../reports/figures/critic_analysis'):
     axes[1,0].grid(True, alpha=0.3)
 
     numeric_columns = ['Global_Sales', 'NA_Sales', 'EU_Sales', 'JP_Sales', 'Other_Sales', 'Critic_Score']
-    correlation_matrix = df[numeric_columns].corr()
+    correlation_matrix = get_cube(df, cube)['correlations'].loc[numeric_columns, numeric_columns]
 
     im = axes[1,1].imshow(correlation_matrix, cmap='coolwarm', aspect='auto', vmin=-1, vmax=1)
     axes[1,1].set_xticks(range(len(numeric_columns)))
@@ -122,22 +168,23 @@ def plot_critic_analysis(df, save_dir='../reports/figures/critic_analysis'):
 
     plt.colorbar(im, ax=axes[1,1])
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/critic_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/critic_analysis.png')
     
     return correlation_matrix
 
-def plot_publisher_analysis(df, save_dir='../reports/figures/publisher_analysis'):
+@traced
+def plot_publisher_analysis(df, save_dir='../reports/figures/publisher_analysis', cube=None):
     print("Creating publisher analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
+    cube = get_cube(df, cube)
+    publisher_cube = cube['Publisher']
 
-    top_publishers = df['Publisher'].value_counts().head(10).index
-    top_pub_data = df[df['Publisher'].isin(top_publishers)]
+    top_publishers = publisher_cube['count'].nlargest(10).index
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 15))
     fig.suptitle('Publisher and Genre Performance Analysis', fontsize=16, fontweight='bold')
 
-    publisher_total_sales = df.groupby('Publisher')['Global_Sales'].sum().sort_values(ascending=False).head(10)
+    publisher_total_sales = publisher_cube['total_sales'].sort_values(ascending=False).head(10)
     axes[0,0].barh(range(len(publisher_total_sales)), publisher_total_sales.values, color='lightblue')
     axes[0,0].set_yticks(range(len(publisher_total_sales)))
     axes[0,0].set_yticklabels(publisher_total_sales.index)
@@ -148,7 +195,7 @@ def plot_publisher_analysis(df, save_dir='../reports/figures/publisher_analysis'
     for i, v in enumerate(publisher_total_sales.values):
         axes[0,0].text(v + 5, i, f'${v:.0f}M', va='center', fontweight='bold')
 
-    success_by_company = df.groupby('Company_Type')['Is_Successful'].mean() * 100
+    success_by_company = cube['Company_Type']['success_rate'] * 100
     bars = axes[0,1].bar(success_by_company.index, success_by_company.values, 
                         color=['steelblue', 'darkorange'], alpha=0.8)
     axes[0,1].set_ylabel('Success Rate (%)')
@@ -160,7 +207,7 @@ def plot_publisher_analysis(df, save_dir='../reports/figures/publisher_analysis'
         axes[0,1].text(bar.get_x() + bar.get_width()/2., height + 1,
                       f'{v:.1f}%', ha='center', va='bottom', fontweight='bold')
 
-    publisher_success = df.groupby('Publisher')['Is_Successful'].mean() * 100
+    publisher_success = publisher_cube['success_rate'] * 100
     top_publisher_success = publisher_success[publisher_success.index.isin(top_publishers)].sort_values()
     
     axes[1,0].barh(range(len(top_publisher_success)), top_publisher_success.values, color='lightgreen')
@@ -184,19 +231,21 @@ def plot_publisher_analysis(df, save_dir='../reports/figures/publisher_analysis'
     axes[1,1].set_yscale('log')
 
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/publisher_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/publisher_analysis.png')
     
     return publisher_total_sales, success_by_company
 
-def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis'):
+@traced
+def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis', cube=None):
     print("Creating platform analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
+    cube = get_cube(df, cube)
+    platform_cube = cube['Platform']
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 12))
     fig.suptitle('Platform Performance Analysis', fontsize=16, fontweight='bold')
 
-    platform_sales = df.groupby('Platform')['Global_Sales'].sum().sort_values(ascending=False).head(15)
+    platform_sales = platform_cube['total_sales'].sort_values(ascending=False).head(15)
     axes[0,0].barh(range(len(platform_sales)), platform_sales.values, color='lightsteelblue')
     axes[0,0].set_yticks(range(len(platform_sales)))
     axes[0,0].set_yticklabels(platform_sales.index)
@@ -204,13 +253,7 @@ def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis'):
     axes[0,0].set_title('Top 15 Platforms by Total Sales', fontweight='bold')
     axes[0,0].grid(axis='x', alpha=0.3)
 
-    platform_era_sales = df.pivot_table(
-        values='Global_Sales', 
-        index='Release_Era', 
-        columns='Platform', 
-        aggfunc='sum',
-        fill_value=0
-    )
+    platform_era_sales = cube[('Release_Era', 'Platform')]['total_sales'].unstack(fill_value=0)
 
     top_platforms_by_era = platform_era_sales.idxmax(axis=1)
     era_top_sales = platform_era_sales.max(axis=1)
@@ -225,7 +268,7 @@ def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis'):
         axes[0,1].text(i, era_top_sales[era] + 5, platform, 
                       ha='center', va='bottom', rotation=0, fontweight='bold')
 
-    platform_success = df.groupby('Platform')['Is_Successful'].mean().sort_values(ascending=False).head(10)
+    platform_success = platform_cube['success_rate'].sort_values(ascending=False).head(10)
     axes[1,0].barh(range(len(platform_success)), platform_success.values * 100, color='lightgreen')
     axes[1,0].set_yticks(range(len(platform_success)))
     axes[1,0].set_yticklabels(platform_success.index)
@@ -233,7 +276,7 @@ def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis'):
     axes[1,0].set_title('Top 10 Platforms by Success Rate', fontweight='bold')
     axes[1,0].grid(axis='x', alpha=0.3)
 
-    platform_counts = df['Platform'].value_counts().head(15)
+    platform_counts = platform_cube['count'].sort_values(ascending=False).head(15)
     axes[1,1].barh(range(len(platform_counts)), platform_counts.values, color='salmon')
     axes[1,1].set_yticks(range(len(platform_counts)))
     axes[1,1].set_yticklabels(platform_counts.index)
@@ -242,12 +285,12 @@ def plot_platform_analysis(df, save_dir='../reports/figures/platform_analysis'):
     axes[1,1].grid(axis='x', alpha=0.3)
 
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/platform_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/platform_analysis.png')
     
     return platform_sales, platform_success
 
-def plot_regional_analysis(df, save_dir='../reports/figures/regional_analysis'):
+@traced
+def plot_regional_analysis(df, save_dir='../reports/figures/regional_analysis', cube=None):
     print("Creating regional analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
     
@@ -273,10 +316,9 @@ def plot_regional_analysis(df, save_dir='../reports/figures/regional_analysis'):
         axes[i//2, i%2].legend()
 
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/regional_distribution.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/regional_distribution.png')
     
-    region_genre_pref = df.groupby('Genre')[regions].mean()
+    region_genre_pref = get_cube(df, cube)[('Genre', 'Region')][regions]
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 12))
     fig.suptitle('Genre Preferences by Region', fontsize=16, fontweight='bold')
@@ -293,19 +335,21 @@ def plot_regional_analysis(df, save_dir='../reports/figures/regional_analysis'):
                 axes[i//2, i%2].text(v + 0.01, j, f'{v:.2f}', va='center', fontsize=9)
 
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/regional_genre_preferences.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/regional_genre_preferences.png')
     
     return region_genre_pref
 
-def plot_temporal_analysis(df, save_dir='../reports/figures/temporal_analysis'):
+@traced
+def plot_temporal_analysis(df, save_dir='../reports/figures/temporal_analysis', cube=None):
     print("Creating temporal analysis visualizations...")
     os.makedirs(save_dir, exist_ok=True)
+    temporal = get_temporal_cube(df, cube)
+    year_trends = yearly_trends(temporal)
     
-    fig, axes = plt.subplots(2, 2, figsize=(20, 12))
+    fig, axes = plt.subplots(3, 2, figsize=(20, 18))
     fig.suptitle('Temporal Trends in Video Game Industry', fontsize=16, fontweight='bold')
     
-    games_per_year = df.groupby('Year_of_Release').size()
+    games_per_year = year_trends['count']
     axes[0,0].plot(games_per_year.index, games_per_year.values, linewidth=2, marker='o', color='blue')
     axes[0,0].set_xlabel('Year')
     axes[0,0].set_ylabel('Number of Games Released')
@@ -313,7 +357,7 @@ def plot_temporal_analysis(df, save_dir='../reports/figures/temporal_analysis'):
     axes[0,0].grid(True, alpha=0.3)
     axes[0,0].tick_params(axis='x', rotation=45)
 
-    sales_per_year = df.groupby('Year_of_Release')['Global_Sales'].mean()
+    sales_per_year = year_trends['avg_sales']
     axes[0,1].plot(sales_per_year.index, sales_per_year.values, linewidth=2, marker='s', color='green')
     axes[0,1].set_xlabel('Year')
     axes[0,1].set_ylabel('Average Global Sales (Millions)')
@@ -321,15 +365,20 @@ def plot_temporal_analysis(df, save_dir='../reports/figures/temporal_analysis'):
     axes[0,1].grid(True, alpha=0.3)
     axes[0,1].tick_params(axis='x', rotation=45)
 
-    success_per_year = df.groupby('Year_of_Release')['Is_Successful'].mean() * 100
-    axes[1,0].plot(success_per_year.index, success_per_year.values, linewidth=2, marker='^', color='red')
+    success_per_year = year_trends['success_rate'] * 100
+    axes[1,0].plot(success_per_year.index, success_per_year.values, linewidth=1, marker='^', color='red',
+                   alpha=0.5, label='Yearly')
+    for window, style in zip(ROLLING_WINDOWS, ['--', '-']):
+        axes[1,0].plot(year_trends.index, year_trends[f'success_rate_{window}y'] * 100, linewidth=2,
+                       linestyle=style, color='darkred', label=f'{window}-year moving')
     axes[1,0].set_xlabel('Year')
     axes[1,0].set_ylabel('Success Rate (%)')
     axes[1,0].set_title('Success Rate Over Time', fontweight='bold')
+    axes[1,0].legend()
     axes[1,0].grid(True, alpha=0.3)
     axes[1,0].tick_params(axis='x', rotation=45)
 
-    critic_per_year = df.groupby('Year_of_Release')['Critic_Score'].mean()
+    critic_per_year = year_trends['avg_critic']
     axes[1,1].plot(critic_per_year.index, critic_per_year.values, linewidth=2, marker='d', color='purple')
     axes[1,1].set_xlabel('Year')
     axes[1,1].set_ylabel('Average Critic Score')
@@ -337,8 +386,31 @@ def plot_temporal_analysis(df, save_dir='../reports/figures/temporal_analysis'):
     axes[1,1].grid(True, alpha=0.3)
     axes[1,1].tick_params(axis='x', rotation=45)
 
+    window = ROLLING_WINDOWS[-1]
+    genre_share = yearly_trends(temporal, by='Genre')[f'sales_share_{window}y'].unstack() * 100
+    top_genres = genre_share.mean().nlargest(6).index
+    for genre in top_genres:
+        axes[2,0].plot(genre_share.index, genre_share[genre], linewidth=2, label=genre)
+    axes[2,0].set_xlabel('Year')
+    axes[2,0].set_ylabel('Share of Global Sales (%)')
+    axes[2,0].set_title(f'Genre Share of Sales ({window}-year moving)', fontweight='bold')
+    axes[2,0].legend()
+    axes[2,0].grid(True, alpha=0.3)
+    axes[2,0].tick_params(axis='x', rotation=45)
+
+    lifecycle = platform_lifecycle(temporal)
+    top_platforms = lifecycle.sum(axis=1).nlargest(8).index
+    for platform, launch_year in top_platforms:
+        curve = lifecycle.loc[(platform, launch_year)]
+        axes[2,1].plot(curve.index, curve.values, linewidth=2, marker='o', label=f'{platform} ({launch_year})')
+    axes[2,1].set_xlabel('Years Since Launch')
+    axes[2,1].set_ylabel('Global Sales (Millions)')
+    axes[2,1].set_title('Platform Lifecycles (Top 8 by Sales)', fontweight='bold')
+    axes[2,1].set_xlim(0, 12)
+    axes[2,1].legend()
+    axes[2,1].grid(True, alpha=0.3)
+
     plt.tight_layout()
-    plt.savefig(f'{save_dir}/temporal_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, f'{save_dir}/temporal_analysis.png')
     
-    return games_per_year, sales_per_year, success_per_year, critic_per_year
\ No newline at end of file
+    return games_per_year, sales_per_year, success_per_year, critic_per_year